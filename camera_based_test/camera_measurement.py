@@ -1,10 +1,13 @@
 import numpy as np
 import cv2
 import glob
+import hashlib
 import yaml
 import os
 import time
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
 # --- FELHASZNÁLÓI KONFIGURÁCIÓ ---
 
@@ -23,6 +26,20 @@ SQUARE_SIZE_MM = 20.0    # Négyzet mérete mm-ben
 OUTPUT_FILE = 'camera_matrix_pi.yaml'
 CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
 
+# Automatikus leállás: a lencse fókusztávolságának becsült szórása (mm) ez alá csökken
+FOCAL_STD_TARGET_MM = 0.5
+# Referencia (lencse nélküli) fázis: a kamera fókusz relatív szórásának célértéke
+REFERENCE_REL_STD_TARGET = 0.002
+# Ennyi kép alatt nem értékeljük a konvergenciát
+MIN_CALIB_IMAGES = 5
+
+# Sakktábla keresés lekicsinyített képen (max. szélesség px), a sarkokat teljes felbontáson finomítjuk
+DETECT_MAX_WIDTH = 640
+SUBPIX_WINDOW = (11, 11)
+
+# Már detektált képek sarokpontjai: frame hash -> finomított sarkok (None = nincs sakktábla)
+DETECTION_CACHE = {}
+
 # --- KAMERA KEZELŐ OSZTÁLY (PiCamera2 vs OpenCV) ---
 
 
@@ -72,9 +89,225 @@ class CameraHandler:
 # ---------------------------------------------------
 
 
-def capture_images(phase_name, cam):
+def frame_key(img):
+    """A kép tartalmának hash-e (a detektálási cache kulcsa)."""
+    h = hashlib.blake2b(img.tobytes(), digest_size=16)
+    h.update(str(img.shape).encode())
+    return h.hexdigest()
+
+
+def to_gray(img):
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def detect_corners(img, fast_check=False, refine=True, max_width=DETECT_MAX_WIDTH):
+    """
+    Sakktábla sarkok keresése: először lekicsinyített képen, majd a talált sarkokat
+    teljes felbontáson cornerSubPix-szel finomítjuk. Visszatérés: sarkok vagy None.
+    """
+    gray = to_gray(img)
+    h, w = gray.shape[:2]
+    scale = min(1.0, float(max_width) / w) if max_width else 1.0
+    small = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+
+    flags = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE
+    if fast_check:
+        flags += cv2.CALIB_CB_FAST_CHECK
+    ret, corners = cv2.findChessboardCorners(small, CHESSBOARD_SIZE, flags)
+    if not ret:
+        return None
+
+    corners = (corners / scale).astype(np.float32) if scale < 1.0 else corners
+    if refine:
+        corners = cv2.cornerSubPix(gray, corners, SUBPIX_WINDOW, (-1, -1), CRITERIA)
+    return corners
+
+
+def cache_detection(img, corners):
+    DETECTION_CACHE[frame_key(img)] = corners
+
+
+def detect_all(images, workers=None):
+    """
+    Sarkok az összes képhez: a cache-ben lévőket (pl. rögzítéskor detektáltakat) újrahasznosítjuk,
+    a maradékot párhuzamosan, folyamat-poolban detektáljuk.
+    """
+    keys = [frame_key(img) for img in images]
+    pending = [i for i, k in enumerate(keys) if k not in DETECTION_CACHE]
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        if len(pending) == 1 or workers == 1:
+            found = [detect_corners(images[i]) for i in pending]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+                found = list(pool.map(detect_corners, (images[i] for i in pending)))
+        for i, corners in zip(pending, found):
+            DETECTION_CACHE[keys[i]] = corners
+    return [DETECTION_CACHE[k] for k in keys], len(images) - len(pending)
+
+
+class LiveDetector:
+    """
+    Háttérszálas sakktábla-detektálás az élőképhez.
+
+    Mindig csak a legutolsó beküldött frame-et dolgozza fel (a régebbieket eldobja),
+    lekicsinyített képen, CALIB_CB_FAST_CHECK-kel, így az előnézet nem akad meg.
+    Headless módban a detektálás állapotával jelölt előnézetet is ez a szál írja ki, ritkítva.
+    """
+
+    def __init__(self, preview_path=None, preview_interval_s=1.0):
+        self.preview_path = preview_path
+        self.preview_interval_s = preview_interval_s
+        self.found = False
+        self.frame_id = -1
+        self._latest = None
+        self._latest_id = -1
+        self._cond = threading.Condition()
+        self._running = True
+        self._last_preview = 0.0
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, frame_id):
+        with self._cond:
+            self._latest = frame
+            self._latest_id = frame_id
+            self._cond.notify()
+
+    def _loop(self):
+        done_id = -1
+        while True:
+            with self._cond:
+                while self._running and self._latest_id == done_id:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, done_id = self._latest, self._latest_id
+            corners = detect_corners(frame, fast_check=True, refine=False)
+            self.found = corners is not None
+            self.frame_id = done_id
+            if self.preview_path and time.time() - self._last_preview >= self.preview_interval_s:
+                self._write_preview(frame, corners)
+                self._last_preview = time.time()
+
+    def _write_preview(self, frame, corners):
+        preview = frame.copy()
+        if corners is not None:
+            cv2.drawChessboardCorners(preview, CHESSBOARD_SIZE, corners, True)
+        try:
+            cv2.imwrite(self.preview_path, preview)
+        except Exception:
+            pass
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+
+
+def _accept_frame(images, frame):
+    """Rögzítés előtt a konkrét frame-en teljes (finomított) detektálás, az eredményt cache-eljük."""
+    corners = detect_corners(frame)
+    if corners is None:
+        print("Sakktábla NEM található — a kép nem lett mentve.")
+        return False
+    images.append(frame.copy())
+    cache_detection(images[-1], corners)
+    print(f"Kép rögzítve! ({len(images)} db) — sakktábla DETEKTÁLVA")
+    return True
+
+
+def _capture_console(cam, detector, images, on_accept):
+    """
+    Konzolos vezérlés: az input() blokkol, ezért a kamerát külön szál olvassa és adja át
+    a detektornak, így a camera.png a prompt alatt is frissül.
+    """
+    latest = {}
+    stop = threading.Event()
+
+    def feed():
+        frame_id = 0
+        while not stop.is_set():
+            frame = cam.get_frame()
+            if frame is None:
+                time.sleep(0.1)
+                continue
+            frame_id += 1
+            latest['frame'] = frame
+            detector.submit(frame, frame_id)
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    try:
+        while True:
+            cmd = input("[Enter]=kép | 'q'=kilépés: ").strip().lower()
+            if cmd == 'q':
+                break
+            # Az Enter lenyomásakor a legfrissebb képet rögzítjük, nem a prompt előttit
+            frame = latest.get('frame')
+            if frame is None:
+                print("Hiba: Nem érkezik kép a kamerából.")
+                continue
+            if _accept_frame(images, frame) and on_accept and on_accept(images):
+                print("A kalibráció elérte a célpontosságot, rögzítés vége.")
+                break
+    finally:
+        stop.set()
+        feeder.join(timeout=1.0)
+
+
+def _capture_gui(phase_name, cam, detector, images, on_accept):
+    frame_id = 0
+    while True:
+        frame = cam.get_frame()
+        if frame is None:
+            print("Hiba: Nem érkezik kép a kamerából.")
+            time.sleep(1)
+            continue
+        frame_id += 1
+        detector.submit(frame, frame_id)
+
+        display_h = 600
+        h, w = frame.shape[:2]
+        ratio = display_h / h
+        display_frame = cv2.resize(frame, (int(w * ratio), int(h * ratio)))
+
+        found = detector.found
+        status_text = "Sakktábla: TALÁLT" if found else "Sakktábla: NINCS"
+        status_color = (0, 200, 0) if found else (0, 0, 255)
+        cv2.putText(display_frame, f"Kepek: {len(images)} | 'c': Foto | 'q': Kesz", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(display_frame, status_text, (10, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
+
+        cv2.imshow(f'Capture - {phase_name}', display_frame)
+
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('c'):
+            accepted = _accept_frame(images, frame)
+
+            inverted = cv2.bitwise_not(display_frame)
+            cv2.imshow(f'Capture - {phase_name}', inverted)
+            cv2.waitKey(50)
+
+            if accepted and on_accept and on_accept(images):
+                print("A kalibráció elérte a célpontosságot, rögzítés vége.")
+                break
+        elif key == ord('q'):
+            break
+        # A háttérben futó konvergencia-figyelő a két kép közötti időben is jelezhet
+        if getattr(on_accept, 'converged', False):
+            print("A kalibráció elérte a célpontosságot, rögzítés vége.")
+            break
+
+
+def capture_images(phase_name, cam, on_accept=None):
     """
     Képeket készít a kamerával.
+    on_accept(images) minden elfogadott kép után meghívódik; ha True-t ad, a rögzítés leáll.
     """
     images = []
 
@@ -85,65 +318,20 @@ def capture_images(phase_name, cam):
     if headless:
         print("GUI nem elérhető (nincs DISPLAY). Konzolos mód használata.")
         print("Enter: kép készítése | 'q' + Enter: kilépés")
+        print("Előnézet: camera.png (másodpercenként frissül)")
     else:
         print("Nyomj 'c'-t a kép készítéséhez.")
         print("Nyomj 'q'-t a befejezéshez.")
 
-    count = 0
-    while True:
-        frame = cam.get_frame()
-        if frame is None:
-            print("Hiba: Nem érkezik kép a kamerából.")
-            time.sleep(1)
-            continue
-
-        # Sakktábla detektálása minden frame-en, csak akkor engedünk mentést,
-        # ha valóban megtaláltuk a mintát.
-        gray_live = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-        ret_live, corners_live = cv2.findChessboardCorners(gray_live, CHESSBOARD_SIZE, None)
-
+    # Az élőkép detektálása háttérszálon fut, a ciklus a kamera teljes frame rate-jén halad
+    detector = LiveDetector(preview_path='camera.png' if headless else None)
+    try:
         if headless:
-            # Konzolos vezérlés
-            cv2.imwrite('camera.png', frame)
-            cmd = input("[Enter]=kép | 'q'=kilépés: ").strip().lower()
-            if cmd == 'q':
-                break
-            if ret_live:
-                images.append(frame.copy())
-                count += 1
-                print(f"Kép rögzítve! ({count} db) — sakktábla DETEKTÁLVA")
-            else:
-                print("Sakktábla NEM található — a kép nem lett mentve.")
+            _capture_console(cam, detector, images, on_accept)
         else:
-            display_h = 600
-            h, w = frame.shape[:2]
-            ratio = display_h / h
-            display_frame = cv2.resize(frame, (int(w * ratio), int(h * ratio)))
-
-            status_text = "Sakktábla: TALÁLT" if ret_live else "Sakktábla: NINCS"
-            status_color = (0, 200, 0) if ret_live else (0, 0, 255)
-            cv2.putText(display_frame, f"Kepek: {count} | 'c': Foto | 'q': Kesz", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            cv2.putText(display_frame, status_text, (10, 60),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
-
-            cv2.imshow(f'Capture - {phase_name}', display_frame)
-
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('c'):
-                if ret_live:
-                    images.append(frame.copy())
-                    count += 1
-                    print(f"Kép rögzítve! ({count} db) — sakktábla DETEKTÁLVA")
-                else:
-                    print("Sakktábla NEM található — a kép nem lett mentve.")
-
-                inverted = cv2.bitwise_not(display_frame)
-                cv2.imshow(f'Capture - {phase_name}', inverted)
-                cv2.waitKey(50)
-
-            elif key == ord('q'):
-                break
+            _capture_gui(phase_name, cam, detector, images, on_accept)
+    finally:
+        detector.stop()
 
     cam.release()
     # Csak akkor csukjuk be az ablakokat, ha volt GUI
@@ -152,15 +340,17 @@ def capture_images(phase_name, cam):
     return images
 
 
-def calibrate_system(images, phase_name):
+def run_calibration(images, phase_name, workers=None, verbose=True):
     """
     Végrehajtja a sakktáblás kalibrációt.
+    Visszatérés: dict (camera_matrix, dist_coeffs, image_size, rms, n_images, std_fx, std_fy) vagy None.
     """
+    log = print if verbose else (lambda *args, **kwargs: None)
     if len(images) == 0:
         print(f"Hiba: Nincs kép a {phase_name} fázishoz.")
         return None
 
-    print(f"\nKalibráció futtatása ({phase_name})... Képek száma: {len(images)}")
+    log(f"\nKalibráció futtatása ({phase_name})... Képek száma: {len(images)}")
 
     objp = np.zeros((CHESSBOARD_SIZE[0] * CHESSBOARD_SIZE[1], 3), np.float32)
     objp[:, :2] = np.mgrid[0:CHESSBOARD_SIZE[0], 0:CHESSBOARD_SIZE[1]].T.reshape(-1, 2)
@@ -168,41 +358,105 @@ def calibrate_system(images, phase_name):
 
     objpoints = []
     imgpoints = []
-    gray = None
+    image_size = images[0].shape[1::-1]
     found_count = 0
 
-    for i, img in enumerate(images):
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        ret, corners = cv2.findChessboardCorners(gray, CHESSBOARD_SIZE, None)
+    t0 = time.time()
+    all_corners, cached = detect_all(images, workers=workers)
+    log(f"Sarokdetektálás: {time.time() - t0:.2f} s ({cached} kép a rögzítéskori cache-ből)")
 
-        if ret:
+    for i, corners in enumerate(all_corners):
+        if corners is not None:
             objpoints.append(objp)
-            corners2 = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), CRITERIA)
-            imgpoints.append(corners2)
+            imgpoints.append(corners)
             found_count += 1
-            print(f"  [{i+1}/{len(images)}] Sakktábla OK")
+            log(f"  [{i+1}/{len(images)}] Sakktábla OK")
         else:
-            print(f"  [{i+1}/{len(images)}] Sakktábla NEM található")
+            log(f"  [{i+1}/{len(images)}] Sakktábla NEM található")
 
     if found_count == 0:
         print(f"Hiba: Nem találtam sakktáblát egy képen sem a {phase_name} fázisban.")
         return None
 
-    print("Kamera paraméterek számolása...")
-    ret, mtx, dist, rvecs, tvecs = cv2.calibrateCamera(objpoints, imgpoints, gray.shape[::-1], None, None)
+    log("Kamera paraméterek számolása...")
+    # Az Extended változat a belső paraméterek szórását is megadja (fx, fy, cx, cy, k1, ...)
+    ret, mtx, dist, rvecs, tvecs, std_intrinsics, _, _ = cv2.calibrateCameraExtended(
+        objpoints, imgpoints, image_size, None, None)
 
     if ret:
-        print(f"Sikeres kalibráció: {phase_name}")
-        print(f"Fx: {mtx[0, 0]:.2f}, Fy: {mtx[1, 1]:.2f} (pixel)")
-        return mtx
+        std_intrinsics = np.asarray(std_intrinsics).ravel()
+        log(f"Sikeres kalibráció: {phase_name}")
+        log(f"Fx: {mtx[0, 0]:.2f} ± {std_intrinsics[0]:.2f}, Fy: {mtx[1, 1]:.2f} ± {std_intrinsics[1]:.2f} (pixel)")
+        return {
+            'camera_matrix': mtx,
+            'dist_coeffs': dist,
+            'image_size': tuple(int(v) for v in image_size),
+            'rms': float(ret),
+            'n_images': found_count,
+            'std_fx': float(std_intrinsics[0]),
+            'std_fy': float(std_intrinsics[1]),
+        }
     else:
         print(f"Hiba: A kalibráció sikertelen ({phase_name}).")
         return None
 
 
+def calibrate_system(images, phase_name, workers=None):
+    """
+    Végrehajtja a sakktáblás kalibrációt, a kamera mátrixot adja vissza.
+    """
+    result = run_calibration(images, phase_name, workers=workers)
+    return result['camera_matrix'] if result is not None else None
+
+
+def save_intrinsics(path, result):
+    """Kamera mátrix, torzítási együtthatók és felbontás mentése YAML-be."""
+    data = {
+        'camera_matrix': np.asarray(result['camera_matrix']).tolist(),
+        'dist_coeffs': np.asarray(result['dist_coeffs']).ravel().tolist(),
+        'image_size': list(result['image_size']),
+        'rms': result['rms'],
+        'n_images': result['n_images'],
+        'std_fx': result.get('std_fx'),
+        'std_fy': result.get('std_fy'),
+        'pixel_size_mm': SENSOR_PIXEL_SIZE_MM,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(path, "w") as f:
+        yaml.dump(data, f)
+
+
+def load_intrinsics(path, image_size=None):
+    """
+    Korábbi kalibráció betöltése. Ha image_size adott és a fájlban tárolt felbontás eltér,
+    None-t ad (a mátrix pixelben értendő, más felbontáshoz nem használható).
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        data = yaml.safe_load(f) or {}
+    if 'camera_matrix' not in data:
+        return None
+    stored_size = tuple(data['image_size']) if data.get('image_size') else None
+    if image_size is not None and stored_size is not None and tuple(image_size) != stored_size:
+        print(f"A tárolt kalibráció felbontása ({stored_size}) eltér a képekétől ({tuple(image_size)}), újrakalibrálás.")
+        return None
+    if image_size is not None and stored_size is None:
+        print(f"FIGYELEM: {path} nem tartalmaz felbontás adatot, felbontás-egyezés nem ellenőrizhető.")
+    return {
+        'camera_matrix': np.array(data['camera_matrix']),
+        'dist_coeffs': np.array(data.get('dist_coeffs', [])),
+        'image_size': stored_size,
+        'rms': data.get('rms'),
+        'n_images': data.get('n_images'),
+        'std_fx': data.get('std_fx'),
+        'std_fy': data.get('std_fy'),
+    }
+
+
 def calculate_lens_focal_length(mtx_cam, mtx_sys, d_mm, pixel_size_mm):
     """
-    Kiszámítja az ismeretlen lencse fókusztávolságát.
+    Kiszámítja az ismeretlen lencse fókusztávolságát (mm), None ha nem számolható.
     """
     f_cam_pix = (mtx_cam[0, 0] + mtx_cam[1, 1]) / 2.0
     f_sys_pix = (mtx_sys[0, 0] + mtx_sys[1, 1]) / 2.0
@@ -218,7 +472,7 @@ def calculate_lens_focal_length(mtx_cam, mtx_sys, d_mm, pixel_size_mm):
 
     if abs(f_cam_mm - f_sys_mm) < 0.001:
         print("Nincs érzékelhető változás a fókusztávolságban.")
-        return
+        return None
 
     try:
         # f_lens = (f_sys * (f_cam - d)) / (f_cam - f_sys)
@@ -233,9 +487,235 @@ def calculate_lens_focal_length(mtx_cam, mtx_sys, d_mm, pixel_size_mm):
 
         diopter = 1000 / f_lens_mm
         print(f"Lencse erőssége: {diopter:.2f} Dioptria")
+        return f_lens_mm
 
     except ZeroDivisionError:
         print("Hiba: Osztás nullával.")
+        return None
+
+
+def focal_std_mm(result, pixel_size_mm):
+    """Az átlagolt fókusz (fx+fy)/2 szórása mm-ben (fx, fy függetlennek tekintve)."""
+    sfx = result.get('std_fx') or 0.0
+    sfy = result.get('std_fy') or 0.0
+    return 0.5 * float(np.hypot(sfx, sfy)) * pixel_size_mm
+
+
+def lens_focal_length_std(cam_result, sys_result, d_mm, pixel_size_mm):
+    """
+    A calculate_lens_focal_length eredményének szórása hibaterjedéssel.
+
+    f = b (a - d) / (a - b), ahol a = f_cam, b = f_sys:
+    df/da = b (d - b) / (a - b)^2,  df/db = a (a - d) / (a - b)^2
+    """
+    a = (cam_result['camera_matrix'][0, 0] + cam_result['camera_matrix'][1, 1]) / 2.0 * pixel_size_mm
+    b = (sys_result['camera_matrix'][0, 0] + sys_result['camera_matrix'][1, 1]) / 2.0 * pixel_size_mm
+    if abs(a - b) < 1e-9:
+        return float('inf')
+    da = b * (d_mm - b) / (a - b) ** 2
+    db = a * (a - d_mm) / (a - b) ** 2
+    return float(np.hypot(da * focal_std_mm(cam_result, pixel_size_mm), db * focal_std_mm(sys_result, pixel_size_mm)))
+
+
+class ConvergenceMonitor:
+    """
+    Elfogadott képek után újrakalibrál (a sarkok a cache-ből jönnek) és jelzi,
+    ha a becsült bizonytalanság a cél alá csökkent.
+
+    A kalibráció háttérszálon fut, egyszerre legfeljebb egy; a közben érkező képek a következő
+    futásba kerülnek, így a rögzítés és az előnézet nem akad meg. A legutóbbi eredmény a `result`.
+
+    reference=None: referencia fázis, a kamera fókusz relatív szórását figyeli.
+    Egyébként a lencse fókusztávolságának terjesztett szórását (mm) veti össze a céllal.
+    """
+
+    def __init__(self, phase_name, reference=None, d_mm=DISTANCE_LENS_CAM_MM, pixel_size_mm=SENSOR_PIXEL_SIZE_MM,
+                 target_mm=FOCAL_STD_TARGET_MM, target_rel=REFERENCE_REL_STD_TARGET, min_images=MIN_CALIB_IMAGES):
+        self.phase_name = phase_name
+        self.reference = reference
+        self.d_mm = d_mm
+        self.pixel_size_mm = pixel_size_mm
+        self.target_mm = target_mm
+        self.target_rel = target_rel
+        self.min_images = min_images
+        self.result = None
+        # Ennyi képből készült a `result`
+        self.result_images = 0
+        self.converged = False
+        self._pending = None
+        self._busy = False
+        self._cond = threading.Condition()
+        if reference is not None and reference.get('std_fx') is None:
+            print("FIGYELEM: a referencia kalibrációhoz nincs szórás adat, csak a lencsés fázis bizonytalanságát vesszük figyelembe.")
+
+    def __call__(self, images):
+        """Beütemezi az újrakalibrálást és azonnal visszatér; True, ha már elértük a célt."""
+        if len(images) < self.min_images:
+            return self.converged
+        with self._cond:
+            self._pending = list(images)
+            if not self._busy:
+                self._busy = True
+                threading.Thread(target=self._worker, daemon=True).start()
+            return self.converged
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                images, self._pending = self._pending, None
+                if images is None:
+                    self._busy = False
+                    self._cond.notify_all()
+                    return
+            result = run_calibration(images, self.phase_name, workers=1, verbose=False)
+            if result is None:
+                continue
+            converged = self._check(result)
+            with self._cond:
+                self.result = result
+                self.result_images = len(images)
+                self.converged = converged
+
+    def _check(self, result):
+        if self.reference is None:
+            f_pix = (result['camera_matrix'][0, 0] + result['camera_matrix'][1, 1]) / 2.0
+            rel = focal_std_mm(result, 1.0) / f_pix
+            print(f"  Konvergencia: f_cam relatív szórás {rel * 100:.3f}% (cél {self.target_rel * 100:.3f}%)")
+            return rel <= self.target_rel
+        sigma = lens_focal_length_std(self.reference, result, self.d_mm, self.pixel_size_mm)
+        print(f"  Konvergencia: lencse fókusz szórás ±{sigma:.3f} mm (cél ±{self.target_mm:.3f} mm)")
+        return sigma <= self.target_mm
+
+    def wait(self, timeout=None):
+        """Megvárja a futó (és a sorban álló) újrakalibrálást."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._busy, timeout)
+
+    def finish(self, images):
+        """
+        Végső kalibráció: a monitor legutóbbi eredménye, ha az összes képet lefedi,
+        különben (pl. kevés kép, vagy a cél elérése után is rögzítettünk) egy teljes futás.
+        """
+        self.wait()
+        if self.result_images != len(images) and len(images) >= self.min_images:
+            self(images)
+            self.wait()
+        if self.result is not None and self.result_images == len(images):
+            result = self.result
+            print(f"\nKalibráció ({self.phase_name}): {len(images)} kép, a konvergencia-figyelő eredménye")
+            print(f"Fx: {result['camera_matrix'][0, 0]:.2f} ± {result['std_fx']:.2f}, "
+                  f"Fy: {result['camera_matrix'][1, 1]:.2f} ± {result['std_fy']:.2f} (pixel)")
+            return result
+        return run_calibration(images, self.phase_name)
+
+
+# --- BATCH (HEADLESS) MÓD ---
+
+IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg', '*.bmp', '*.tif', '*.tiff')
+
+
+def load_image_dir(path):
+    files = sorted(f for pattern in IMAGE_PATTERNS for f in glob.glob(os.path.join(path, pattern)))
+    images = []
+    for f in files:
+        img = cv2.imread(f, cv2.IMREAD_COLOR)
+        if img is None:
+            print(f"  Nem olvasható kép: {f}")
+            continue
+        images.append(img)
+    return images
+
+
+def _calibrate_dir(job):
+    """Folyamat-pool feladat: egy könyvtár képeinek kalibrálása (a detektálás itt soros)."""
+    name, path = job
+    images = load_image_dir(path)
+    return name, run_calibration(images, name, workers=1)
+
+
+def run_batch(reference_dir, lens_dirs, output, distance_mm=DISTANCE_LENS_CAM_MM,
+              intrinsics_file=OUTPUT_FILE, workers=None):
+    """
+    Rögzített képkönyvtárak feldolgozása emberi beavatkozás nélkül.
+
+    reference_dir: lencse nélküli képek (csak akkor kalibráljuk, ha nincs érvényes intrinsics_file)
+    lens_dirs: {lencse neve: képkönyvtár}
+    A lencsénkénti kalibrációk párhuzamosan futnak, az eredmény CSV-be kerül.
+    """
+    jobs = sorted(lens_dirs.items())
+    ref_images = load_image_dir(reference_dir) if reference_dir else []
+    ref_size = ref_images[0].shape[1::-1] if ref_images else None
+    reference = load_intrinsics(intrinsics_file, ref_size)
+    if reference is not None:
+        print(f"Referencia kamera mátrix betöltve: {intrinsics_file}")
+    elif not ref_images:
+        print("Hiba: Nincs érvényes referencia kalibráció és referencia kép sem.")
+        return None
+    else:
+        jobs.insert(0, ('__reference__', reference_dir))
+
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        for name, result in pool.map(_calibrate_dir, jobs):
+            results[name] = result
+
+    if '__reference__' in results:
+        reference = results.pop('__reference__')
+        if reference is None:
+            print("Hiba: A referencia kalibráció sikertelen.")
+            return None
+        save_intrinsics(intrinsics_file, reference)
+        print(f"Referencia kalibráció elmentve ide: {intrinsics_file}")
+
+    rows = []
+    for name in sorted(results):
+        result = results[name]
+        if result is None:
+            print(f"Hiba: {name} kalibrációja sikertelen, kihagyva.")
+            continue
+        if reference['image_size'] and tuple(result['image_size']) != tuple(reference['image_size']):
+            print(f"Hiba: {name} képeinek felbontása eltér a referenciától, kihagyva.")
+            continue
+        print(f"\n=== Lencse: {name} ===")
+        f_lens = calculate_lens_focal_length(reference['camera_matrix'], result['camera_matrix'], distance_mm, SENSOR_PIXEL_SIZE_MM)
+        sigma = lens_focal_length_std(reference, result, distance_mm, SENSOR_PIXEL_SIZE_MM) if f_lens is not None else None
+        rows.append((name, result['n_images'], result['rms'], f_lens, sigma))
+
+    with open(output, 'w') as f:
+        f.write("lens,n_images,rms_px,focal_length_mm,focal_length_std_mm\n")
+        for name, n, rms, f_lens, sigma in rows:
+            f.write(f"{name},{n},{rms:.4f},{'' if f_lens is None else f'{f_lens:.4f}'},{'' if sigma is None else f'{sigma:.4f}'}\n")
+    print(f"\nEredmények elmentve ide: {output}")
+    return rows
+
+
+def batch_main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description="Fókusztávolság számítás rögzített képkönyvtárakból (headless)")
+    p.add_argument("--reference", default=None, help="Lencse nélküli képek könyvtára (ha nincs érvényes intrinsics fájl)")
+    p.add_argument("--lens", action="append", default=[], metavar="NÉV=KÖNYVTÁR", help="Lencsés képek könyvtára, ismételhető")
+    p.add_argument("--lenses-root", default=None, help="Könyvtár, amelynek minden alkönyvtára egy lencse képeit tartalmazza")
+    p.add_argument("--output", default="cv_results.csv")
+    p.add_argument("--distance-mm", type=float, default=DISTANCE_LENS_CAM_MM)
+    p.add_argument("--intrinsics", default=OUTPUT_FILE, help="Kamera intrinsics YAML (cache)")
+    p.add_argument("--workers", type=int, default=None)
+    a = p.parse_args(argv)
+
+    lens_dirs = {}
+    for item in a.lens:
+        name, _, path = item.partition("=")
+        if not path:
+            p.error(f"--lens formátuma NÉV=KÖNYVTÁR, kapott: {item}")
+        lens_dirs[name] = path
+    if a.lenses_root:
+        for d in sorted(os.listdir(a.lenses_root)):
+            full = os.path.join(a.lenses_root, d)
+            if os.path.isdir(full) and (a.reference is None or os.path.abspath(full) != os.path.abspath(a.reference)):
+                lens_dirs.setdefault(d, full)
+    if not lens_dirs:
+        p.error("Legalább egy --lens vagy --lenses-root szükséges")
+    run_batch(a.reference, lens_dirs, a.output, a.distance_mm, a.intrinsics, a.workers)
 
 
 def main():
@@ -243,28 +723,30 @@ def main():
     cam = CameraHandler()
 
     mtx_cam = None
+    result_cam = None
 
     # --- 1. LÉPÉS: ALAP KAMERA ---
     if os.path.exists(OUTPUT_FILE):
         print(f"\nTaláltam korábbi kalibrációs fájlt: {OUTPUT_FILE}")
         choice = input("Szeretnéd ezt használni a 'Meztelen' kamerához? (i/n): ").strip().lower()
         if choice == 'i':
-            with open(OUTPUT_FILE, 'r') as f:
-                data = yaml.safe_load(f)
-                mtx_cam = np.array(data['camera_matrix'])
+            stored = load_intrinsics(OUTPUT_FILE)
+            if stored is not None:
+                result_cam = stored
+                mtx_cam = stored['camera_matrix']
                 print("Meglévő kamera mátrix betöltve.")
 
     if mtx_cam is None:
         print("\n--- 1. LÉPÉS: Kalibráljuk a PI KAMERÁT lencse NÉLKÜL ---")
         input("Győződj meg róla, hogy NINCS plusz lencse a kamera előtt. Nyomj Entert...")
-        imgs_cam = capture_images("KAMERA_ONLY", cam)
-        mtx_cam = calibrate_system(imgs_cam, "KAMERA_ONLY")
+        monitor = ConvergenceMonitor("KAMERA_ONLY")
+        imgs_cam = capture_images("KAMERA_ONLY", cam, on_accept=monitor)
+        result_cam = monitor.finish(imgs_cam)
 
-        if mtx_cam is not None:
-            data = {'camera_matrix': mtx_cam.tolist()}
-            with open(OUTPUT_FILE, "w") as f:
-                yaml.dump(data, f)
-                print(f"Kamera mátrix elmentve ide: {OUTPUT_FILE}")
+        if result_cam is not None:
+            mtx_cam = result_cam['camera_matrix']
+            save_intrinsics(OUTPUT_FILE, result_cam)
+            print(f"Kamera mátrix elmentve ide: {OUTPUT_FILE}")
 
     if mtx_cam is None:
         print("Hiba: Nincs alap mátrix. Kilépés.")
@@ -275,16 +757,23 @@ def main():
     print(f"Kérlek, helyezd az ismeretlen lencsét a Pi Camera elé {DISTANCE_LENS_CAM_MM} mm távolságra.")
     input("Ha készen állsz, nyomj Entert...")
 
-    imgs_sys = capture_images("RENDSZER_LENS", cam)
-    mtx_sys = calibrate_system(imgs_sys, "RENDSZER_LENS")
+    monitor = ConvergenceMonitor("RENDSZER_LENS", reference=result_cam)
+    imgs_sys = capture_images("RENDSZER_LENS", cam, on_accept=monitor)
+    result_sys = monitor.finish(imgs_sys)
 
-    if mtx_sys is None:
+    if result_sys is None:
         print("Hiba: Nincs rendszer mátrix. Kilépés.")
         return
 
     # --- 3. LÉPÉS: SZÁMÍTÁS ---
-    calculate_lens_focal_length(mtx_cam, mtx_sys, DISTANCE_LENS_CAM_MM, SENSOR_PIXEL_SIZE_MM)
+    f_lens = calculate_lens_focal_length(mtx_cam, result_sys['camera_matrix'], DISTANCE_LENS_CAM_MM, SENSOR_PIXEL_SIZE_MM)
+    if f_lens is not None:
+        sigma = lens_focal_length_std(result_cam, result_sys, DISTANCE_LENS_CAM_MM, SENSOR_PIXEL_SIZE_MM)
+        print(f"Becsült bizonytalanság: ±{sigma:.2f} mm ({len(imgs_sys)} kép)")
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch_main(sys.argv[2:])
+    else:
+        main()
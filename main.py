@@ -1,36 +1,102 @@
 import argparse
+import contextlib
+import io
+import json
+import statistics
+import threading
 import time
 import os
-import requests
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from typing import Tuple
 
-from measurement.motor_control import StepperMotor
-from measurement.endstop import Endstop
-from measurement.voltage_sensor import VoltageSensor
-from measurement.camera_sensor import CameraSensor
-from measurement.config import cfg
+from measurement.config import DEFAULT_RIG, RigSettings, default_rig, load_rigs
+from measurement.estop import EmergencyStop
+from measurement.calibration import load_calibration, save_calibration
+from measurement.peak import refine_peak, trace_peak
+from measurement.metrics import MetricsServer, registry, tracer
+from measurement.results_db import RESULTS_DB, ResultsStore, RunRecord
+from measurement.registry import endstops, motors, sensors as sensor_registry
+from measurement.settle import wait_settled
+from measurement.startup import InitError, InitPipeline
+from measurement.replay import ReplayEndstop, ReplayMotor, ReplayProfile, ReplayResult, ReplaySensor, SimClock
 
 
 class ApiClient:
-    def __init__(self, base_url: str | None = None, api_key: str | None = None):
-        self.base_url = base_url or os.environ.get("API_BASE_URL", "http://raspberrypi.local:5000")
+    def __init__(self, base_url: str | None = None, api_key: str | None = None, transport: str | None = None,
+                 ipc_path: str | None = None, rig: str | None = None):
+        # None -> API_BASE_URL, "" -> no web server
+        self.base_url = os.environ.get("API_BASE_URL", "http://raspberrypi.local:5000") if base_url is None else base_url
         self.api_key = api_key or os.environ.get("API_UPDATE_KEY", "dev-secret")
         self.enabled = bool(self.base_url)
+        # "auto" uses the web server's Unix socket when it exists on this host, else HTTP
+        self.transport = transport or os.environ.get("API_TRANSPORT", "auto")
+        if self.transport not in ("auto", "ipc", "http"):
+            raise ValueError(f"unknown API transport {self.transport!r}")
+        self.ipc_path = ipc_path
+        self._ipc_client = None
+        # Rig whose state this client reads and writes (None: the single default rig)
+        self.rig = rig
+
+    @staticmethod
+    def _http():
+        # Imported on first use so standalone runs never load requests
+        import requests
+        return requests
+
+    def _ipc(self):
+        if self.transport == "http":
+            return None
+        if self._ipc_client is None:
+            from measurement import ipc
+            path = self.ipc_path or ipc.DEFAULT_SOCKET
+            if self.transport == "auto" and not ipc.socket_available(path):
+                return None
+            self._ipc_client = ipc.IpcClient(path)
+        return self._ipc_client
+
+    def _ipc_failed(self):
+        # Web server restarted or moved: drop the socket and re-detect on the next call
+        if self._ipc_client is not None:
+            self._ipc_client.close()
+        self._ipc_client = None
 
     def update(self, payload: dict, timeout: float = 1.5) -> None:
         if not self.enabled:
             return
+        if self.rig:
+            payload = dict(payload, rig=self.rig)
+        client = self._ipc()
+        if client is not None:
+            try:
+                with tracer.span("api_update"):
+                    client.update(payload, timeout=timeout)
+                return
+            except Exception:
+                self._ipc_failed()
+                if self.transport == "ipc":
+                    return
         try:
-            requests.post(f"{self.base_url}/api/update", json=payload, headers={"X-API-Key": self.api_key}, timeout=timeout)
+            with tracer.span("api_update"):
+                self._http().post(f"{self.base_url}/api/update", json=payload, headers={"X-API-Key": self.api_key}, timeout=timeout)
         except Exception:
             pass
 
     def get_status(self, timeout: float = 1.5) -> dict | None:
         if not self.enabled:
             return None
+        client = self._ipc()
+        if client is not None:
+            try:
+                with tracer.span("api_status"):
+                    return client.get_status(timeout=timeout, rig=self.rig)
+            except Exception:
+                self._ipc_failed()
+                if self.transport == "ipc":
+                    return None
         try:
-            r = requests.get(f"{self.base_url}/api/status", timeout=timeout)
+            with tracer.span("api_status"):
+                r = self._http().get(f"{self.base_url}/api/status", params={"rig": self.rig} if self.rig else None,
+                                     timeout=timeout)
             if r.status_code == 200:
                 return r.json()
         except Exception:
@@ -38,72 +104,337 @@ class ApiClient:
         return None
 
 
+# Search parameters tuned by tuner.py and stored in the profile file
+SEARCH_PARAMS = ("coarse_step_mm", "fine_step_mm", "max_swings", "hysteresis", "steps_threshold")
+PROFILE_FILE = os.environ.get(
+    "MEASUREMENT_PROFILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_profile.json")
+)
+
+
+def load_profile(path: str) -> dict:
+    """Search parameters stored in a profile file (SEARCH_PARAMS keys only; {} if there is none)."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"PROFILE WARNING: Unable to read {path}: {e}")
+        return {}
+    return {k: data[k] for k in SEARCH_PARAMS if isinstance(data, dict) and k in data}
+
+
+def save_profile(settings: dict, path: str) -> dict:
+    """Replace the profile file with the SEARCH_PARAMS keys of `settings` (nothing else is kept)."""
+    profile = {k: settings[k] for k in SEARCH_PARAMS if k in settings}
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return profile
+
+
 @dataclass
 class MeasurementParams:
     lead_mm: float = 8.0
     laser_offset_mm: float = 33.0
     sensor_offset_mm: float = 131.0
     max_travel_mm: float = 280.0
+    holder_width_mm: float = 5.0
     coarse_step_mm: float = 3.0
     fine_step_mm: float = 0.2
-    max_swings: int = 3
-    hysteresis: float = 0.05
-    steps_threshold: float = 20.0
+    max_swings: int = 5
+    hysteresis: float = 0.02
+    steps_threshold: float = 15.0
     sensor: str = "voltage"
+    focus_mode: str | None = None
+    focus_deadband: float = 0.05
+    lens: str | None = None
+    results_db: str = RESULTS_DB
+    repeats: int = 1
+    local_window_mm: float = 4.0
+    local_step_mm: float = 0.2
+    filters: str = ""
 
     @classmethod
-    def from_args(cls) -> "MeasurementParams":
-        p = argparse.ArgumentParser(description="Lens focal length measurement")
-        p.add_argument("--lead-mm", type=float, default=8.0, help="Lead of screw (mm per rev)")
-        p.add_argument("--laser-offset-mm", type=float, default=33.0)
-        p.add_argument("--sensor-offset-mm", type=float, default=131.0)
-        p.add_argument("--max-travel-mm", type=float, default=280.0)
-        p.add_argument("--coarse-step-mm", type=float, default=3.0)
-        p.add_argument("--fine-step-mm", type=float, default=0.2)
-        p.add_argument("--max-swings", type=int, default=5)
-        p.add_argument("--hysteresis", type=float, default=0.02, help="Voltage drop to trigger reversal")
-        p.add_argument("--steps-threshold", type=float, default=15.0, help="Distance in mm without improvement before reversing; halved after each swing")
+    def from_args(cls, argv: list | None = None, parents: tuple = ()) -> "MeasurementParams":
+        """
+        Parse the command line. Defaults come from the dataclass, overridden by the search
+        profile file (see PROFILE_FILE / --profile), overridden by explicit flags.
+        parents: parsers of the other flags allowed on the same command line (e.g. App.parser());
+        a flag that none of them knows is an error.
+        """
+        pre = argparse.ArgumentParser(add_help=False)
+        pre.add_argument("--profile", default=PROFILE_FILE)
+        profile_path = pre.parse_known_args(argv)[0].profile
+        d = cls()
+        p = argparse.ArgumentParser(description="Lens focal length measurement", parents=list(parents))
+        p.add_argument("--profile", default=PROFILE_FILE,
+                       help="JSON file with tuned search parameters (written by tuner.py); '' disables it")
+        p.add_argument("--lead-mm", type=float, default=d.lead_mm, help="Lead of screw (mm per rev)")
+        p.add_argument("--laser-offset-mm", type=float, default=d.laser_offset_mm)
+        p.add_argument("--sensor-offset-mm", type=float, default=d.sensor_offset_mm)
+        p.add_argument("--max-travel-mm", type=float, default=d.max_travel_mm)
+        p.add_argument("--holder-width-mm", type=float, default=d.holder_width_mm, help="Lens holder width compensation")
+        p.add_argument("--coarse-step-mm", type=float, default=d.coarse_step_mm)
+        p.add_argument("--fine-step-mm", type=float, default=d.fine_step_mm)
+        p.add_argument("--max-swings", type=int, default=d.max_swings)
+        p.add_argument("--hysteresis", type=float, default=d.hysteresis, help="Voltage drop to trigger reversal")
+        p.add_argument("--steps-threshold", type=float, default=d.steps_threshold, help="Distance in mm without improvement before reversing; halved after each swing")
         p.add_argument(
             "--sensor",
-            choices=["voltage", "camera"],
-            default="voltage",
-            help="Select the sensor backend: 'voltage' or 'camera'",
+            choices=sensor_registry.names() + ["both"],
+            default=d.sensor,
+            help=f"Select the sensor backend: {sensor_registry.describe()} or 'both' (voltage and camera sampled in one pass, voltage drives the search)",
         )
+        p.add_argument("--focus-mode", choices=["split", "quad"], default=None,
+                       help="Use a split/quadrant photodiode focus error signal to pick the search direction (voltage sensor)")
+        p.add_argument("--focus-deadband", type=float, default=d.focus_deadband, help="Normalized focus error treated as 'at focus'")
+        p.add_argument("--lens", default=None, help="Lens identifier stored with the results (e.g. nominal focal length '10')")
+        p.add_argument("--results-db", default=RESULTS_DB, help="SQLite results database ('' disables recording)")
+        p.add_argument("--repeat", type=int, default=1,
+                       help="Number of measurements per lens: one full scan, then N-1 local scans around its peak")
+        p.add_argument("--local-window-mm", type=float, default=d.local_window_mm, help="Width of the local scan window around the peak")
+        p.add_argument("--local-step-mm", type=float, default=d.local_step_mm, help="Step of the local scans")
+        p.add_argument("--filters", default=d.filters,
+                       help="Online filter chain applied to every sensor sample, e.g. 'reject:4,median:5,ema:0.3'")
+        if profile_path:
+            p.set_defaults(**load_profile(profile_path))
 
-        a = p.parse_args()
+        a = p.parse_args(argv)
 
         return cls(
             lead_mm=a.lead_mm,
             laser_offset_mm=a.laser_offset_mm,
             sensor_offset_mm=a.sensor_offset_mm,
             max_travel_mm=a.max_travel_mm,
+            holder_width_mm=a.holder_width_mm,
             coarse_step_mm=a.coarse_step_mm,
             fine_step_mm=a.fine_step_mm,
             max_swings=a.max_swings,
             hysteresis=a.hysteresis,
             steps_threshold=a.steps_threshold,
             sensor=a.sensor,
+            focus_mode=a.focus_mode,
+            focus_deadband=a.focus_deadband,
+            lens=a.lens,
+            results_db=a.results_db,
+            repeats=max(1, a.repeat),
+            local_window_mm=a.local_window_mm,
+            local_step_mm=a.local_step_mm,
+            filters=a.filters,
         )
 
 
+# How long sensor bring-up may take until the first sample arrives
+SENSOR_START_TIMEOUT_S = 15.0
+
+# Minimum ADC channel sets for the focus sensing detector layouts
+FOCUS_CHANNELS = {"split": (0, 1), "quad": (0, 1, 2, 3)}
+
+
+def latency_key(sensor, filters: str = "") -> str:
+    # Smoothing filters add delay, so the latency belongs to the sensor configuration plus filter chain
+    key = f"latency_s.{sensor.config_key()}"
+    return f"{key}:{filters}" if filters else key
+
+
+def create_sensor(params: MeasurementParams, name: str, rig: RigSettings | None = None):
+    rig = rig or default_rig()
+    if name == "camera":
+        sensor = sensor_registry.create("camera", src=rig.camera)
+    elif name != "voltage":
+        sensor = sensor_registry.create(name)
+    else:
+        channels = rig.adc.channels
+        if params.focus_mode:
+            needed = FOCUS_CHANNELS[params.focus_mode]
+            if len(channels) < len(needed):
+                channels = needed
+        sensor = sensor_registry.create("voltage", i2c_addr=rig.adc.i2c_addr, channels=channels,
+                                        res_bits=rig.adc.res_bits, focus_mode=params.focus_mode)
+    sensor.owner = rig.name
+    return sensor
+
+
+def create_sensors(params: MeasurementParams, rig: RigSettings | None = None) -> dict:
+    """Sensors selected by params (not started), with their filter chain and calibrated latency."""
+    names = ["voltage", "camera"] if params.sensor == "both" else [params.sensor]
+    sensors = {name: create_sensor(params, name, rig) for name in names}
+    calibration = load_calibration()
+    for sensor in sensors.values():
+        sensor.set_filters(params.filters)
+        sensor.latency_s = float(calibration.get(latency_key(sensor, params.filters), 0.0))
+    return sensors
+
+
+def create_axis(rig: RigSettings | None = None) -> tuple:
+    """(motor, endstop, homestop) hardware drivers of a rig (default: cfg); their pins are claimed for the rig."""
+    rig = rig or default_rig()
+    m = rig.motor
+    motor = motors.create("stepper", step_pin=m.step_pin, dir_pin=m.dir_pin, enable_pin=m.enable_pin,
+                          backlash_mm=m.backlash_mm, rt_priority=m.rt_priority, cpu=m.cpu, owner=rig.name)
+    try:
+        endstop = endstops.create("gpio", pin=rig.endstop.pin, owner=rig.name)
+        try:
+            homestop = endstops.create("gpio", pin=rig.homestop.pin, owner=rig.name)
+        except Exception:
+            endstop.cleanup()
+            raise
+    except Exception:
+        motor.cleanup()
+        raise
+    return motor, endstop, homestop
+
+
 class MeasurementRunner:
-    def __init__(self, params: MeasurementParams, api: ApiClient):
+    def __init__(self, params: MeasurementParams, api: ApiClient, results: ResultsStore | None = None,
+                 motor=None, endstop=None, homestop=None, sensors: dict | None = None, clock=time,
+                 rig: RigSettings | None = None):
+        """
+        motor/endstop/homestop (injected together) and sensors default to the hardware drivers of `rig`
+        (default: cfg); pass stand-ins (e.g. measurement.replay) with a matching clock to run without it.
+        """
+        self.rig = rig or default_rig()
         self.params = params
         self.api = api
-        self.motor = StepperMotor(step_pin=cfg.motor.step_pin, dir_pin=cfg.motor.dir_pin, enable_pin=cfg.motor.enable_pin)
-        self.endstop = Endstop(pin=cfg.endstop.pin)
-        self.homestop = Endstop(pin=cfg.homestop.pin)
-        if self.params.sensor == "camera":
-            self.sensor = CameraSensor()
-        else:
-            self.sensor = VoltageSensor()
+        self.results = results
+        self.clock = clock
+        self.last_profile = None
+        self._run_started_at = 0.0
+        if motor is None:
+            motor, endstop, homestop = create_axis(self.rig)
+        self.motor = motor
+        self.endstop = endstop
+        self.homestop = homestop
+        # Commanded carriage position relative to home (mm)
+        self.pos_mm = 0.0
+        self.use_sensors(create_sensors(params, self.rig) if sensors is None else sensors)
+        # Latest settled reading per sensor and (pos_mm, settle_s, settled) of the primary sensor per read
+        self.last_readings = {}
+        self.settle_log = []
+
+    def use_sensors(self, sensors: dict):
+        """Active sensors by name; the first one drives the search."""
+        self.sensors = dict(sensors)
+        names = list(self.sensors)
+        self.primary = names[0] if names else None
+        self.sensor = self.sensors.get(self.primary)
+        # Raw (t, pos_mm, value) samples of the last search_peak per sensor, on a shared time/position base
+        self.traces = {name: [] for name in names}
+
+    def latency_key(self, sensor) -> str:
+        return latency_key(sensor, self.params.filters)
+
+    def focus_direction(self) -> int | None:
+        """Direction (+1/-1) towards focus from the focus error signal, None if unknown or already at focus."""
+        if not self.params.focus_mode:
+            return None
+        focus_error = getattr(self.sensor, "focus_error", None)
+        fe = focus_error() if focus_error else None
+        if fe is None or abs(fe) < self.params.focus_deadband:
+            return None
+        return self.rig.adc.focus_sign * (1 if fe > 0 else -1)
+
+    @property
+    def trace(self) -> list:
+        return self.traces[self.primary]
 
     def start(self):
-        self.sensor.start()
+        for sensor in self.sensors.values():
+            sensor.start()
 
     def stop(self):
-        self.sensor.stop()
+        for sensor in self.sensors.values():
+            sensor.stop()
         self.motor.cleanup()
+        self.endstop.cleanup()
+        self.homestop.cleanup()
+
+    def read_sensors(self, pos_mm: float) -> float:
+        """
+        Sample every active sensor with the same time/position stamp; return the primary sensor's value.
+        Each sensor is read as soon as its samples taken after the last move ended (plus its latency)
+        have settled, so the value belongs to the position the carriage is standing at. The readings
+        with their noise estimates are kept in last_readings, the settle times in settle_log.
+        """
+        move_end = self.motor.last_move_end
+        readings = {
+            name: wait_settled(sensor, move_end + sensor.latency_s, clock=self.clock, name=name)
+            for name, sensor in self.sensors.items()
+        }
+        t = self.clock.time()
+        for name, reading in readings.items():
+            self.traces[name].append((t, pos_mm, reading.value))
+        self.last_readings = readings
+        primary = readings[self.primary]
+        self.settle_log.append((pos_mm, primary.settle_s, primary.settled))
+        return primary.value
+
+    def settle_summary(self) -> dict:
+        """Settle statistics of the primary sensor over the last scan."""
+        times = sorted(s for _, s, _ in self.settle_log)
+        if not times:
+            return {}
+        return {
+            "settle_median_s": times[len(times) // 2],
+            "settle_max_s": times[-1],
+            "settle_total_s": sum(times),
+            "settle_timeouts": sum(1 for _, _, ok in self.settle_log if not ok),
+        }
+
+    def sweep_trace(self, sensor, direction: int, span_mm: float, speed_rps: float = 0.4) -> list:
+        """
+        Move span_mm in one go while the sensor free-runs, then map its samples to position.
+        Each sample stamped t is assigned the carriage position at t - sensor.latency_s.
+        Returns (t, pos_mm, value) tuples in runner coordinates.
+        """
+        offset = self.pos_mm - self.motor.position_mm
+        t_start = self.clock.time()
+        self.motor.set_direction(direction)
+        self.motor.move(dist_mm=span_mm, lead_mm=self.params.lead_mm, speed_rps=speed_rps)
+        self.pos_mm += direction * span_mm
+        t_end = self.motor.last_move_end
+        self.clock.sleep(sensor.latency_s)
+        samples = [(t, v) for t, v in sensor.get_history(since=t_start + sensor.latency_s) if t <= t_end + sensor.latency_s]
+        positions = self.motor.positions_at([t - sensor.latency_s for t, _ in samples])
+        return [(t, pos + offset, v) for (t, v), pos in zip(samples, positions)]
+
+    def calibrate_latency(self, peak_pos_mm: float, span_mm: float = 6.0, speed_rps: float = 0.4, repeats: int = 2) -> dict:
+        """
+        Measure each sensor's effective latency by sweeping the peak in both directions.
+
+        Mapped without latency correction, the peak appears shifted by v * latency in the
+        direction of travel, so latency = (forward peak - reverse peak) / (2 v).
+        Results are stored per sensor configuration in the calibration file.
+        """
+        velocity = speed_rps * self.params.lead_mm
+        half = span_mm / 2.0
+        latencies = {}
+        # An aborted calibration (e.g. emergency stop mid-sweep) leaves the previous latencies in place
+        previous = {name: sensor.latency_s for name, sensor in self.sensors.items()}
+        finished = False
+        try:
+            for name, sensor in self.sensors.items():
+                print(f"Calibrating latency of {name} sensor ({sensor.config_key()})...")
+                sensor.latency_s = 0.0
+                estimates = []
+                for i in range(repeats):
+                    self.move_to(peak_pos_mm - half)
+                    fwd = trace_peak(self.sweep_trace(sensor, 1, span_mm, speed_rps))[0]
+                    rev = trace_peak(self.sweep_trace(sensor, -1, span_mm, speed_rps))[0]
+                    estimates.append((fwd - rev) / (2.0 * velocity))
+                    print(f"  [{i+1}/{repeats}] forward peak {fwd:.3f} mm, reverse peak {rev:.3f} mm -> latency {estimates[-1] * 1000:.1f} ms")
+                sensor.latency_s = max(0.0, sum(estimates) / len(estimates))
+                latencies[self.latency_key(sensor)] = sensor.latency_s
+                print(f"Latency of {name} sensor: {sensor.latency_s * 1000:.1f} ms")
+            save_calibration(latencies)
+            finished = True
+        finally:
+            if not finished:
+                for name, sensor in self.sensors.items():
+                    sensor.latency_s = previous[name]
+        return latencies
 
     def check_stop(self) -> bool:
         """Return True if a stop command is requested by the web UI."""
@@ -113,28 +444,57 @@ class MeasurementRunner:
         cmd = state.get("desired_cmd")
         return cmd == "stop"
 
-    def home(self) -> None:
+    def home(self, cancel: threading.Event | None = None) -> None:
+        """cancel: stops homing before the next move once set (e.g. when start-up failed elsewhere)."""
+        with tracer.span("home"):
+            self._home(cancel)
+
+    def _home(self, cancel: threading.Event | None = None) -> None:
         self.api.update({"is_homing": True, "desired_cmd": None})
         print("Homing axis...")
         print("Waiting for homing button press...")
         self.motor.set_direction(-1)
-        last_check = time.time()
+        last_check = self.clock.time()
 
         while not self.homestop.is_pressed():
+            if cancel is not None and cancel.is_set():
+                print("Homing cancelled.")
+                self.api.update({"is_homing": False})
+                return
             # periodic stop check
-            if time.time() - last_check > 0.5:
+            if self.clock.time() - last_check > 0.5:
                 if self.check_stop():
                     print("Stop command received during homing; aborting.")
                     return
-                last_check = time.time()
+                last_check = self.clock.time()
             # time.sleep(0.05)
-            self.motor.move(dist_mm=1.0, lead_mm=self.params.lead_mm, speed_rps=0.4)
+            with tracer.span("move"):
+                self.motor.move(dist_mm=1.0, lead_mm=self.params.lead_mm, speed_rps=0.4)
 
-        self.motor.move(dist_mm=2.0, lead_mm=self.params.lead_mm, speed_rps=0.4)
+        with tracer.span("move"):
+            self.motor.move(dist_mm=2.0, lead_mm=self.params.lead_mm, speed_rps=0.4)
         self.api.update({"current_pos_mm": 0.0, "is_homing": False})
         self.motor.set_direction(1)
+        self.pos_mm = 0.0
 
     def search_peak(self) -> Tuple[float, float]:
+        self.traces = {name: [] for name in self.sensors}
+        self.settle_log = []
+        self._run_started_at = self.clock.time()
+        tracer.begin_run()
+        try:
+            with tracer.span("search"):
+                return self._search_peak()
+        finally:
+            run = self.last_profile = tracer.end_run()
+            if run is not None:
+                print(run.format())
+            settle = self.settle_summary()
+            if settle:
+                print(f"Settle: {len(self.settle_log)} reads, median {settle['settle_median_s'] * 1000:.1f} ms, "
+                      f"max {settle['settle_max_s'] * 1000:.1f} ms, timeouts {settle['settle_timeouts']}")
+
+    def _search_peak(self) -> Tuple[float, float]:
         print("Searching peak...")
         best_val = -1.0
         best_pos_mm = 0.0
@@ -145,22 +505,23 @@ class MeasurementRunner:
         step = self.params.coarse_step_mm
         wrong_distance_mm = 0.0
         current_threshold_mm = float(self.params.steps_threshold)
-        lastupdate = time.time()
+        lastupdate = self.clock.time()
 
         while swings < self.params.max_swings and pos_mm < self.params.max_travel_mm:
             # if pos_mm + direction * step > self.params.max_travel_mm or pos_mm + direction * step <= 0:
             #     break
 
-            self.motor.move(dist_mm=step, lead_mm=self.params.lead_mm, speed_rps=0.4)
+            with tracer.span("move"):
+                self.motor.move(dist_mm=step, lead_mm=self.params.lead_mm, speed_rps=0.4)
             if self.endstop.is_pressed():
                 print("Endstop pressed during scan; stopping movement.")
                 self.api.update({"is_running": False})
                 break
             pos_mm += direction * step
-            time.sleep(0.05)
+            with tracer.span("settle"):
+                val = self.read_sensors(pos_mm)
             # check stop command from web
-            val = self.sensor.get_value()
-            if time.time() - lastupdate > 0.5:
+            if self.clock.time() - lastupdate > 0.5:
                 if self.check_stop():
                     print("Stop command received; aborting.")
                     break
@@ -171,7 +532,7 @@ class MeasurementRunner:
                     "best_value": best_val,
                     "is_running": True
                 })
-                lastupdate = time.time()
+                lastupdate = self.clock.time()
             if val > best_val:
                 best_val = val
                 best_pos_mm = pos_mm
@@ -180,6 +541,12 @@ class MeasurementRunner:
             elif best_val - val > self.params.hysteresis and best_val > 0.35:
                 wrong_distance_mm += step
 
+            # Focus error sensing: if the signal says focus is behind us we have passed it,
+            # reverse right away instead of travelling the whole threshold distance
+            toward = self.focus_direction()
+            if toward is not None and toward != direction and best_val > 0.35:
+                wrong_distance_mm = max(wrong_distance_mm, current_threshold_mm)
+
             if wrong_distance_mm >= current_threshold_mm:
                 wrong_distance_mm = 0.0
                 direction *= -1
@@ -190,11 +557,18 @@ class MeasurementRunner:
                 if abs(delta_to_best) > 1e-6:
                     # Move the motor back to best_pos_mm
                     self.motor.set_direction(1 if delta_to_best > 0 else -1)
-                    self.motor.move(dist_mm=abs(delta_to_best), lead_mm=self.params.lead_mm, speed_rps=0.4)
+                    with tracer.span("move"):
+                        self.motor.move(dist_mm=abs(delta_to_best), lead_mm=self.params.lead_mm, speed_rps=0.4)
                     pos_mm = best_pos_mm
 
                 # Now reverse to probe the other side of the peak
                 direction = -1 if direction == 1 else 1
+                # With focus sensing go straight towards the side the error signal points to
+                if self.params.focus_mode:
+                    self.clock.sleep(0.05)
+                    toward = self.focus_direction()
+                    if toward is not None:
+                        direction = toward
                 self.motor.set_direction(direction)
                 step = max(self.params.fine_step_mm, step / 2.0)
                 current_threshold_mm = max(self.params.fine_step_mm, current_threshold_mm / 2.0)
@@ -204,73 +578,515 @@ class MeasurementRunner:
                 )
 
         print(f" {swings} < {self.params.max_swings} and {pos_mm} < {self.params.max_travel_mm}")
+        self.pos_mm = pos_mm
         return best_pos_mm, best_val
 
+    def move_to(self, target_mm: float) -> None:
+        """Move the carriage to an absolute commanded position."""
+        delta = target_mm - self.pos_mm
+        if abs(delta) <= 1e-6:
+            return
+        self.motor.set_direction(1 if delta > 0 else -1)
+        self.motor.move(dist_mm=abs(delta), lead_mm=self.params.lead_mm, speed_rps=0.4)
+        self.pos_mm = target_mm
+
+    def local_scan(self, center_mm: float, direction: int) -> Tuple[float, float]:
+        """
+        Re-measure the peak over a narrow window around center_mm, approaching from one side.
+        direction=+1 scans upwards from below the window, -1 downwards from above it.
+        """
+        self.traces = {name: [] for name in self.sensors}
+        self.settle_log = []
+        self._run_started_at = self.clock.time()
+        tracer.begin_run()
+        try:
+            with tracer.span("local_scan"):
+                return self._local_scan(center_mm, direction)
+        finally:
+            self.last_profile = tracer.end_run()
+
+    def _local_scan(self, center_mm: float, direction: int) -> Tuple[float, float]:
+        half = self.params.local_window_mm / 2.0
+        step_mm = self.params.local_step_mm
+        pre_mm = 1.0
+        start_mm = min(max(center_mm - direction * half, 0.0), self.params.max_travel_mm)
+        # Overshoot and come back so the slack is taken up in the scan direction
+        with tracer.span("move"):
+            self.move_to(min(max(start_mm - direction * pre_mm, 0.0), self.params.max_travel_mm))
+            self.move_to(start_mm)
+        self.motor.set_direction(direction)
+        with tracer.span("settle"):
+            self.read_sensors(self.pos_mm)
+        n = max(2, int(round(self.params.local_window_mm / step_mm)))
+        for _ in range(n):
+            with tracer.span("move"):
+                self.motor.move(dist_mm=step_mm, lead_mm=self.params.lead_mm, speed_rps=0.4)
+            self.pos_mm += direction * step_mm
+            if self.endstop.is_pressed():
+                print("Endstop pressed during local scan; stopping movement.")
+                break
+            with tracer.span("settle"):
+                self.read_sensors(self.pos_mm)
+        samples = sorted(self.trace, key=lambda sample: sample[1])
+        return refine_peak([pos for _, pos, _ in samples], [val for _, _, val in samples])
+
+    def measure_repeated(self, repeats: int) -> dict:
+        """
+        Measure the lens `repeats` times: one full search_peak to find the peak, then repeats-1
+        local scans around it with alternating approach direction so backlash averages out.
+        Every repetition is recorded on its own; returns {sensor: (mean, std, focal lengths)}.
+        """
+        best_pos_mm, best_val = self.search_peak()
+        focals = {name: [r[2]] for name, r in self.finish_measurement(best_pos_mm, best_val).items()}
+        for i in range(1, repeats):
+            if self.check_stop():
+                print("Stop command received; aborting repeats.")
+                break
+            direction = -1 if i % 2 else 1
+            print(f"Local scan {i+1}/{repeats} ({'downwards' if direction < 0 else 'upwards'})...")
+            pos_mm, val = self.local_scan(best_pos_mm, direction)
+            for name, r in self.finish_measurement(pos_mm, val).items():
+                focals.setdefault(name, []).append(r[2])
+            self.api.update({"current_pos_mm": self.pos_mm, "current_value": val})
+
+        summary = {}
+        for name, values in focals.items():
+            mean = statistics.fmean(values)
+            std = statistics.stdev(values) if len(values) > 1 else 0.0
+            summary[name] = (mean, std, values)
+            print(f"[{name}] Focal length over {len(values)} measurements: {mean:.2f} ± {std:.2f} mm")
+        return summary
+
+    def _sweep(self, direction: int, span_mm: float, step_mm: float) -> float:
+        """Scan span_mm in one direction from the current position and return the refined peak position."""
+        self.motor.set_direction(direction)
+        positions, values = [], []
+        n = max(2, int(round(span_mm / step_mm)))
+        for _ in range(n):
+            self.motor.move(dist_mm=step_mm, lead_mm=self.params.lead_mm, speed_rps=0.4)
+            self.pos_mm += direction * step_mm
+            reading = wait_settled(self.sensor, self.motor.last_move_end + self.sensor.latency_s, clock=self.clock, name=self.primary)
+            positions.append(self.pos_mm)
+            values.append(reading.value)
+        if direction < 0:
+            positions.reverse()
+            values.reverse()
+        return refine_peak(positions, values)[0]
+
+    def calibrate_backlash(self, peak_pos_mm: float, span_mm: float = 4.0, step_mm: float = 0.1, repeats: int = 3) -> float:
+        """
+        Measure lead-screw backlash against the intensity peak as a known feature.
+
+        The peak is located with forward and reverse sweeps while compensation is disabled;
+        in commanded coordinates the reverse sweep sees the peak shifted by the backlash.
+        The result is stored in the calibration file and applied to the motor immediately.
+        """
+        print("Calibrating backlash...")
+        saved_backlash = self.motor.backlash_mm
+        self.motor.backlash_mm = 0.0
+        half = span_mm / 2.0
+        pre_mm = 1.0
+        estimates = []
+        try:
+            for i in range(repeats):
+                # Go below the window and take up the slack in the forward direction
+                self.move_to(peak_pos_mm - half - pre_mm)
+                self.move_to(peak_pos_mm - half)
+                fwd = self._sweep(1, span_mm, step_mm)
+                rev = self._sweep(-1, span_mm, step_mm)
+                estimates.append(fwd - rev)
+                print(f"  [{i+1}/{repeats}] forward peak {fwd:.3f} mm, reverse peak {rev:.3f} mm -> backlash {fwd - rev:.3f} mm")
+        except Exception:
+            self.motor.backlash_mm = saved_backlash
+            raise
+
+        backlash_mm = max(0.0, sum(estimates) / len(estimates))
+        self.motor.backlash_mm = backlash_mm
+        save_calibration({self.rig.calibration_key("backlash_mm"): backlash_mm})
+        print(f"Backlash: {backlash_mm:.3f} mm (saved to calibration file)")
+        return backlash_mm
+
+    def sensor_results(self, best_pos_mm: float, best_val: float) -> dict:
+        """
+        Peak and focal length for every active sensor from the single motion pass.
+        The primary sensor uses the search result, the others the maximum of their own trace.
+        """
+        results = {}
+        for name, trace in self.traces.items():
+            if name == self.primary:
+                pos_mm, val = best_pos_mm, best_val
+            elif trace:
+                _, pos_mm, val = max(trace, key=lambda sample: sample[2])
+            else:
+                continue
+            focal = self.compute_focal_length(self.params.laser_offset_mm, self.params.sensor_offset_mm, pos_mm)
+            results[name] = (pos_mm, val, focal)
+        return results
+
+    def record_results(self, results: dict) -> None:
+        """Queue the last search_peak run (one record per sensor) for the results database (does not block)."""
+        if self.results is None:
+            return
+        profile = self.last_profile
+        finished_at = self.clock.time()
+        for name, (pos_mm, val, focal) in results.items():
+            self.results.submit(RunRecord(
+                started_at=self._run_started_at,
+                finished_at=finished_at,
+                lens=self.params.lens,
+                method=f"{name}_sensor",
+                sensor=name,
+                params=asdict(self.params),
+                timings={**({"wall_s": profile.wall_s, **profile.totals} if profile is not None else {}), **self.settle_summary()},
+                peak_pos_mm=pos_mm,
+                peak_value=val,
+                focal_length_mm=focal,
+                trace=list(self.traces[name]),
+            ))
+
+    def finish_measurement(self, best_pos_mm: float, best_val: float) -> dict:
+        """Compute, print and record the per-sensor results of the last search_peak."""
+        results = self.sensor_results(best_pos_mm, best_val)
+        self.record_results(results)
+        for name, (pos_mm, val, focal) in results.items():
+            print(f"[{name}] Peak at {pos_mm:.2f} mm, value {val:.3f}")
+            print(f"[{name}] Estimated focal length: {focal:.2f} mm")
+        return results
+
     def compute_focal_length(self, laser_offset_mm: float, sensor_offset_mm: float, lens_pos_mm: float) -> float:
         print(
             f"Computing focal length with laser_offset_mm={laser_offset_mm}, sensor_offset_mm={sensor_offset_mm}, lens_pos_mm={lens_pos_mm} max_travel_mm={self.params.max_travel_mm} params")
-        # 5.0 lense holder width compensation
-        laser_to_lense_mm = lens_pos_mm + laser_offset_mm+5.0
-        sensor_to_lense_mm = self.params.max_travel_mm - lens_pos_mm - 5.0 + sensor_offset_mm
+        # geometry pulls in numpy, which the scan itself does not need
+        from measurement.geometry import Geometry, focal_length
+        geometry = Geometry(laser_offset_mm=laser_offset_mm, sensor_offset_mm=sensor_offset_mm,
+                            max_travel_mm=self.params.max_travel_mm, holder_width_mm=self.params.holder_width_mm)
+        return focal_length(lens_pos_mm, geometry)
+
+
+def replay_scan(profile: ReplayProfile, params: MeasurementParams, noise_std: float = 0.0, seed: int | None = None,
+                strategy=None, verbose: bool = False) -> ReplayResult:
+    """
+    Run a search strategy (default MeasurementRunner.search_peak) against a recorded profile on
+    a simulated clock and compare the peak it finds with the profile's own peak.
+    strategy(runner) must return (best_pos_mm, best_val) like search_peak.
+    """
+    clock = SimClock()
+    motor = ReplayMotor(clock)
+    sensor = ReplaySensor(profile, motor, clock, noise_std=noise_std, seed=seed)
+    sensor.set_filters(params.filters)
+    runner = MeasurementRunner(
+        params, ApiClient(base_url=""), motor=motor,
+        endstop=ReplayEndstop(motor, max_mm=params.max_travel_mm), homestop=ReplayEndstop(motor, min_mm=0.0),
+        sensors={params.sensor: sensor}, clock=clock,
+    )
+    strategy = strategy or MeasurementRunner.search_peak
+    wall0 = time.perf_counter()
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+        best_pos_mm, _ = strategy(runner)
+        focal = runner.compute_focal_length(params.laser_offset_mm, params.sensor_offset_mm, best_pos_mm)
+        true_focal = runner.compute_focal_length(params.laser_offset_mm, params.sensor_offset_mm, profile.peak_pos_mm)
+    return ReplayResult(
+        moves=motor.moves,
+        travel_mm=motor.travel_mm,
+        sim_time_s=clock.time(),
+        wall_s=time.perf_counter() - wall0,
+        peak_pos_mm=best_pos_mm,
+        true_peak_mm=profile.peak_pos_mm,
+        peak_error_mm=best_pos_mm - profile.peak_pos_mm,
+        focal_length_mm=focal,
+        true_focal_length_mm=true_focal,
+        focal_error_mm=focal - true_focal,
+    )
 
-        return (laser_to_lense_mm*sensor_to_lense_mm)/(laser_to_lense_mm+sensor_to_lense_mm)
+
+def print_replay_summary(results: list) -> None:
+    for i, r in enumerate(results):
+        print(f"  [{i+1}/{len(results)}] moves {r.moves}, travel {r.travel_mm:.1f} mm, sim {r.sim_time_s:.1f} s, "
+              f"peak {r.peak_pos_mm:.3f} mm (error {r.peak_error_mm:+.3f} mm, focal {r.focal_error_mm:+.3f} mm)")
+    n = len(results)
+    errors = [abs(r.peak_error_mm) for r in results]
+    print(f"Replay: {n} runs, true peak {results[0].true_peak_mm:.3f} mm")
+    print(f"  moves {statistics.fmean(r.moves for r in results):.1f}, travel {statistics.fmean(r.travel_mm for r in results):.1f} mm, "
+          f"sim time {statistics.fmean(r.sim_time_s for r in results):.1f} s, wall {sum(r.wall_s for r in results):.2f} s total")
+    print(f"  |peak error| mean {statistics.fmean(errors):.3f} mm, max {max(errors):.3f} mm, "
+          f"|focal error| max {max(abs(r.focal_error_mm) for r in results):.3f} mm")
 
 
 class App:
-    def run(self) -> None:
+    @staticmethod
+    def parser() -> argparse.ArgumentParser:
+        """App-level flags; MeasurementParams.from_args takes them as a parent parser."""
         parser = argparse.ArgumentParser(add_help=False)
         parser.add_argument("--standalone", action="store_true", help="Run without web server integration")
         parser.add_argument("--no-home", action="store_true", help="Skip homing step in standalone mode")
-        # Parse known to avoid conflicting with MeasurementParams
+        parser.add_argument("--metrics-port", type=int, default=int(os.environ.get("METRICS_PORT", 9108)),
+                            help="Port of the Prometheus /metrics endpoint (0 disables it)")
+        parser.add_argument("--preview-port", type=int, default=int(os.environ.get("PREVIEW_PORT", 9109)),
+                            help="Port of the camera preview (/preview.mjpg, /snapshot.jpg; 0 disables it)")
+        parser.add_argument("--preview-fps", type=float, default=10.0, help="Maximum camera preview frame rate")
+        parser.add_argument("--calibrate-backlash", action="store_true", help="Measure lead-screw backlash at the peak and store it (standalone mode)")
+        parser.add_argument("--calibrate-latency", action="store_true", help="Measure sensor latency by bidirectional sweeps over the peak (standalone mode)")
+        parser.add_argument("--raw-record", metavar="BASE_PATH", default=None,
+                            help="Record every raw sensor sample to memory-mapped segment files BASE_PATH.NNNNN.raw")
+        parser.add_argument("--raw-segment-records", type=int, default=2_000_000,
+                            help="Records per raw segment file (32 bytes each) before rolling over")
+        parser.add_argument("--raw-max-segments", type=int, default=16,
+                            help="Raw segment files kept per base path, oldest deleted first (0 keeps all of them)")
+        parser.add_argument("--replay", metavar="SOURCE", default=None,
+                            help="Replay search_peak against a recorded trace (run id in the results database or CSV of t,pos_mm,value)")
+        parser.add_argument("--replay-runs", type=int, default=1, help="Number of replays (with different noise seeds)")
+        parser.add_argument("--replay-noise", type=float, default=0.0, help="Std of Gaussian noise added to replayed values")
+        parser.add_argument("--replay-seed", type=int, default=0)
+        parser.add_argument("--rig", action="append", default=None,
+                            help="Rig from the rigs file to run (repeatable; default: all, concurrently)")
+        return parser
+
+    def run(self) -> None:
+        parser = self.parser()
+        # One combined parse rejects mistyped flags; the app flags are then read on their own
+        params = MeasurementParams.from_args(parents=(parser,))
         known, _ = parser.parse_known_args()
-        params = MeasurementParams.from_args()
+        if known.replay:
+            profile = ReplayProfile.load(known.replay, db_path=params.results_db or None)
+            print_replay_summary([
+                replay_scan(profile, params, noise_std=known.replay_noise, seed=known.replay_seed + i)
+                for i in range(max(1, known.replay_runs))
+            ])
+            return
         print("\n=== LASER SAFETY WARNING ===")
         print("This system may emit laser light. Protect eyes and skin.")
         print("- Always use appropriate laser safety goggles.")
         print("- Keep the beam enclosed and avoid reflective surfaces.")
         print("- Ensure bystanders are informed and protected.")
         print("Proceed only if the area is safe.\n")
-        api = ApiClient(base_url=None if known.standalone else os.environ.get("API_BASE_URL", "http://raspberrypi.local:5000"))
-        runner = MeasurementRunner(params, api)
+        rigs = select_rigs(load_rigs(), known.rig)
+        multi = len(rigs) > 1
+
+        # Sensor bring-up (camera start takes seconds), GPIO, web server, storage and homing run
+        # concurrently, for all rigs at once; homing only needs the axis and the API client
+        pipeline = InitPipeline()
+        started = []
+        recorders = []
+
+        def init_results():
+            return ResultsStore(params.results_db) if params.results_db else None
+
+        def init_metrics():
+            if not known.metrics_port:
+                return None
+            server = MetricsServer(registry, host="127.0.0.1", port=known.metrics_port)
+            server.start()
+            return server
+
+        pipeline.add("results", init_results, required=False)
+        pipeline.add("metrics", init_metrics, required=False)
+        for index, rig in enumerate(rigs):
+            self.add_rig_tasks(pipeline, rig, index, known, params, started, recorders, prefix=f"{rig.name}." if multi else "")
 
-        runner.start()
         try:
-            if known.standalone:
-                if not known.no_home:
+            try:
+                parts = pipeline.run()
+            except InitError as e:
+                if not multi:
+                    print(f"ERROR: {e}")
+                    return
+                parts = pipeline.results()
+            finally:
+                print(pipeline.report())
+            runners = []
+            for rig in rigs:
+                prefix = f"{rig.name}." if multi else ""
+                runner = parts.get(f"{prefix}runner")
+                sensors = parts.get(f"{prefix}sensors")
+                if runner is None or not sensors:
+                    print(f"RIG {rig.name}: initialisation failed, not measuring")
+                    continue
+                runner.use_sensors(sensors)
+                runner.results = parts.get("results")
+                preview = parts.get(f"{prefix}preview")
+                if preview is not None:
+                    # The web server proxies each rig's preview by the port reported here
+                    runner.api.update({"preview_port": preview.port})
+                runners.append(runner)
+
+            if not multi:
+                if runners:
+                    self.serve(runners[0], known, params)
+                return
+            threads = [threading.Thread(target=self.serve_rig, args=(runner, known, params), name=f"rig-{runner.rig.name}",
+                                        daemon=True) for runner in runners]
+            for t in threads:
+                t.start()
+            # Join with a timeout so Ctrl+C still reaches the main thread
+            while any(t.is_alive() for t in threads):
+                for t in threads:
+                    t.join(timeout=0.5)
+        except EmergencyStop as e:
+            print(f"EMERGENCY STOP: {e}")
+        finally:
+            parts = pipeline.results()
+            for sensor in started:
+                sensor.stop()
+            for name, part in parts.items():
+                task = name.rsplit(".", 1)[-1]
+                if task == "gpio":
+                    for driver in part:
+                        driver.cleanup()
+                elif task in ("metrics", "preview") and part is not None:
+                    part.stop()
+            if parts.get("results") is not None:
+                parts["results"].close()
+            for recorder in recorders:
+                recorder.close()
+
+    def add_rig_tasks(self, pipeline: InitPipeline, rig: RigSettings, index: int, known, params: MeasurementParams,
+                      started: list, recorders: list, prefix: str = ""):
+        """Initialisation tasks of one rig, named <prefix><task>; with several rigs a failed rig does not stop the others."""
+        required = not prefix
+        api = ApiClient(base_url="" if known.standalone else None, rig=None if rig.name == DEFAULT_RIG else rig.name)
+        recorder = None
+        if known.raw_record:
+            from measurement.raw_recorder import RawRecorder
+            base = f"{known.raw_record}.{rig.name}" if prefix else known.raw_record
+            recorder = RawRecorder(base, segment_records=known.raw_segment_records,
+                                   max_segments=known.raw_max_segments or None)
+            recorders.append(recorder)
+
+        def init_gpio():
+            axis = create_axis(rig)
+            if recorder is not None:
+                recorder.position_source = lambda: axis[0].position_mm
+            return axis
+
+        def init_sensors():
+            sensors = create_sensors(params, rig)
+            for name, sensor in sensors.items():
+                if recorder is not None:
+                    sensor.attach_recorder(recorder, name)
+                sensor.start()
+                started.append(sensor)
+            deadline = time.time() + SENSOR_START_TIMEOUT_S
+            waiting = dict(sensors)
+            while waiting:
+                for name, sensor in list(waiting.items()):
+                    if sensor.get_history():
+                        pipeline.mark(f"first_sample:{prefix}{name}")
+                        pipeline.mark("first_sample")
+                        del waiting[name]
+                if waiting and time.time() > deadline:
+                    raise InitError(f"no samples from {', '.join(waiting)} within {SENSOR_START_TIMEOUT_S:.0f} s")
+                time.sleep(0.005)
+            return sensors
+
+        def init_server():
+            if api.enabled and api.get_status() is None:
+                print(f"INIT WARNING: web server {api.base_url} not reachable yet; will keep polling")
+            return api
+
+        def init_preview(sensors):
+            camera = sensors.get("camera")
+            if camera is None or not known.preview_port:
+                return None
+            from measurement.preview import PreviewServer
+            # One preview port per rig, counting up from --preview-port
+            server = PreviewServer(camera.frames, host="127.0.0.1", port=known.preview_port + index, max_fps=known.preview_fps)
+            server.start()
+            return server
+
+        def init_runner(gpio, server):
+            motor, endstop, homestop = gpio
+            return MeasurementRunner(params, server, motor=motor, endstop=endstop, homestop=homestop, sensors={}, rig=rig)
+
+        pipeline.add(f"{prefix}gpio", init_gpio, required=required)
+        pipeline.add(f"{prefix}sensors", init_sensors, required=required)
+        pipeline.add(f"{prefix}server", init_server, required=required)
+        pipeline.add(f"{prefix}preview", init_preview, deps=(f"{prefix}sensors",), required=False)
+        pipeline.add(f"{prefix}runner", lambda **deps: init_runner(deps[f"{prefix}gpio"], deps[f"{prefix}server"]),
+                     deps=(f"{prefix}gpio", f"{prefix}server"), required=required)
+        if known.standalone and not known.no_home:
+            # Homing overlaps the sensor start-up but is cancelled if the sensors (or GPIO) fail
+            pipeline.add(f"{prefix}home",
+                         lambda **deps: deps[f"{prefix}runner"].home(cancel=pipeline.cancel_event(f"{prefix}home")),
+                         deps=(f"{prefix}runner",), needs=(f"{prefix}sensors",), required=required)
+
+    def serve_rig(self, runner: MeasurementRunner, known, params: MeasurementParams):
+        # Rig thread: a failing rig is reported and stopped, the others keep measuring
+        try:
+            self.serve(runner, known, params)
+        except EmergencyStop as e:
+            print(f"RIG {runner.rig.name}: EMERGENCY STOP: {e}")
+        except Exception as e:
+            print(f"RIG {runner.rig.name} ERROR: {e}")
+
+    def serve(self, runner: MeasurementRunner, known, params: MeasurementParams):
+        """Standalone: one measurement (or calibration); otherwise follow the web server's commands."""
+        api = runner.api
+        if known.standalone:
+            if params.repeats > 1 and not (known.calibrate_backlash or known.calibrate_latency):
+                runner.measure_repeated(params.repeats)
+                return
+            best_pos_mm, best_val = runner.search_peak()
+            if known.calibrate_backlash:
+                runner.calibrate_backlash(best_pos_mm)
+                return
+            if known.calibrate_latency:
+                runner.calibrate_latency(best_pos_mm)
+                return
+            runner.finish_measurement(best_pos_mm, best_val)
+            return
+
+        while True:
+            state = api.get_status()
+            if not state:
+                time.sleep(0.5)
+                continue
+            cmd = state.get("desired_cmd")
+
+            try:
+                if cmd == "home":
                     runner.home()
-                best_pos_mm, best_val = runner.search_peak()
-                focal = runner.compute_focal_length(params.laser_offset_mm, params.sensor_offset_mm, best_pos_mm)
-                print(f"Peak at {best_pos_mm:.2f} mm, intensity {best_val:.3f} V")
-                print(f"Estimated focal length: {focal:.2f} mm")
-            else:
-                while True:
-                    state = api.get_status()
-                    if not state:
-                        time.sleep(0.5)
-                        continue
-                    cmd = state.get("desired_cmd")
-
-                    if cmd == "home":
-                        runner.home()
-                    if cmd == "start":
-                        # runner.home()
-                        api.update({"is_running": True, "desired_cmd": None})
+                if cmd == "start":
+                    # runner.home()
+                    api.update({"is_running": True, "desired_cmd": None})
+                    if params.repeats > 1:
+                        summary = runner.measure_repeated(params.repeats)
+                        api.update({
+                            "is_running": False,
+                            "focal_length": summary[runner.primary][0],
+                            "focal_length_std": summary[runner.primary][1],
+                            "focal_lengths": {name: s[0] for name, s in summary.items()},
+                        })
+                    else:
                         best_pos_mm, best_val = runner.search_peak()
-                        focal = runner.compute_focal_length(params.laser_offset_mm, params.sensor_offset_mm, best_pos_mm)
-                        print(f"Peak at {best_pos_mm:.2f} mm, intensity {best_val:.3f} V")
-                        print(f"Estimated focal length: {focal:.2f} mm")
+                        sensor_results = runner.finish_measurement(best_pos_mm, best_val)
+                        focal = sensor_results[runner.primary][2]
                         api.update({
                             "best_pos_mm": best_pos_mm,
                             "best_voltage": best_val,
-                            "focal_length": focal
+                            "focal_length": focal,
+                            "focal_length_std": None,
+                            "focal_lengths": {name: r[2] for name, r in sensor_results.items()},
                         })
+            except EmergencyStop as e:
+                # The driver is already off; report and wait for the next command
+                print(f"EMERGENCY STOP: {e}")
+                api.update({"is_running": False, "is_homing": False, "desired_cmd": None})
 
-                    if cmd == "stop":
-                        api.update({"is_running": False, "is_homing": False, "desired_cmd": None})
+            if cmd == "stop":
+                api.update({"is_running": False, "is_homing": False, "desired_cmd": None})
 
-                    time.sleep(0.5)
-        finally:
-            runner.stop()
+            time.sleep(0.5)
+
+
+def select_rigs(rigs: tuple, names: list | None) -> list:
+    """The rigs named with --rig (all of them if none or "all" is given)."""
+    if not names or "all" in names:
+        return list(rigs)
+    by_name = {rig.name: rig for rig in rigs}
+    unknown = [n for n in names if n not in by_name]
+    if unknown:
+        raise SystemExit(f"ERROR: unknown rig(s) {', '.join(unknown)} (configured: {', '.join(by_name)})")
+    return [by_name[n] for n in dict.fromkeys(names)]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,39 @@
+import json
+import os
+import threading
+
+# Calibration results measured on the rig (backlash, sensor latency, ...).
+# Kept out of config.py so recalibrating does not require editing code.
+CALIBRATION_FILE = os.environ.get(
+    "CALIBRATION_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "calibration.json"),
+)
+
+_lock = threading.Lock()
+
+
+def load_calibration(path: str | None = None) -> dict:
+    """Return the stored calibration values, or an empty dict if nothing was calibrated yet."""
+    path = path or CALIBRATION_FILE
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"CALIBRATION WARNING: Unable to read {path}: {e}")
+        return {}
+
+
+def save_calibration(values: dict, path: str | None = None) -> dict:
+    """Merge `values` into the calibration file (atomic replace) and return the full content."""
+    path = path or CALIBRATION_FILE
+    with _lock:
+        data = load_calibration(path)
+        data.update(values)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    return data
@@ -1,11 +1,13 @@
 import time
 import threading
-from collections import deque
 
 import cv2
 from picamera2 import Picamera2
 
+from .preview import FrameBuffer
+from .resources import camera_device, resources
 from .sensor_base import SensorBase
+from .settle import SettleSpec
 
 
 class CameraSensor(SensorBase):
@@ -15,8 +17,9 @@ class CameraSensor(SensorBase):
                  normalize: bool = True,
                  capture_size: tuple[int, int] | None = (1280, 720),
                  exposure_time_us: int | None = 100,
-                 ae_enable: bool | None = None):
-        SensorBase.__init__(self)
+                 ae_enable: bool | None = None,
+                 debug_images: bool = False):
+        SensorBase.__init__(self, window_size)
 
         self.src = src
         self.hsv_s_min = int(hsv_s_min)
@@ -27,13 +30,14 @@ class CameraSensor(SensorBase):
         # Camera control options
         self.exposure_time_us = exposure_time_us
         self.ae_enable = ae_enable
+        # Latest frame and spot mask for the live preview (measurement.preview encodes them elsewhere)
+        self.frames = FrameBuffer()
+        # Write cam.jpg / cam_red.png / cam_mask.png / cam_overlay.jpg every frame (slow, for debugging)
+        self.debug_images = bool(debug_images)
 
         self._running = False
         self._thread = None
         self._cap = None
-        self._current_value = 0.0
-        self._window_size = max(1, int(window_size))
-        self._samples = deque(maxlen=self._window_size)
         self._last_warn_ts = 0.0
         self._read_failures = 0
         self._reinit_attempts = 0
@@ -44,9 +48,11 @@ class CameraSensor(SensorBase):
         if Picamera2 is None:
             print("CAMERA ERROR: Picamera2 is not available. Install picamera2 on Raspberry Pi OS.")
             return
+        # Another rig using this camera is a configuration error, not something to retry
+        resources.claim(self.owner or self.config_key(), camera_device(self.src))
         # Initialize Picamera2
         try:
-            self._picam = Picamera2(0)
+            self._picam = Picamera2(self.src)
             # Configure preview with desired resolution and RGB888 format
             try:
                 main_cfg = {"format": "RGB888"}
@@ -84,11 +90,22 @@ class CameraSensor(SensorBase):
         except Exception as e:
             print("CAMERA ERROR: Failed to initialize Picamera2:", e)
             self._picam = None
+            resources.release(self.owner or self.config_key(), camera_device(self.src))
             return
         self._running = True
         self._thread = threading.Thread(target=self._camera_loop_picam, daemon=True)
         self._thread.start()
 
+    def config_key(self) -> str:
+        size = "x".join(str(v) for v in self.capture_size) if self.capture_size else "default"
+        # The first camera keeps the key it had before several cameras were supported
+        cam = f":cam{self.src}" if self.src else ""
+        return f"camera:{size}:exp{self.exposure_time_us}{cam}"
+
+    def settle_spec(self) -> SettleSpec:
+        # Value is a pixel count; frames arrive at ~20-30 fps, so use a short window and a relative tolerance
+        return SettleSpec(window=3, abs_tol=20.0, rel_tol=0.02, timeout_s=0.5, poll_s=0.005)
+
     def stop(self):
         self._running = False
         if self._thread:
@@ -100,6 +117,7 @@ class CameraSensor(SensorBase):
             except Exception:
                 pass
             self._picam = None
+        resources.release(self.owner or self.config_key(), camera_device(self.src))
 
     def _camera_loop_picam(self):
         try:
@@ -123,7 +141,8 @@ class CameraSensor(SensorBase):
                 # except Exception:
                 #     frame_bgr = frame
 
-                cv2.imwrite('cam.jpg', frame)
+                if self.debug_images:
+                    cv2.imwrite('cam.jpg', frame)
 
                 # Red-dominance mask tuned to avoid segmenting white:
                 # - Strong red: R >= 200
@@ -133,10 +152,11 @@ class CameraSensor(SensorBase):
                 try:
                     b, g, r = cv2.split(frame)
                     # Debug: export red channel
-                    try:
-                        cv2.imwrite('cam_red.png', r)
-                    except Exception:
-                        pass
+                    if self.debug_images:
+                        try:
+                            cv2.imwrite('cam_red.png', r)
+                        except Exception:
+                            pass
                     red_high = r >= th
                     margin = (r.astype('int16') - cv2.max(g, b)) >= 50
                     not_white = (g < th) & (b < th)
@@ -163,9 +183,9 @@ class CameraSensor(SensorBase):
                     mask = None
 
                 try:
-                    if mask is not None:
+                    if mask is not None and self.debug_images:
                         cv2.imwrite('cam_mask.png', mask)
-                        overlay = frame_bgr.copy()
+                        overlay = frame.copy()
                         red_layer = overlay.copy()
                         red_layer[:, :] = (0, 0, 255)
                         alpha = 0.4
@@ -176,9 +196,8 @@ class CameraSensor(SensorBase):
 
                 value = int(cv2.countNonZero(mask)) if mask is not None else 0
 
-                with self._lock:
-                    self._current_value = value
-                    self._samples.append(value)
+                self._publish(value)
+                self.frames.publish(frame, mask)
 
                 time.sleep(0.01)
         except Exception as e:
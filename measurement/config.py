@@ -1,4 +1,15 @@
-from dataclasses import dataclass
+import json
+import os
+from dataclasses import dataclass, fields, replace
+
+from .calibration import load_calibration
+
+# Several rigs on one host are described in this JSON file; without it there is one rig built from cfg
+RIGS_FILE = os.environ.get(
+    "LENSMETER_RIGS",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rigs.json"),
+)
+DEFAULT_RIG = "default"
 
 
 @dataclass(frozen=True)
@@ -8,6 +19,10 @@ class MotorSettings:
     enable_pin: int
     default_speed: float
     max_steps: int
+    backlash_mm: float = 0.0
+    # Step pulse thread: SCHED_FIFO priority and CPU to pin it to (None: leave to the scheduler)
+    rt_priority: int | None = None
+    cpu: int | None = None
 
 
 @dataclass(frozen=True)
@@ -16,16 +31,113 @@ class EndstopSettings:
     is_normally_open: bool
 
 
+@dataclass(frozen=True)
+class AdcSettings:
+    i2c_addr: int = 0x68
+    # Channel(s) wired to the photodiode; split detectors use (0, 1), quadrant detectors (0, 1, 2, 3)
+    channels: tuple = (0,)
+    res_bits: int = 12
+    # Sign of the focus error signal when the focus lies in the +1 (forward) direction
+    focus_sign: int = 1
+
+
+@dataclass(frozen=True)
+class RigSettings:
+    """One measuring axis: its pins, ADC and camera. Rigs sharing a host must not share any of them."""
+    name: str
+    motor: MotorSettings
+    endstop: EndstopSettings
+    homestop: EndstopSettings
+    adc: AdcSettings = AdcSettings()
+    camera: int = 0
+
+    def calibration_key(self, key: str) -> str:
+        # The single-rig setup keeps its original calibration keys
+        return key if self.name == DEFAULT_RIG else f"{key}.{self.name}"
+
+    def gpio_pins(self) -> tuple:
+        return (self.motor.step_pin, self.motor.dir_pin, self.motor.enable_pin, self.endstop.pin, self.homestop.pin)
+
+
 @dataclass(frozen=True)
 class SystemConfig:
     motor: MotorSettings
     endstop: EndstopSettings
     homestop: EndstopSettings
+    adc: AdcSettings = AdcSettings()
     debug_mode: bool = True
 
 
+_calibration = load_calibration()
+
 cfg = SystemConfig(
-    motor=MotorSettings(6, 12, 5, 10.0, 2000),
+    motor=MotorSettings(6, 12, 5, 10.0, 2000, backlash_mm=float(_calibration.get("backlash_mm", 0.0))),
     endstop=EndstopSettings(pin=14, is_normally_open=True),
     homestop=EndstopSettings(pin=15, is_normally_open=True),
 )
+
+
+def default_rig(config: SystemConfig = cfg) -> RigSettings:
+    return RigSettings(DEFAULT_RIG, config.motor, config.endstop, config.homestop, config.adc)
+
+
+def _settings(base, overrides: dict, where: str):
+    known = {f.name for f in fields(base)}
+    unknown = set(overrides) - known
+    if unknown:
+        raise ValueError(f"{where}: unknown setting(s) {', '.join(sorted(unknown))}")
+    if "channels" in overrides:
+        overrides = dict(overrides, channels=tuple(overrides["channels"]))
+    return replace(base, **overrides)
+
+
+def load_rigs(path: str | None = None, config: SystemConfig = cfg) -> tuple:
+    """
+    Rigs from the rigs file, e.g.
+
+        [{"name": "left", "motor": {"step_pin": 6, "dir_pin": 12, "enable_pin": 5, "cpu": 3},
+          "endstop": {"pin": 14}, "homestop": {"pin": 15}, "adc": {"i2c_addr": 104}, "camera": 0},
+         {"name": "right", ...}]
+
+    Omitted settings are taken from cfg. Names must be unique and no GPIO pin, ADC address or
+    camera may appear in two rigs. Without the file the single default rig is returned.
+    """
+    path = path or RIGS_FILE
+    try:
+        with open(path, "r") as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return (default_rig(config),)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path}: expected a non-empty list of rigs")
+    calibration = load_calibration()
+    rigs = []
+    for i, entry in enumerate(entries):
+        name = str(entry.get("name") or f"rig{i + 1}")
+        where = f"{path}: rig {name!r}"
+        motor = _settings(config.motor, entry.get("motor", {}), where)
+        rig = RigSettings(
+            name=name,
+            motor=motor,
+            endstop=_settings(config.endstop, entry.get("endstop", {}), where),
+            homestop=_settings(config.homestop, entry.get("homestop", {}), where),
+            adc=_settings(config.adc, entry.get("adc", {}), where),
+            camera=int(entry.get("camera", i)),
+        )
+        backlash = calibration.get(rig.calibration_key("backlash_mm"))
+        if backlash is not None:
+            rig = replace(rig, motor=replace(motor, backlash_mm=float(backlash)))
+        rigs.append(rig)
+
+    owners = {}
+    for rig in rigs:
+        claims = [f"GPIO {pin}" for pin in rig.gpio_pins()] + [f"ADC 0x{rig.adc.i2c_addr:02x}", f"camera {rig.camera}"]
+        if rig.name in owners.values():
+            raise ValueError(f"{path}: duplicate rig name {rig.name!r}")
+        for claim in claims:
+            if claim in owners and owners[claim] != rig.name:
+                raise ValueError(f"{path}: {claim} is used by both {owners[claim]!r} and {rig.name!r}")
+            if claim in owners:
+                raise ValueError(f"{path}: rig {rig.name!r} uses {claim} twice")
+            owners[claim] = rig.name
+    return tuple(rigs)
@@ -1,14 +1,22 @@
-import RPi.GPIO as GPIO
+from .resources import for_gpio, gpio_pin
 
 
 class Endstop:
-    def __init__(self, pin, pressed_state=0):
+    def __init__(self, pin, pressed_state=0, gpio=None, owner: str | None = None):
         """
         Egyetlen végállás kapcsoló kezelése.
         pin: A GPIO pin száma (BCM módban).
+        gpio: RPi.GPIO-kompatibilis modul (alapból RPi.GPIO).
+        owner: a pin tulajdonosa (pl. a rig neve); foglalt pinre hibát ad.
         """
+        if gpio is None:
+            import RPi.GPIO as gpio
+        self.gpio = GPIO = gpio
         self.pin = pin
         self.pressed_state = pressed_state
+        self.owner = owner or f"endstop@{pin}"
+        self._resources = for_gpio(GPIO)
+        self._resources.claim(self.owner, gpio_pin(pin))
 
         # GPIO mód ellenőrzése
         if GPIO.getmode() is None:
@@ -23,13 +31,13 @@ class Endstop:
         Igazat (True) ad vissza, ha a gomb be van nyomva (tehát a jel LOW/0V).
         """
         # Mivel Pull-up van: 0 = Benyomva, 1 = Felengedve
-        return GPIO.input(self.pin) == self.pressed_state
+        return self.gpio.input(self.pin) == self.pressed_state
 
     def is_open(self):
         """
         Igazat (True) ad vissza, ha a gomb nincs benyomva (szabad).
         """
-        return GPIO.input(self.pin) != self.pressed_state
+        return self.gpio.input(self.pin) != self.pressed_state
 
     def state_str(self):
         """
@@ -39,4 +47,7 @@ class Endstop:
 
     def cleanup(self):
         """Csak ennek az egy kapcsolónak a pinjét takarítja ki."""
-        GPIO.cleanup(self.pin)
+        if self._resources.owner(gpio_pin(self.pin)) != self.owner:
+            return
+        self.gpio.cleanup(self.pin)
+        self._resources.release(self.owner, gpio_pin(self.pin))
@@ -0,0 +1,112 @@
+import grp
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+from .metrics import registry
+
+# Shared-memory emergency stop flag: the safety daemon and the web server raise it, the step
+# loop of the measurement process reads one byte of it per step (no syscall, no polling thread).
+ESTOP_PATH = os.environ.get(
+    "LENSMETER_ESTOP",
+    "/dev/shm/lensmeter.estop" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "lensmeter.estop"),
+)
+
+# Only the owner and the ESTOP_GROUP group (the web server, the safety daemon and the measurement
+# process; scripts/install_safety_daemon.sh creates it) may raise, clear or even read the flag.
+ESTOP_GROUP = os.environ.get("LENSMETER_ESTOP_GROUP", "lensmeter")
+ESTOP_MODE = 0o660
+
+# Layout: flag (u8) at 0, raised-at wall time (f8) at 8, reason (utf-8, NUL padded) at 16
+_TIME_OFFSET = 8
+_REASON_OFFSET = 16
+SIZE = 64
+
+estop_latency_seconds = registry.histogram(
+    "lensmeter_estop_latency_seconds", "Time from raising the emergency stop until the motor driver was disabled",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5),
+)
+
+
+class EmergencyStop(RuntimeError):
+    pass
+
+
+class EStopFlag:
+    def __init__(self, path: str = ESTOP_PATH, group: str | None = ESTOP_GROUP):
+        self.path = path
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, ESTOP_MODE)
+            writable = True
+        except PermissionError:
+            # Created by another user (e.g. the root safety daemon): reading is enough to obey it
+            fd = os.open(path, os.O_RDONLY)
+            writable = False
+        try:
+            if writable and os.fstat(fd).st_size < SIZE:
+                os.ftruncate(fd, SIZE)
+            if writable and os.fstat(fd).st_uid == os.geteuid():
+                self._restrict(fd, group)
+            self.writable = writable
+            self._mm = mmap.mmap(fd, SIZE, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+    def _restrict(self, fd: int, group: str | None):
+        # Also tightens flags created world-writable by earlier versions
+        try:
+            if group:
+                os.fchown(fd, -1, grp.getgrnam(group).gr_gid)
+        except KeyError:
+            print(f"ESTOP WARNING: group {group!r} does not exist, {self.path} stays with the creator's group")
+        except OSError as e:
+            print(f"ESTOP WARNING: Unable to give {self.path} to group {group!r}: {e}")
+        try:
+            os.fchmod(fd, ESTOP_MODE)
+        except OSError:
+            pass
+
+    def is_set(self) -> bool:
+        return self._mm[0] != 0
+
+    def trigger(self, reason: str = ""):
+        if not self.writable:
+            raise PermissionError(f"{self.path} is read-only for this process")
+        struct.pack_into("<d", self._mm, _TIME_OFFSET, time.time())
+        struct.pack_into("48s", self._mm, _REASON_OFFSET, reason.encode("utf-8")[:48])
+        # The flag goes last so a reader that sees it also sees when and why
+        self._mm[0] = 1
+
+    def clear(self):
+        if not self.writable:
+            raise PermissionError(f"{self.path} is read-only for this process")
+        self._mm[0] = 0
+
+    def raised_at(self) -> float | None:
+        if not self.is_set():
+            return None
+        return struct.unpack_from("<d", self._mm, _TIME_OFFSET)[0]
+
+    def reason(self) -> str:
+        return struct.unpack_from("48s", self._mm, _REASON_OFFSET)[0].rstrip(b"\0").decode("utf-8", "replace")
+
+    def close(self):
+        self._mm.close()
+
+
+def trigger(reason: str = "", path: str = ESTOP_PATH):
+    flag = EStopFlag(path)
+    try:
+        flag.trigger(reason)
+    finally:
+        flag.close()
+
+
+def clear(path: str = ESTOP_PATH):
+    flag = EStopFlag(path)
+    try:
+        flag.clear()
+    finally:
+        flag.close()
@@ -0,0 +1,257 @@
+import heapq
+import math
+from collections import deque
+
+# Online filters fed one sample at a time from the sensor loops. Every stage updates in O(1)
+# or O(log n) per sample: update(x) returns the value passed to the next stage, or None if the
+# sample is dropped.
+
+
+class Ema:
+    """Exponential moving average, y += alpha * (x - y)."""
+
+    def __init__(self, alpha: float = 0.3):
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError("alpha must be in (0, 1]")
+        self.alpha = float(alpha)
+        self.value = None
+
+    def update(self, x: float) -> float:
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+    def reset(self):
+        self.value = None
+
+
+class SlidingStats:
+    """
+    Mean and variance over the last `window` samples, kept incrementally (Welford's update
+    extended with removal of the oldest sample). Passes samples through unchanged.
+    """
+
+    def __init__(self, window: int = 50):
+        self.window = max(1, int(window))
+        self._buf = deque()
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self):
+        return len(self._buf)
+
+    def _add(self, x: float):
+        self._buf.append(x)
+        delta = x - self.mean
+        self.mean += delta / len(self._buf)
+        self._m2 += delta * (x - self.mean)
+
+    def _remove_oldest(self):
+        x = self._buf.popleft()
+        n = len(self._buf)
+        if n == 0:
+            self.mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = x - self.mean
+        self.mean -= delta / n
+        self._m2 -= delta * (x - self.mean)
+
+    def update(self, x: float) -> float:
+        self._add(x)
+        if len(self._buf) > self.window:
+            self._remove_oldest()
+        return x
+
+    def resize(self, window: int):
+        """Change the window; only the samples that fall out are touched."""
+        self.window = max(1, int(window))
+        while len(self._buf) > self.window:
+            self._remove_oldest()
+
+    @property
+    def variance(self) -> float:
+        n = len(self._buf)
+        return max(0.0, self._m2 / (n - 1)) if n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def reset(self):
+        self._buf.clear()
+        self.mean = 0.0
+        self._m2 = 0.0
+
+
+class SlidingMean(SlidingStats):
+    """SlidingStats as a smoothing stage: outputs the window mean."""
+
+    def update(self, x: float) -> float:
+        super().update(x)
+        return self.mean
+
+
+class SlidingMedian:
+    """
+    Median of the last `window` samples with two heaps (max-heap of the lower half, min-heap
+    of the upper half) and lazy deletion of expired samples: O(log n) per update. Expired
+    entries buried below the top (e.g. under a drifting signal) are compacted away once the
+    heaps hold more than twice the window, so memory stays O(window).
+    """
+
+    def __init__(self, window: int = 5):
+        self.window = max(1, int(window))
+        self._buf = deque()
+        self._seq = 0
+        self._low = []   # (-x, seq)
+        self._high = []  # (x, seq)
+        self._low_size = 0
+        self._high_size = 0
+        # seq -> True for samples in the low heap, False for the high heap
+        self._side = {}
+        self.value = None
+
+    def _prune(self, heap):
+        while heap and heap[0][1] not in self._side:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        self._low = [e for e in self._low if e[1] in self._side]
+        self._high = [e for e in self._high if e[1] in self._side]
+        heapq.heapify(self._low)
+        heapq.heapify(self._high)
+
+    def _rebalance(self):
+        if self._low_size > self._high_size + 1:
+            self._prune(self._low)
+            x, seq = heapq.heappop(self._low)
+            heapq.heappush(self._high, (-x, seq))
+            self._side[seq] = False
+            self._low_size -= 1
+            self._high_size += 1
+        elif self._high_size > self._low_size:
+            self._prune(self._high)
+            x, seq = heapq.heappop(self._high)
+            heapq.heappush(self._low, (-x, seq))
+            self._side[seq] = True
+            self._high_size -= 1
+            self._low_size += 1
+        self._prune(self._low)
+        self._prune(self._high)
+
+    def update(self, x: float) -> float:
+        seq = self._seq
+        self._seq += 1
+        self._buf.append(seq)
+        self._prune(self._low)
+        if not self._low or x <= -self._low[0][0]:
+            heapq.heappush(self._low, (-x, seq))
+            self._side[seq] = True
+            self._low_size += 1
+        else:
+            heapq.heappush(self._high, (x, seq))
+            self._side[seq] = False
+            self._high_size += 1
+        if len(self._buf) > self.window:
+            old = self._buf.popleft()
+            if self._side.pop(old):
+                self._low_size -= 1
+            else:
+                self._high_size -= 1
+        self._rebalance()
+        self._rebalance()
+        if len(self._low) + len(self._high) > 2 * self.window + 2:
+            self._compact()
+        if self._low_size > self._high_size:
+            self.value = -self._low[0][0]
+        else:
+            self.value = 0.5 * (-self._low[0][0] + self._high[0][0])
+        return self.value
+
+    def reset(self):
+        self.__init__(self.window)
+
+
+class OutlierRejector:
+    """
+    Drops samples further than k standard deviations from the sliding mean of the accepted ones.
+    After `max_rejects` consecutive rejections the level is assumed to have really changed
+    (e.g. the carriage moved) and the statistics restart from the new sample.
+    """
+
+    def __init__(self, k: float = 4.0, window: int = 50, min_samples: int = 5, max_rejects: int = 3):
+        self.k = float(k)
+        self.min_samples = int(min_samples)
+        self.max_rejects = int(max_rejects)
+        self.stats = SlidingStats(window)
+        self.rejected = 0
+        self._consecutive = 0
+
+    def update(self, x: float) -> float | None:
+        s = self.stats
+        if len(s) >= self.min_samples and abs(x - s.mean) > self.k * s.std:
+            self.rejected += 1
+            self._consecutive += 1
+            if self._consecutive < self.max_rejects:
+                return None
+            s.reset()
+        self._consecutive = 0
+        s.update(x)
+        return x
+
+    def reset(self):
+        self.stats.reset()
+        self._consecutive = 0
+
+
+class FilterPipeline:
+    """Chain of filter stages; value is the output of the last stage for the last accepted sample."""
+
+    def __init__(self, *stages):
+        self.stages = list(stages)
+        self.value = None
+        self.dropped = 0
+
+    def update(self, x: float) -> float | None:
+        for stage in self.stages:
+            x = stage.update(x)
+            if x is None:
+                self.dropped += 1
+                return None
+        self.value = x
+        return x
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+        self.value = None
+
+    def __bool__(self):
+        return bool(self.stages)
+
+
+# Stage names for build_pipeline(): name -> (factory, default argument)
+STAGES = {
+    "reject": (lambda a: OutlierRejector(k=a), 4.0),
+    "median": (lambda a: SlidingMedian(int(a)), 5),
+    "mean": (lambda a: SlidingMean(int(a)), 5),
+    "ema": (lambda a: Ema(a), 0.3),
+}
+
+
+def build_pipeline(spec: str | None) -> FilterPipeline:
+    """
+    Pipeline from a comma separated spec such as "reject:4,median:5,ema:0.3"
+    (stage[:argument], applied left to right). An empty spec gives an empty pipeline.
+    """
+    stages = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, arg = item.partition(":")
+        if name not in STAGES:
+            raise ValueError(f"unknown filter stage {name!r} (choose from {', '.join(STAGES)})")
+        factory, default = STAGES[name]
+        stages.append(factory(float(arg) if arg else default))
+    return FilterPipeline(*stages)
@@ -0,0 +1,178 @@
+"""
+Focal length from the lens peak position and the rig geometry, vectorized over runs.
+
+The lens sits between the laser and the sensor; with a = laser-to-lens and b = sensor-to-lens
+distance the thin-lens imaging of the laser focus gives f = a b / (a + b). Peak positions are
+geometry independent, so stored runs can be recomputed whenever an offset is recalibrated:
+
+    python -m measurement.geometry --laser-offset-mm 33.4 --sigma-laser-mm 0.2 --sigma-pos-mm 0.1 --lens 10
+"""
+import argparse
+import csv
+import sys
+from dataclasses import dataclass, fields
+from statistics import NormalDist
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Geometry:
+    laser_offset_mm: float = 33.0
+    sensor_offset_mm: float = 131.0
+    max_travel_mm: float = 280.0
+    # Lens holder width compensation
+    holder_width_mm: float = 5.0
+
+
+@dataclass(frozen=True)
+class GeometryUncertainty:
+    """Standard uncertainties (mm) of the geometry constants and of the peak positions."""
+    laser_offset_mm: float = 0.0
+    sensor_offset_mm: float = 0.0
+    max_travel_mm: float = 0.0
+    holder_width_mm: float = 0.0
+    pos_mm: float = 0.0
+
+
+@dataclass
+class FocalEstimate:
+    focal_mm: np.ndarray
+    std_mm: np.ndarray
+    lo_mm: np.ndarray
+    hi_mm: np.ndarray
+    confidence: float
+
+
+def distances(pos_mm, g: Geometry):
+    """(laser-to-lens, sensor-to-lens) distances; works on floats and arrays alike."""
+    a = pos_mm + g.laser_offset_mm + g.holder_width_mm
+    b = g.max_travel_mm - pos_mm - g.holder_width_mm + g.sensor_offset_mm
+    return a, b
+
+
+def focal_length(pos_mm, g: Geometry):
+    a, b = distances(pos_mm, g)
+    return (a * b) / (a + b)
+
+
+def jacobian(pos_mm, g: Geometry) -> dict:
+    """Partial derivatives of the focal length with respect to every input, per run."""
+    a, b = distances(pos_mm, g)
+    s2 = (a + b) ** 2
+    df_da = b * b / s2
+    df_db = a * a / s2
+    return {
+        "laser_offset_mm": df_da,
+        "sensor_offset_mm": df_db,
+        "max_travel_mm": df_db,
+        "holder_width_mm": df_da - df_db,
+        "pos_mm": df_da - df_db,
+    }
+
+
+def _z(confidence: float) -> float:
+    return NormalDist().inv_cdf(0.5 + confidence / 2.0)
+
+
+def propagate_jacobian(pos_mm, g: Geometry, u: GeometryUncertainty, confidence: float = 0.95) -> FocalEstimate:
+    """First-order (linearized) propagation; inputs are taken as independent."""
+    pos = np.asarray(pos_mm, dtype=float)
+    f = focal_length(pos, g)
+    J = jacobian(pos, g)
+    var = sum((J[name] * getattr(u, name)) ** 2 for name in J)
+    std = np.sqrt(var) * np.ones_like(f)
+    z = _z(confidence)
+    return FocalEstimate(f, std, f - z * std, f + z * std, confidence)
+
+
+def propagate_monte_carlo(pos_mm, g: Geometry, u: GeometryUncertainty, confidence: float = 0.95,
+                          n_samples: int = 4000, seed: int | None = None, batch_runs: int = 1024) -> FocalEstimate:
+    """
+    Monte Carlo propagation with Gaussian inputs, evaluated as (runs x samples) arrays in
+    batches of batch_runs runs. The interval is the central percentile range of the samples.
+    Geometry constants are drawn once per sample and shared by all runs (they are systematic),
+    position errors are independent per run.
+    """
+    pos = np.asarray(pos_mm, dtype=float).ravel()
+    rng = np.random.default_rng(seed)
+    draws = {
+        f.name: getattr(g, f.name) + getattr(u, f.name) * rng.standard_normal(n_samples)
+        for f in fields(Geometry)
+    }
+    sampled = Geometry(**{name: v[None, :] for name, v in draws.items()})
+    q = 50.0 * (1.0 - confidence)
+    f_mean = np.empty(pos.shape)
+    std = np.empty(pos.shape)
+    lo = np.empty(pos.shape)
+    hi = np.empty(pos.shape)
+    for start in range(0, len(pos), batch_runs):
+        p = pos[start:start + batch_runs, None]
+        p = p + u.pos_mm * rng.standard_normal((p.shape[0], n_samples))
+        f = focal_length(p, sampled)
+        sl = slice(start, start + p.shape[0])
+        f_mean[sl] = f.mean(axis=1)
+        std[sl] = f.std(axis=1, ddof=1)
+        lo[sl], hi[sl] = np.percentile(f, [q, 100.0 - q], axis=1)
+    return FocalEstimate(f_mean, std, lo, hi, confidence)
+
+
+def recompute(pos_mm, g: Geometry, u: GeometryUncertainty | None = None, method: str = "jacobian",
+              confidence: float = 0.95, **kwargs) -> FocalEstimate:
+    u = u or GeometryUncertainty()
+    if method == "jacobian":
+        return propagate_jacobian(pos_mm, g, u, confidence)
+    if method == "montecarlo":
+        return propagate_monte_carlo(pos_mm, g, u, confidence, **kwargs)
+    raise ValueError(f"unknown propagation method {method!r}")
+
+
+def main(argv=None):
+    from .results_db import RESULTS_DB, ResultsStore
+
+    d, z = Geometry(), GeometryUncertainty()
+    p = argparse.ArgumentParser(description="Recompute stored focal lengths under new geometry constants")
+    p.add_argument("--db", default=RESULTS_DB)
+    p.add_argument("--lens", default=None)
+    p.add_argument("--method-filter", default=None, help="Only runs of this measurement method (e.g. voltage_sensor)")
+    p.add_argument("--laser-offset-mm", type=float, default=d.laser_offset_mm)
+    p.add_argument("--sensor-offset-mm", type=float, default=d.sensor_offset_mm)
+    p.add_argument("--max-travel-mm", type=float, default=d.max_travel_mm)
+    p.add_argument("--holder-width-mm", type=float, default=d.holder_width_mm)
+    p.add_argument("--sigma-laser-mm", type=float, default=z.laser_offset_mm)
+    p.add_argument("--sigma-sensor-mm", type=float, default=z.sensor_offset_mm)
+    p.add_argument("--sigma-travel-mm", type=float, default=z.max_travel_mm)
+    p.add_argument("--sigma-holder-mm", type=float, default=z.holder_width_mm)
+    p.add_argument("--sigma-pos-mm", type=float, default=z.pos_mm, help="Peak position uncertainty")
+    p.add_argument("--propagation", choices=["jacobian", "montecarlo"], default="jacobian")
+    p.add_argument("--samples", type=int, default=4000, help="Monte Carlo samples per run")
+    p.add_argument("--confidence", type=float, default=0.95)
+    p.add_argument("--output", default=None, help="CSV output (default: stdout)")
+    a = p.parse_args(argv)
+
+    store = ResultsStore(a.db)
+    try:
+        runs = [r for r in store.query_runs(lens=a.lens, method=a.method_filter) if r["peak_pos_mm"] is not None]
+    finally:
+        store.close()
+    g = Geometry(a.laser_offset_mm, a.sensor_offset_mm, a.max_travel_mm, a.holder_width_mm)
+    u = GeometryUncertainty(a.sigma_laser_mm, a.sigma_sensor_mm, a.sigma_travel_mm, a.sigma_holder_mm, a.sigma_pos_mm)
+    pos = np.array([r["peak_pos_mm"] for r in runs], dtype=float)
+    kwargs = {"n_samples": a.samples} if a.propagation == "montecarlo" else {}
+    est = recompute(pos, g, u, a.propagation, a.confidence, **kwargs)
+
+    out = open(a.output, "w", newline="") if a.output else sys.stdout
+    try:
+        w = csv.writer(out)
+        w.writerow(["run_id", "lens", "method", "peak_pos_mm", "stored_focal_mm", "focal_mm", "std_mm", "ci_lo_mm", "ci_hi_mm"])
+        for i, r in enumerate(runs):
+            w.writerow([r["id"], r["lens"], r["method"], f"{pos[i]:.4f}",
+                        "" if r["focal_length_mm"] is None else f"{r['focal_length_mm']:.4f}",
+                        f"{est.focal_mm[i]:.4f}", f"{est.std_mm[i]:.4f}", f"{est.lo_mm[i]:.4f}", f"{est.hi_mm[i]:.4f}"])
+    finally:
+        if a.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import grp
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+
+from .estop import ESTOP_GROUP
+
+# Web server <-> measurement process link on the same host. Frames are a 5-byte header
+# (op, payload length) and a payload of tagged fields; no HTTP, JSON or name resolution.
+# The socket lives in a private runtime directory (mode 2770, group ESTOP_GROUP; the install script
+# creates it at boot): at a shared path such as /tmp any local user could bind it first and
+# command the motor through desired_cmd.
+RUNTIME_DIR = os.environ.get("LENSMETER_RUNTIME_DIR", "/run/lensmeter")
+RUNTIME_DIR_MODE = 0o2770
+DEFAULT_SOCKET = os.environ.get("LENSMETER_IPC_SOCKET", os.path.join(RUNTIME_DIR, "lensmeter.sock"))
+
+OP_GET = 1
+OP_UPDATE = 2
+OP_STATE = 3
+OP_OK = 4
+OP_ERROR = 5
+
+# Known state keys are sent as a one-byte id; any other key as _NAMED + its name
+FIELDS = (
+    "is_running", "is_homing", "current_pos_mm", "current_voltage", "best_pos_mm", "best_voltage",
+    "focal_length", "focal_lengths", "focal_length_std", "desired_cmd", "target_value", "rig",
+    "preview_port",
+)
+_FIELD_IDS = {name: i for i, name in enumerate(FIELDS)}
+_NAMED = 0xFF
+
+_T_NONE, _T_FALSE, _T_TRUE, _T_FLOAT, _T_INT, _T_STR, _T_MAP = range(7)
+
+_FRAME = struct.Struct("<BI")
+_F64 = struct.Struct("<d")
+_I64 = struct.Struct("<q")
+_U16 = struct.Struct("<H")
+
+MAX_FRAME = 1 << 20
+
+
+class IpcError(RuntimeError):
+    pass
+
+
+def _encode_str(s: str, out: bytearray):
+    b = s.encode("utf-8")
+    out += _U16.pack(len(b))
+    out += b
+
+
+def _encode_value(v, out: bytearray):
+    if v is None:
+        out.append(_T_NONE)
+    elif v is True:
+        out.append(_T_TRUE)
+    elif v is False:
+        out.append(_T_FALSE)
+    elif isinstance(v, int):
+        out.append(_T_INT)
+        out += _I64.pack(v)
+    elif isinstance(v, float):
+        out.append(_T_FLOAT)
+        out += _F64.pack(v)
+    elif isinstance(v, str):
+        out.append(_T_STR)
+        _encode_str(v, out)
+    elif isinstance(v, dict):
+        out.append(_T_MAP)
+        out += _U16.pack(len(v))
+        for k, item in v.items():
+            _encode_str(str(k), out)
+            _encode_value(item, out)
+    else:
+        # numpy scalars and the like
+        out.append(_T_FLOAT)
+        out += _F64.pack(float(v))
+
+
+def encode_state(state: dict) -> bytes:
+    out = bytearray()
+    for k, v in state.items():
+        field_id = _FIELD_IDS.get(k)
+        if field_id is None:
+            out.append(_NAMED)
+            _encode_str(k, out)
+        else:
+            out.append(field_id)
+        _encode_value(v, out)
+    return bytes(out)
+
+
+def _decode_str(buf, i):
+    n = _U16.unpack_from(buf, i)[0]
+    i += 2
+    return bytes(buf[i:i + n]).decode("utf-8"), i + n
+
+
+def _decode_value(buf, i):
+    tag = buf[i]
+    i += 1
+    if tag == _T_NONE:
+        return None, i
+    if tag == _T_FALSE:
+        return False, i
+    if tag == _T_TRUE:
+        return True, i
+    if tag == _T_FLOAT:
+        return _F64.unpack_from(buf, i)[0], i + 8
+    if tag == _T_INT:
+        return _I64.unpack_from(buf, i)[0], i + 8
+    if tag == _T_STR:
+        return _decode_str(buf, i)
+    if tag == _T_MAP:
+        n = _U16.unpack_from(buf, i)[0]
+        i += 2
+        d = {}
+        for _ in range(n):
+            k, i = _decode_str(buf, i)
+            d[k], i = _decode_value(buf, i)
+        return d, i
+    raise IpcError(f"unknown value tag {tag}")
+
+
+def decode_state(buf) -> dict:
+    state = {}
+    i = 0
+    while i < len(buf):
+        field_id = buf[i]
+        i += 1
+        if field_id == _NAMED:
+            key, i = _decode_str(buf, i)
+        elif field_id < len(FIELDS):
+            key = FIELDS[field_id]
+        else:
+            raise IpcError(f"unknown field id {field_id}")
+        state[key], i = _decode_value(buf, i)
+    return state
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("peer closed the connection")
+        buf += chunk
+    return bytes(buf)
+
+
+def send_frame(sock, op: int, payload: bytes = b""):
+    sock.sendall(_FRAME.pack(op, len(payload)) + payload)
+
+
+def recv_frame(sock) -> tuple:
+    op, n = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    if n > MAX_FRAME:
+        raise IpcError(f"frame of {n} bytes exceeds {MAX_FRAME}")
+    return op, _recv_exact(sock, n) if n else b""
+
+
+def socket_available(path: str = DEFAULT_SOCKET) -> bool:
+    """
+    True if a trusted server socket exists at path, i.e. the web server runs on this host: it must
+    be owned by this user or root and not be writable by others.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid in (os.geteuid(), 0) and not st.st_mode & stat.S_IWOTH
+
+
+def _make_runtime_dir(path: str, group: str | None):
+    """Create the socket's directory owner and group only (setgid, so the socket gets the group too)."""
+    if os.path.isdir(path):
+        return
+    os.makedirs(path, mode=0o700)
+    try:
+        if group:
+            os.chown(path, -1, grp.getgrnam(group).gr_gid)
+    except KeyError:
+        print(f"IPC WARNING: group {group!r} does not exist, {path} stays with the creator's group")
+    os.chmod(path, RUNTIME_DIR_MODE)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # Persistent connection: one request frame, one reply frame, until the client hangs up
+        while True:
+            try:
+                op, payload = recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                if op == OP_GET:
+                    send_frame(self.request, OP_STATE, encode_state(self.server.get_state(decode_state(payload))))
+                elif op == OP_UPDATE:
+                    self.server.apply_update(decode_state(payload))
+                    send_frame(self.request, OP_OK)
+                else:
+                    send_frame(self.request, OP_ERROR, f"unknown op {op}".encode("utf-8"))
+            except IpcError as e:
+                send_frame(self.request, OP_ERROR, str(e).encode("utf-8"))
+            except OSError:
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class IpcServer:
+    """
+    Serves get_state(query)/apply_update(dict) on a Unix domain socket, where query holds the
+    request fields (e.g. {"rig": name}). Access control is the socket file mode (owner and
+    group only), which takes the place of the HTTP API key.
+    """
+
+    def __init__(self, get_state, apply_update, path: str = DEFAULT_SOCKET, mode: int = 0o660,
+                 group: str | None = ESTOP_GROUP):
+        self.path = path
+        self.mode = mode
+        self.group = group
+        self._get_state = get_state
+        self._apply_update = apply_update
+        self._server = None
+        self._thread = None
+
+    def _remove_stale(self):
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)
+            return
+        finally:
+            probe.close()
+        raise IpcError(f"another server is already listening on {self.path}")
+
+    def start(self):
+        _make_runtime_dir(os.path.dirname(os.path.abspath(self.path)), self.group)
+        self._remove_stale()
+        self._server = _Server(self.path, _Handler)
+        self._server.get_state = self._get_state
+        self._server.apply_update = self._apply_update
+        os.chmod(self.path, self.mode)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ipc-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class IpcClient:
+    """Client side of IpcServer over one persistent connection (reconnects on demand)."""
+
+    def __init__(self, path: str = DEFAULT_SOCKET):
+        self.path = path
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _connect(self, timeout: float):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.settimeout(timeout)
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+        self._sock.settimeout(timeout)
+        return self._sock
+
+    def _call(self, op: int, payload: bytes, timeout: float) -> tuple:
+        with self._lock:
+            try:
+                sock = self._connect(timeout)
+                send_frame(sock, op, payload)
+                reply = recv_frame(sock)
+            except (OSError, IpcError):
+                self.close()
+                raise
+        if reply[0] == OP_ERROR:
+            raise IpcError(reply[1].decode("utf-8", "replace"))
+        return reply
+
+    def get_status(self, timeout: float = 1.5, rig: str | None = None) -> dict:
+        op, payload = self._call(OP_GET, encode_state({"rig": rig}) if rig else b"", timeout)
+        if op != OP_STATE:
+            raise IpcError(f"unexpected reply op {op}")
+        return decode_state(payload)
+
+    def update(self, payload: dict, timeout: float = 1.5):
+        self._call(OP_UPDATE, encode_state(payload), timeout)
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
@@ -0,0 +1,214 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bucket bounds (seconds) cover ms-level sensor reads up to multi-second moves
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels_str(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels_str(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, c in zip(self.buckets, series["counts"]):
+                    cumulative += c
+                    lines.append(f"{self.name}_bucket{_labels_str(key + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels_str(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{_labels_str(key)} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{_labels_str(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text)
+            return self._metrics[name]
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, buckets)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+class RunProfile:
+    """Per-run aggregate of span durations keyed by folded stack ("search;move")."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall_s = 0.0
+        self.totals = {}
+        self.counts = {}
+
+    def add(self, path: str, duration_s: float):
+        self.totals[path] = self.totals.get(path, 0.0) + duration_s
+        self.counts[path] = self.counts.get(path, 0) + 1
+
+    def format(self, width: int = 40) -> str:
+        """Flame-style text summary: one bar per stack, scaled to the run's wall time."""
+        wall = self.wall_s or (time.perf_counter() - self.started)
+        lines = [f"--- Run profile: {wall:.2f} s wall ---"]
+        for path in sorted(self.totals, key=lambda p: (p.split(";"), -self.totals[p])):
+            total = self.totals[path]
+            depth = path.count(";")
+            share = total / wall if wall > 0 else 0.0
+            bar = "#" * max(1, int(round(share * width))) if total > 0 else ""
+            name = "  " * depth + path.rsplit(";", 1)[-1]
+            lines.append(f"{name:<24} {bar:<{width}} {total:8.3f} s {share * 100:5.1f}% n={self.counts[path]}")
+        return "\n".join(lines)
+
+
+class Tracer:
+    """Lightweight timing spans aggregated into histograms, counters and the current run profile."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self.phase_seconds = registry.histogram("lensmeter_phase_seconds", "Duration of measurement phases")
+        self.phase_total = registry.counter("lensmeter_phase_total", "Number of completed measurement phases")
+        # Span stack and current run profile are per thread, so concurrent rigs profile separately
+        self._local = threading.local()
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, phase: str):
+        stack = self._stack()
+        stack.append(phase)
+        path = ";".join(stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            self.phase_seconds.observe(duration, phase=phase)
+            self.phase_total.inc(phase=phase)
+            run = getattr(self._local, "run", None)
+            if run is not None:
+                run.add(path, duration)
+
+    def begin_run(self) -> RunProfile:
+        self._local.run = RunProfile()
+        return self._local.run
+
+    def end_run(self) -> RunProfile | None:
+        run, self._local.run = getattr(self._local, "run", None), None
+        if run is not None:
+            run.wall_s = time.perf_counter() - run.started
+        return run
+
+
+class MetricsServer:
+    """Serves GET /metrics from a background thread (stdlib only, no Flask in the measurement process)."""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._httpd = None
+        self._thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            print(f"METRICS WARNING: Unable to listen on {self.host}:{self.port}: {e}")
+            return
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+registry = MetricsRegistry()
+tracer = Tracer(registry)
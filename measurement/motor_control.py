@@ -1,16 +1,133 @@
-import RPi.GPIO as GPIO
+import bisect
+import os
+import queue
+import threading
 import time
+from collections import deque
+
+from .estop import EmergencyStop, EStopFlag, estop_latency_seconds
+from .metrics import tracer
+from .resources import for_gpio, gpio_pin
+from .timing import StepTiming, sleep_until
+
+
+# RPi.GPIO, imported on first use so the driver also runs off the Pi with a stand-in module
+GPIO = None
+
+
+def _rpi_gpio():
+    global GPIO
+    if GPIO is None:
+        import RPi.GPIO
+        GPIO = RPi.GPIO
+    return GPIO
+
+
+class StepWorker:
+    """
+    Dedicated thread that generates the step pulses.
+
+    Optionally pins itself to one CPU and requests SCHED_FIFO priority (Linux, needs root),
+    so pulse timing is not disturbed by the sensor threads and the rest of the process.
+    """
+
+    def __init__(self, rt_priority: int | None = None, cpu: int | None = None):
+        self.rt_priority = rt_priority
+        self.cpu = cpu
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _setup_thread(self):
+        if self.cpu is not None:
+            try:
+                os.sched_setaffinity(0, {int(self.cpu)})
+            except (AttributeError, OSError) as e:
+                print(f"MOTOR FIGYELMEZTETÉS: CPU affinitás nem állítható: {e}")
+        if self.rt_priority is not None:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(int(self.rt_priority)))
+            except (AttributeError, OSError) as e:
+                print(f"MOTOR FIGYELMEZTETÉS: valós idejű prioritás nem állítható: {e}")
+
+    def _loop(self):
+        self._setup_thread()
+        while True:
+            fn, done, result = self._jobs.get()
+            try:
+                result["value"] = fn()
+            except BaseException as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+    def run(self, fn):
+        """Run fn on the worker thread and wait for it (the caller stays interruptible)."""
+        done = threading.Event()
+        result = {}
+        self._jobs.put((fn, done, result))
+        while not done.wait(0.1):
+            pass
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
 
 
 class StepperMotor:
-    def __init__(self, step_pin=6, dir_pin=12, enable_pin=5, full_steps=200, microsteps=8):
+    def __init__(self, step_pin=6, dir_pin=12, enable_pin=5, full_steps=200, microsteps=8,
+                 realtime: bool = True, rt_priority: int | None = None, cpu: int | None = None,
+                 spin_us: float = 200.0, backlash_mm: float = 0.0, gpio=None, estop: EStopFlag | bool | None = None,
+                 owner: str | None = None):
+        """
+        gpio: RPi.GPIO-compatible module (default RPi.GPIO; measurement.sim_gpio.SimGPIO off the Pi)
+        estop: shared emergency stop flag checked before every step (default: the system-wide one;
+               OSError if it cannot be opened). False runs without one, for simulations only.
+        owner: name the pins are claimed under (e.g. the rig); claiming fails if another owner holds them
+        """
+        self.gpio = gpio if gpio is not None else _rpi_gpio()
+
+        # Vészleállítás: a lépésciklus minden lépés előtt megnézi a közös jelzőt.
+        # Jelző nélkül nem indulunk (a pinek lefoglalása előtt), kivéve ha a hívó kifejezetten kéri.
+        if estop is None:
+            try:
+                estop = EStopFlag()
+            except OSError as e:
+                print(f"MOTOR HIBA: vészleállító jelző nem elérhető, a motor nem indul: {e}")
+                raise
+        self.estop = None if estop is False else estop
+        self.last_estop_latency_s = None
+        self._estopped = False
+
         self.step_pin = step_pin
         self.dir_pin = dir_pin
         self.enable_pin = enable_pin
+        self.pins = (step_pin, dir_pin, enable_pin)
+        self.owner = owner or f"motor@{step_pin}"
+        self._resources = for_gpio(self.gpio)
+        self._resources.claim(self.owner, *(gpio_pin(p) for p in self.pins))
 
         self.steps_per_rev = float(full_steps * microsteps)
 
+        # Step timing: deadline-based hybrid sleep/spin, optionally on a dedicated worker thread
+        self.spin_s = max(0.0, float(spin_us)) * 1e-6
+        self._worker = StepWorker(rt_priority=rt_priority, cpu=cpu) if realtime else None
+        self._abort = threading.Event()
+        self.last_move_timing: StepTiming | None = None
+
+        # Backlash compensation: extra steps taken up on every change of travel direction
+        self.backlash_mm = max(0.0, float(backlash_mm))
+        self._direction = 1
+        self._last_travel_dir = None
+
+        # Commanded carriage position (mm, backlash steps excluded) and its (time.time(), mm) history,
+        # logged about every millisecond of stepping so sensor samples can be mapped to position
+        self.position_mm = 0.0
+        self.position_log = deque(maxlen=200000)
+        self._log_interval_s = 0.001
+        self.last_move_end = 0.0
+
         # GPIO Setup
+        GPIO = self.gpio
         GPIO.setwarnings(False)
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(self.step_pin, GPIO.OUT)
@@ -22,18 +139,104 @@ class StepperMotor:
         self.disable()
 
     def enable(self):
-        GPIO.output(self.enable_pin, GPIO.LOW)
+        self.gpio.output(self.enable_pin, self.gpio.LOW)
 
     def disable(self):
-        GPIO.output(self.enable_pin, GPIO.HIGH)
+        self.gpio.output(self.enable_pin, self.gpio.HIGH)
 
     def cleanup(self):
+        # Csak a saját pinjeinket engedjük el: más rigek ugyanazon a GPIO-n futhatnak tovább
+        if self._resources.owner(gpio_pin(self.enable_pin)) != self.owner:
+            return
         self.disable()
-        GPIO.cleanup()
+        self.gpio.cleanup(list(self.pins))
+        self._resources.release(self.owner, *(gpio_pin(p) for p in self.pins))
 
     def set_direction(self, direction):
         # Convention: 1 = forward (LOW), -1 = reverse (HIGH)
-        GPIO.output(self.dir_pin, GPIO.LOW if direction == 1 else GPIO.HIGH)
+        self._direction = 1 if direction == 1 else -1
+        self.gpio.output(self.dir_pin, self.gpio.LOW if direction == 1 else self.gpio.HIGH)
+
+    def _emergency_stop(self):
+        """Driver off first, bookkeeping after (runs on the stepping thread)."""
+        self.disable()
+        self._estopped = True
+        raised_at = self.estop.raised_at()
+        if raised_at is not None:
+            self.last_estop_latency_s = time.time() - raised_at
+            estop_latency_seconds.observe(self.last_estop_latency_s)
+
+    def _step_pulses(self, total_steps, delay, mm_per_step, direction, progress_callback):
+        """
+        Impulzusok generálása abszolút határidőkhöz igazítva: a késés nem halmozódik,
+        a tényleges lépésközöket hisztogramba gyűjtjük.
+        """
+        timing = StepTiming(commanded_interval_s=2 * delay)
+        current_pos = 0.0
+        last_callback_time = time.time()
+        wall0 = time.time()
+        t0 = time.perf_counter()
+        prev_rise = None
+        travel_per_step = mm_per_step * self._direction
+        log_stride = max(1, int(self._log_interval_s / (2 * delay)))
+        if travel_per_step:
+            self.position_log.append((wall0, self.position_mm))
+        output, high, low = self.gpio.output, self.gpio.HIGH, self.gpio.LOW
+        estop = self.estop
+
+        for i in range(total_steps):
+            if self._abort.is_set():
+                break
+            if estop is not None and estop.is_set():
+                self._emergency_stop()
+                break
+            rise = sleep_until(t0 + i * 2 * delay, self.spin_s)
+            output(self.step_pin, high)
+            sleep_until(t0 + (i * 2 + 1) * delay, self.spin_s)
+            output(self.step_pin, low)
+
+            if prev_rise is not None:
+                timing.intervals.record(rise - prev_rise)
+            prev_rise = rise
+            timing.steps += 1
+
+            current_pos += (mm_per_step * direction)
+            self.position_mm += travel_per_step
+            if travel_per_step and (i + 1) % log_stride == 0:
+                self.position_log.append((wall0 + (rise - t0) + delay, self.position_mm))
+
+            if progress_callback and (time.time() - last_callback_time > 0.1):
+                progress_callback(current_pos)
+                last_callback_time = time.time()
+
+        if prev_rise is not None:
+            timing.duration_s = prev_rise - t0
+            if travel_per_step:
+                self.position_log.append((wall0 + (prev_rise - t0) + delay, self.position_mm))
+        # Wait out the last low phase so back-to-back moves keep the commanded rate
+        if not self._estopped:
+            sleep_until(t0 + total_steps * 2 * delay, self.spin_s)
+        return timing
+
+    def positions_at(self, times) -> list:
+        """Carriage positions (mm) at the given wall-clock times, interpolated from the position log."""
+        log = list(self.position_log)
+        if not log:
+            return [self.position_mm for _ in times]
+        result = []
+        for t in times:
+            i = bisect.bisect_left(log, (t,))
+            if i == 0:
+                result.append(log[0][1])
+            elif i >= len(log):
+                result.append(log[-1][1])
+            else:
+                (t0, p0), (t1, p1) = log[i - 1], log[i]
+                result.append(p1 if t1 <= t0 else p0 + (p1 - p0) * (t - t0) / (t1 - t0))
+        return result
+
+    def position_at(self, t: float) -> float:
+        return self.positions_at((t,))[0]
 
     def move(self, dist_mm, lead_mm, speed_rps=0.01, progress_callback=None):
         """
@@ -44,6 +247,8 @@ class StepperMotor:
         """
         if lead_mm <= 0:
             return
+        if self.estop is not None and self.estop.is_set():
+            raise EmergencyStop(f"vészleállítás aktív ({self.estop.reason() or 'ok nélkül'}), a mozgás nem indul")
 
         rotations = dist_mm / lead_mm
         total_steps = int(abs(rotations) * self.steps_per_rev)
@@ -56,28 +261,46 @@ class StepperMotor:
         print(f"Mozgás indítása: {dist_mm} mm ({total_steps} lépés)")
 
         self.enable()
-        time.sleep(0.05)
+        with tracer.span("motor_enable"):
+            time.sleep(0.05)
 
         mm_per_step = lead_mm / self.steps_per_rev
-        current_pos = 0.0
-        last_callback_time = time.time()
+        self._abort.clear()
+        self._estopped = False
 
-        try:
-            for i in range(total_steps):
-                GPIO.output(self.step_pin, GPIO.HIGH)
-                time.sleep(delay)
-                GPIO.output(self.step_pin, GPIO.LOW)
-                time.sleep(delay)
+        # Holtjáték kompenzáció: irányváltáskor a kotyogást plusz lépésekkel vesszük fel
+        # (the physical travel direction is set by set_direction(), the sign of dist_mm is not applied to the pin)
+        travel_dir = self._direction
+        backlash_steps = 0
+        if total_steps > 0:
+            if self._last_travel_dir is not None and travel_dir != self._last_travel_dir:
+                backlash_steps = int(round(self.backlash_mm / mm_per_step))
+            self._last_travel_dir = travel_dir
 
-                current_pos += (mm_per_step * direction)
+        def job():
+            if backlash_steps:
+                self._step_pulses(backlash_steps, delay, 0.0, direction, None)
+                if self._estopped:
+                    return None
+            return self._step_pulses(total_steps, delay, mm_per_step, direction, progress_callback)
 
-                if progress_callback and (time.time() - last_callback_time > 0.1):
-                    progress_callback(current_pos)
-                    last_callback_time = time.time()
+        try:
+            if self._worker is not None:
+                self.last_move_timing = self._worker.run(job)
+            else:
+                self.last_move_timing = job()
+            if self._estopped:
+                latency = "" if self.last_estop_latency_s is None else f", {self.last_estop_latency_s * 1e3:.2f} ms alatt"
+                print(f"\nVÉSZLEÁLLÍTÁS: motor letiltva{latency} ({self.estop.reason() or 'ok nélkül'})")
+                raise EmergencyStop(self.estop.reason() or "emergency stop")
+            if total_steps > 1:
+                print(f"  lépésütem: {self.last_move_timing.summary()}")
 
         except KeyboardInterrupt:
+            self._abort.set()
             print("\nMotor mozgás megszakítva!")
             raise
 
         finally:
             self.disable()
+            self.last_move_end = time.time()
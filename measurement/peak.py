@@ -0,0 +1,83 @@
+from typing import Sequence, Tuple
+
+
+def refine_peak(positions: Sequence[float], values: Sequence[float]) -> Tuple[float, float]:
+    """
+    Return the (position, value) of the maximum, refined by a parabola through the
+    best sample and its two neighbours when they are equally spaced.
+    """
+    if not positions:
+        raise ValueError("refine_peak needs at least one sample")
+    i = max(range(len(values)), key=lambda k: values[k])
+    pos, val = float(positions[i]), float(values[i])
+    if 0 < i < len(values) - 1:
+        x0, x1, x2 = positions[i - 1], positions[i], positions[i + 1]
+        y0, y1, y2 = values[i - 1], values[i], values[i + 1]
+        h = x1 - x0
+        denom = y0 - 2.0 * y1 + y2
+        if abs(h) > 1e-12 and abs((x2 - x1) - h) < 1e-6 * max(1.0, abs(h)) and denom < 0:
+            offset = 0.5 * (y0 - y2) / denom
+            pos = x1 + offset * h
+            val = y1 - 0.25 * (y0 - y2) * offset
+    return pos, val
+
+
+def trace_peak(trace: Sequence[Tuple[float, float, float]], bin_mm: float = 0.05) -> Tuple[float, float]:
+    """
+    Peak of a densely sampled (t, pos_mm, value) trace: samples are averaged into
+    bin_mm wide position bins, then the best bin is refined with refine_peak().
+    """
+    bins = {}
+    for _, pos, val in trace:
+        k = int(round(pos / bin_mm))
+        acc = bins.setdefault(k, [0.0, 0])
+        acc[0] += val
+        acc[1] += 1
+    if not bins:
+        raise ValueError("trace_peak needs at least one sample")
+    keys = sorted(bins)
+    best = max(keys, key=lambda k: bins[k][0] / bins[k][1])
+    # Use only the best bin and its direct neighbours so the parabola sees equal spacing
+    window = [k for k in (best - 1, best, best + 1) if k in bins]
+    return refine_peak([k * bin_mm for k in window], [bins[k][0] / bins[k][1] for k in window])
+
+
+def fit_peak(positions: Sequence[float], values: Sequence[float], half_width_mm: float = 1.0) -> Tuple[float, float]:
+    """
+    Least-squares parabola through every sample within half_width_mm of the maximum.
+    Less sensitive to noise than refine_peak() on densely sampled data; falls back to it
+    when the window holds fewer than three samples or the fit is not concave.
+    """
+    if not positions:
+        raise ValueError("fit_peak needs at least one sample")
+    i = max(range(len(values)), key=lambda k: values[k])
+    x_best = positions[i]
+    pts = [(x - x_best, y) for x, y in zip(positions, values) if abs(x - x_best) <= half_width_mm]
+    if len(pts) < 3:
+        return refine_peak(positions, values)
+    # Normal equations of y = a x^2 + b x + c (x relative to the best sample)
+    s = [sum(x ** k for x, _ in pts) for k in range(5)]
+    t = [sum(y * x ** k for x, y in pts) for k in range(3)]
+    m = [[s[4], s[3], s[2]], [s[3], s[2], s[1]], [s[2], s[1], s[0]]]
+
+    def det(a):
+        return (a[0][0] * (a[1][1] * a[2][2] - a[1][2] * a[2][1])
+                - a[0][1] * (a[1][0] * a[2][2] - a[1][2] * a[2][0])
+                + a[0][2] * (a[1][0] * a[2][1] - a[1][1] * a[2][0]))
+
+    d = det(m)
+    if abs(d) < 1e-18:
+        return refine_peak(positions, values)
+    coef = []
+    for col in range(3):
+        mc = [row[:] for row in m]
+        for r in range(3):
+            mc[r][col] = t[2 - r]
+        coef.append(det(mc) / d)
+    a, b, c = coef
+    if a >= 0:
+        return refine_peak(positions, values)
+    x0 = -b / (2.0 * a)
+    if abs(x0) > half_width_mm:
+        return refine_peak(positions, values)
+    return x_best + x0, c - b * b / (4.0 * a)
@@ -0,0 +1,243 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+
+class FrameBuffer:
+    """
+    Latest-frame slot the camera loop publishes to. Publishing only swaps references (the
+    capture returns a new array per frame), so the measurement thread never copies or encodes.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._mask = None
+        self._t = 0.0
+        self.seq = 0
+
+    def publish(self, frame, mask=None, t: float | None = None):
+        with self._cond:
+            self._frame = frame
+            self._mask = mask
+            self._t = time.time() if t is None else t
+            self.seq += 1
+            self._cond.notify_all()
+
+    def latest(self):
+        """(seq, t, frame, mask) of the newest frame, None before the first one."""
+        with self._cond:
+            if self.seq == 0:
+                return None
+            return self.seq, self._t, self._frame, self._mask
+
+    def wait(self, after_seq: int, timeout: float):
+        """Newest frame once its seq is past after_seq, None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > after_seq, timeout):
+                return None
+            return self.seq, self._t, self._frame, self._mask
+
+
+class PreviewEncoder:
+    """
+    Encodes the newest frame of a FrameBuffer to JPEG in its own thread, at most once per frame
+    and at most max_fps times a second; every viewer gets the same bytes. The thread idles once
+    nobody has asked for a frame for idle_s.
+    """
+
+    def __init__(self, buffer: FrameBuffer, max_fps: float = 10.0, quality: int = 70, max_width: int | None = 640,
+                 overlay: bool = False, idle_s: float = 2.0):
+        self.buffer = buffer
+        self.max_fps = max_fps
+        self.quality = int(quality)
+        self.max_width = max_width
+        # Tint the detected laser spot (the camera's mask) red
+        self.overlay = overlay
+        self.idle_s = idle_s
+        self.encoded = 0
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._wanted = 0.0
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="preview-encoder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    def render(self, frame, mask=None) -> np.ndarray:
+        import cv2
+
+        if self.max_width and frame.shape[1] > self.max_width:
+            scale = self.max_width / frame.shape[1]
+            size = (self.max_width, max(1, int(round(frame.shape[0] * scale))))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            if mask is not None:
+                mask = cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST)
+        if self.overlay and mask is not None and frame.ndim == 3:
+            frame = frame.copy()
+            spot = mask > 0
+            frame[spot] = (0.6 * frame[spot] + 0.4 * np.array((0, 0, 255))).astype(frame.dtype)
+        return frame
+
+    def encode(self, frame, mask=None) -> bytes | None:
+        import cv2
+
+        ok, jpeg = cv2.imencode(".jpg", self.render(frame, mask), [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return jpeg.tobytes() if ok else None
+
+    def _loop(self):
+        last_seq = 0
+        last_encode = 0.0
+        while self._running:
+            if time.monotonic() - self._wanted > self.idle_s:
+                self._wake.wait(0.5)
+                self._wake.clear()
+                continue
+            if self.buffer.wait(last_seq, timeout=0.5) is None:
+                continue
+            delay = last_encode + 1.0 / self.max_fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            # Frames that arrived during the rate-cap delay are skipped, not queued
+            seq, _, frame, mask = self.buffer.latest()
+            last_encode = time.monotonic()
+            try:
+                jpeg = self.encode(frame, mask)
+            except Exception as e:
+                print(f"PREVIEW WARNING: Unable to encode frame: {e}")
+                jpeg = None
+            last_seq = seq
+            if jpeg is None:
+                continue
+            with self._cond:
+                self._jpeg = jpeg
+                self._seq = seq
+                self.encoded += 1
+                self._cond.notify_all()
+
+    def get(self, after_seq: int = 0, timeout: float = 2.0):
+        """(seq, jpeg) of the first encoded frame newer than after_seq, None on timeout."""
+        self._wanted = time.monotonic()
+        self._wake.set()
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
+                return None
+            return self._seq, self._jpeg
+
+    def snapshot(self, timeout: float = 2.0):
+        """JPEG of the current frame (re-uses the last encoding if the frame has not changed)."""
+        item = self.get(after_seq=self.buffer.seq - 1, timeout=timeout)
+        return None if item is None else item[1]
+
+
+class PreviewServer:
+    """
+    Serves GET /preview.mjpg (multipart MJPEG) and /snapshot.jpg from a FrameBuffer; add
+    ?overlay=1 for the spot overlay. One encoder per variant is shared by all viewers.
+    """
+
+    def __init__(self, buffer: FrameBuffer, host: str = "127.0.0.1", port: int = 9109, max_fps: float = 10.0,
+                 quality: int = 70, max_width: int | None = 640):
+        self.buffer = buffer
+        self.host = host
+        self.port = port
+        self.max_fps = max_fps
+        self.quality = quality
+        self.max_width = max_width
+        self.encoders = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._httpd = None
+        self._thread = None
+
+    def encoder(self, overlay: bool) -> PreviewEncoder:
+        with self._lock:
+            if overlay not in self.encoders:
+                enc = PreviewEncoder(self.buffer, self.max_fps, self.quality, self.max_width, overlay=overlay)
+                enc.start()
+                self.encoders[overlay] = enc
+            return self.encoders[overlay]
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                overlay = parse_qs(url.query).get("overlay", ["0"])[0] not in ("0", "")
+                if url.path == "/snapshot.jpg":
+                    self._snapshot(server.encoder(overlay))
+                elif url.path == "/preview.mjpg":
+                    self._stream(server.encoder(overlay))
+                else:
+                    self.send_error(404)
+
+            def _snapshot(self, enc):
+                jpeg = enc.snapshot()
+                if jpeg is None:
+                    self.send_error(503, "no camera frame yet")
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(jpeg)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(jpeg)
+
+            def _stream(self, enc):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                seq = 0
+                try:
+                    while server._running:
+                        item = enc.get(seq)
+                        if item is None:
+                            continue
+                        seq, jpeg = item
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(jpeg))
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            print(f"PREVIEW WARNING: Unable to listen on {self.host}:{self.port}: {e}")
+            return
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._running = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        for enc in self.encoders.values():
+            enc.stop()
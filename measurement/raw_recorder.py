@@ -0,0 +1,184 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+# One record per sensor sample: wall time, global sequence number, value, carriage position, sensor id
+RAW_DTYPE = np.dtype([
+    ("t", "<f8"),
+    ("seq", "<u8"),
+    ("value", "<f8"),
+    ("pos_mm", "<f4"),
+    ("sensor", "<u2"),
+    ("_pad", "<u2"),
+])
+_RECORD = struct.Struct("<dQdfHH")
+assert _RECORD.size == RAW_DTYPE.itemsize
+
+# File header: magic, record size, capacity, valid record count, creation time (padded to 64 bytes)
+_MAGIC = b"LMRAW001"
+_HEADER = struct.Struct("<8sIQQd")
+HEADER_SIZE = 64
+_COUNT_OFFSET = 8 + 4 + 8
+
+
+class RawRecorder:
+    """
+    Appends raw sensor samples to pre-sized memory-mapped segment files (<base>.00000.raw, ...).
+
+    Writing is a struct.pack_into into the mapping plus an 8-byte count update in the header,
+    so the sensor threads neither allocate nor format anything. When a segment is full the
+    next one is created (rollover); the first segment is only created by the first sample, so a
+    session that records nothing leaves no file behind. Sensor names are kept in <base>.json, segments are read
+    back with load_raw() as NumPy record arrays without parsing.
+    """
+
+    def __init__(self, base_path: str, segment_records: int = 2_000_000, max_segments: int | None = None):
+        self.base_path = base_path
+        self.segment_records = int(segment_records)
+        # Oldest segments are deleted beyond this many (None keeps everything)
+        self.max_segments = max_segments
+        self.position_source = None
+        self.sensors = {}
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._segment = -1
+        self._file = None
+        self._mm = None
+        self._count = 0
+        self._closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(base_path)), exist_ok=True)
+        existing = segment_paths(base_path)
+        if existing:
+            self._segment = int(existing[-1].rsplit(".", 2)[-2])
+            # Appending to an earlier session: sequence numbers continue after its last record
+            self._seq = _next_seq(existing)
+        self._load_index()
+
+    def _index_path(self) -> str:
+        return f"{self.base_path}.json"
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), "r") as f:
+                self.sensors = {name: int(i) for name, i in json.load(f).get("sensors", {}).items()}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"RAW RECORDER WARNING: Unable to read {self._index_path()}: {e}")
+
+    def _save_index(self):
+        tmp = f"{self._index_path()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"sensors": self.sensors, "dtype": RAW_DTYPE.descr}, f, indent=2)
+        os.replace(tmp, self._index_path())
+
+    def register(self, name: str) -> int:
+        """Sensor id for `name` (stable across sessions recorded to the same base path)."""
+        with self._lock:
+            if name not in self.sensors:
+                self.sensors[name] = len(self.sensors)
+                self._save_index()
+            return self.sensors[name]
+
+    def _open_next(self):
+        self._close_segment()
+        self._segment += 1
+        path = f"{self.base_path}.{self._segment:05d}.raw"
+        size = HEADER_SIZE + self.segment_records * _RECORD.size
+        self._file = open(path, "w+b")
+        # Reserve the whole segment up front so appends never extend the file
+        self._file.truncate(size)
+        try:
+            os.posix_fallocate(self._file.fileno(), 0, size)
+        except (AttributeError, OSError):
+            pass
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        _HEADER.pack_into(self._mm, 0, _MAGIC, _RECORD.size, self.segment_records, 0, time.time())
+        self._count = 0
+        if self.max_segments:
+            for old in segment_paths(self.base_path)[:-self.max_segments]:
+                os.remove(old)
+
+    def _close_segment(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def append(self, t: float, value: float, sensor_id: int = 0):
+        pos = self.position_source() if self.position_source is not None else float("nan")
+        with self._lock:
+            if self._closed:
+                return
+            if self._mm is None or self._count >= self.segment_records:
+                self._open_next()
+            _RECORD.pack_into(self._mm, HEADER_SIZE + self._count * _RECORD.size, t, self._seq, value, pos, sensor_id, 0)
+            self._count += 1
+            self._seq += 1
+            struct.pack_into("<Q", self._mm, _COUNT_OFFSET, self._count)
+
+    def flush(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._close_segment()
+
+
+def segment_paths(base_path: str) -> list:
+    return sorted(glob.glob(f"{glob.escape(base_path)}.[0-9][0-9][0-9][0-9][0-9].raw"))
+
+
+def _next_seq(paths: list) -> int:
+    """Sequence number after the last record of the newest non-empty segment."""
+    for path in reversed(paths):
+        try:
+            data = load_segment(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"RAW RECORDER WARNING: Unable to read {path}: {e}")
+            continue
+        if len(data):
+            return int(data["seq"][-1]) + 1
+    return 0
+
+
+def load_segment(path: str) -> np.ndarray:
+    """Valid records of one segment as a read-only memory-mapped record array."""
+    with open(path, "rb") as f:
+        magic, record_size, capacity, count, _ = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != _MAGIC or record_size != RAW_DTYPE.itemsize:
+        raise ValueError(f"{path}: not a raw recorder segment")
+    if count == 0:
+        return np.zeros(0, dtype=RAW_DTYPE)
+    return np.memmap(path, dtype=RAW_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def load_raw(base_path: str, sensor: str | None = None) -> np.ndarray:
+    """
+    All records under base_path in recording order (segments concatenated), optionally only
+    those of one sensor name. A single segment is returned memory-mapped, without copying.
+    """
+    parts = [load_segment(p) for p in segment_paths(base_path)]
+    if not parts:
+        data = np.zeros(0, dtype=RAW_DTYPE)
+    elif len(parts) == 1:
+        data = parts[0]
+    else:
+        data = np.concatenate(parts)
+    if sensor is not None:
+        with open(f"{base_path}.json", "r") as f:
+            sensor_id = json.load(f)["sensors"][sensor]
+        data = data[data["sensor"] == sensor_id]
+    return data
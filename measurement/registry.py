@@ -0,0 +1,52 @@
+import importlib
+
+
+class Registry:
+    """
+    Backends registered by name as "module:attribute" strings and imported on first use,
+    so a run only pays for the drivers (OpenCV, Picamera2, smbus2, RPi.GPIO, ...) it selects.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._targets = {}
+        self._help = {}
+        self._loaded = {}
+
+    def register(self, name: str, target: str, help_text: str = ""):
+        self._targets[name] = target
+        self._help[name] = help_text
+        self._loaded.pop(name, None)
+
+    def names(self) -> list:
+        return list(self._targets)
+
+    def help(self, name: str) -> str:
+        return self._help.get(name, "")
+
+    def describe(self) -> str:
+        return ", ".join(f"'{name}' ({self._help[name]})" if self._help[name] else f"'{name}'" for name in self._targets)
+
+    def load(self, name: str):
+        if name not in self._targets:
+            raise KeyError(f"unknown {self.kind} {name!r} (available: {', '.join(self._targets)})")
+        if name not in self._loaded:
+            module_name, _, attr = self._targets[name].partition(":")
+            self._loaded[name] = getattr(importlib.import_module(module_name), attr)
+        return self._loaded[name]
+
+    def create(self, name: str, *args, **kwargs):
+        return self.load(name)(*args, **kwargs)
+
+
+sensors = Registry("sensor")
+sensors.register("voltage", "measurement.voltage_sensor:VoltageSensor", "MCP342x ADC photodiode")
+sensors.register("camera", "measurement.camera_sensor:CameraSensor", "Picamera2 laser spot")
+
+motors = Registry("motor")
+motors.register("stepper", "measurement.motor_control:StepperMotor", "STEP/DIR driver on GPIO")
+motors.register("replay", "measurement.replay:ReplayMotor", "simulated from a recorded trace")
+
+endstops = Registry("endstop")
+endstops.register("gpio", "measurement.endstop:Endstop", "switch on a GPIO input")
+endstops.register("replay", "measurement.replay:ReplayEndstop", "position limit of the replay motor")
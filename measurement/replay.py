@@ -0,0 +1,259 @@
+import bisect
+import csv
+import math
+import random
+from collections import deque
+from dataclasses import dataclass
+
+from .peak import fit_peak
+from .results_db import ResultsStore
+from .sensor_base import SensorBase
+
+
+class SimClock:
+    """Simulated time source with the time.time()/time.sleep() interface; sleeping just advances it."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = float(start)
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self.now += seconds
+
+
+class ReplayProfile:
+    """
+    Position -> value profile rebuilt from a recorded (t, pos_mm, value) trace.
+
+    Samples are averaged into bin_mm wide position bins (a scan visits the peak region
+    several times) and linearly interpolated between bins; outside the recorded range
+    the edge value is held. The reference peak is a least-squares parabola over fit_mm
+    on either side of the best bin.
+    """
+
+    def __init__(self, trace: list, bin_mm: float = 0.05, fit_mm: float = 1.0):
+        if not trace:
+            raise ValueError("empty trace")
+        self.trace = list(trace)
+        bins = {}
+        for _, pos, val in self.trace:
+            key = int(round(pos / bin_mm))
+            total, n = bins.get(key, (0.0, 0))
+            bins[key] = (total + val, n + 1)
+        keys = sorted(bins)
+        self.positions = [k * bin_mm for k in keys]
+        self.values = [bins[k][0] / bins[k][1] for k in keys]
+        self.peak_pos_mm, self.peak_value = fit_peak(self.positions, self.values, fit_mm)
+
+    @classmethod
+    def from_results_db(cls, run_id: int, path: str | None = None, bin_mm: float = 0.05) -> "ReplayProfile":
+        store = ResultsStore(path)
+        try:
+            trace = store.load_trace(run_id)
+        finally:
+            store.close()
+        return cls(trace, bin_mm=bin_mm)
+
+    @classmethod
+    def from_csv(cls, path: str, bin_mm: float = 0.05) -> "ReplayProfile":
+        """CSV with t, pos_mm, value columns (a header row is skipped)."""
+        trace = []
+        with open(path, newline="") as f:
+            for row in csv.reader(f):
+                try:
+                    trace.append(tuple(float(x) for x in row[:3]))
+                except ValueError:
+                    continue
+        return cls(trace, bin_mm=bin_mm)
+
+    @classmethod
+    def gaussian(cls, center_mm: float, width_mm: float, span_mm: float = 280.0, step_mm: float = 0.05,
+                 peak: float = 1.0, floor: float = 0.05) -> "ReplayProfile":
+        """Synthetic profile: Gaussian peak (1/e half width width_mm) on a constant floor."""
+        n = int(span_mm / step_mm) + 1
+        trace = [(0.0, i * step_mm, floor + (peak - floor) * math.exp(-((i * step_mm - center_mm) / width_mm) ** 2))
+                 for i in range(n)]
+        return cls(trace, bin_mm=step_mm)
+
+    @classmethod
+    def load(cls, source: str, db_path: str | None = None, bin_mm: float = 0.05) -> "ReplayProfile":
+        """Run id in the results database, 'synthetic:CENTER:WIDTH', or path of a CSV trace."""
+        if source.startswith("synthetic:"):
+            center, width = (float(x) for x in source.split(":")[1:3])
+            return cls.gaussian(center, width)
+        if source.isdigit():
+            return cls.from_results_db(int(source), db_path, bin_mm=bin_mm)
+        return cls.from_csv(source, bin_mm=bin_mm)
+
+    def value_at(self, pos_mm: float) -> float:
+        i = bisect.bisect_left(self.positions, pos_mm)
+        if i == 0:
+            return self.values[0]
+        if i >= len(self.positions):
+            return self.values[-1]
+        p0, p1 = self.positions[i - 1], self.positions[i]
+        v0, v1 = self.values[i - 1], self.values[i]
+        return v0 + (v1 - v0) * (pos_mm - p0) / (p1 - p0)
+
+
+class ReplayMotor:
+    """
+    Stand-in for StepperMotor: moves are instantaneous in CPU time but advance the simulated
+    clock by what the real move would take (enable delay + step pulses at the commanded rate).
+    """
+
+    ENABLE_DELAY_S = 0.05
+
+    def __init__(self, clock: SimClock, full_steps: int = 200, microsteps: int = 8, backlash_mm: float = 0.0):
+        self.clock = clock
+        self.steps_per_rev = float(full_steps * microsteps)
+        self.backlash_mm = backlash_mm
+        self._direction = 1
+        self._last_travel_dir = None
+        self.position_mm = 0.0
+        self.position_log = deque(maxlen=200000)
+        self.last_move_end = 0.0
+        self.last_move_timing = None
+        self.moves = 0
+        self.travel_mm = 0.0
+
+    def enable(self):
+        pass
+
+    def disable(self):
+        pass
+
+    def cleanup(self):
+        pass
+
+    def set_direction(self, direction):
+        self._direction = 1 if direction == 1 else -1
+
+    def move(self, dist_mm, lead_mm, speed_rps=0.01, progress_callback=None):
+        if lead_mm <= 0:
+            return
+        total_steps = int(abs(dist_mm / lead_mm) * self.steps_per_rev)
+        delay = max(0.000002, 1.0 / float(2 * self.steps_per_rev * speed_rps))
+        mm_per_step = lead_mm / self.steps_per_rev
+        backlash_steps = 0
+        if total_steps > 0:
+            if self._last_travel_dir is not None and self._direction != self._last_travel_dir:
+                backlash_steps = int(round(self.backlash_mm / mm_per_step))
+            self._last_travel_dir = self._direction
+
+        self.clock.sleep(self.ENABLE_DELAY_S + backlash_steps * 2 * delay)
+        start = self.clock.time()
+        self.position_log.append((start, self.position_mm))
+        self.clock.sleep(total_steps * 2 * delay)
+        travel = total_steps * mm_per_step
+        self.position_mm += self._direction * travel
+        self.position_log.append((self.clock.time(), self.position_mm))
+        self.last_move_end = self.clock.time()
+        if total_steps > 0:
+            self.moves += 1
+            self.travel_mm += travel
+
+    def positions_at(self, times) -> list:
+        log = list(self.position_log)
+        if not log:
+            return [self.position_mm for _ in times]
+        result = []
+        for t in times:
+            i = bisect.bisect_right(log, (t, float("inf")))
+            if i == 0:
+                result.append(log[0][1])
+            elif i >= len(log):
+                result.append(log[-1][1])
+            else:
+                (t0, p0), (t1, p1) = log[i - 1], log[i]
+                result.append(p1 if t1 <= t0 else p0 + (p1 - p0) * (t - t0) / (t1 - t0))
+        return result
+
+    def position_at(self, t: float) -> float:
+        return self.positions_at((t,))[0]
+
+
+class ReplayEndstop:
+    """Endstop that trips when the replay motor reaches a position limit."""
+
+    def __init__(self, motor: ReplayMotor, min_mm: float | None = None, max_mm: float | None = None):
+        self.motor = motor
+        self.min_mm = min_mm
+        self.max_mm = max_mm
+
+    def is_pressed(self):
+        pos = self.motor.position_mm
+        return (self.min_mm is not None and pos <= self.min_mm) or (self.max_mm is not None and pos >= self.max_mm)
+
+    def is_open(self):
+        return not self.is_pressed()
+
+    def cleanup(self):
+        pass
+
+
+class ReplaySensor(SensorBase):
+    """
+    Sensor answering from a recorded profile at the replay motor's position.
+
+    Samples are generated lazily at rate_hz on the simulated clock whenever the sensor is
+    queried, so free-running acquisition (get_history) works as well as point reads.
+    lag_s delays the optics like a real pipeline latency; noise_std adds Gaussian noise.
+    """
+
+    def __init__(self, profile: ReplayProfile, motor: ReplayMotor, clock: SimClock, noise_std: float = 0.0,
+                 seed: int | None = None, rate_hz: float = 200.0, lag_s: float = 0.0):
+        super().__init__()
+        self.profile = profile
+        self.motor = motor
+        self.clock = clock
+        self.noise_std = noise_std
+        self.rate_hz = rate_hz
+        self.lag_s = lag_s
+        self._rng = random.Random(seed)
+        self._next_t = clock.time()
+
+    def config_key(self) -> str:
+        return "replay"
+
+    def _sample(self, t: float) -> float:
+        value = self.profile.value_at(self.motor.position_at(t - self.lag_s))
+        if self.noise_std > 0:
+            value += self._rng.gauss(0.0, self.noise_std)
+        return value
+
+    def _fill(self):
+        now = self.clock.time()
+        period = 1.0 / self.rate_hz
+        t = max(self._next_t, now - self.HISTORY_SIZE * period)
+        if t > now:
+            return
+        while t <= now:
+            self._publish(self._sample(t), t)
+            t += period
+        self._next_t = t
+
+    def get_value(self):
+        self._fill()
+        return super().get_value()
+
+    def get_history(self, since: float | None = None) -> list:
+        self._fill()
+        return super().get_history(since)
+
+
+@dataclass
+class ReplayResult:
+    moves: int
+    travel_mm: float
+    sim_time_s: float
+    wall_s: float
+    peak_pos_mm: float
+    true_peak_mm: float
+    peak_error_mm: float
+    focal_length_mm: float
+    true_focal_length_mm: float
+    focal_error_mm: float
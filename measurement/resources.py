@@ -0,0 +1,108 @@
+import fcntl
+import os
+import tempfile
+import threading
+
+# Hardware shared by the rigs of a host (GPIO pins, I2C devices, cameras) is claimed by name
+# before use. Claims are kept per process and, through flock'd lock files, across processes,
+# so two rigs (or two supervisors) can never drive the same pin. The kernel drops the locks of
+# a process that dies, so there is nothing stale to clean up.
+LOCK_DIR = os.environ.get(
+    "LENSMETER_LOCK_DIR",
+    "/run/lock/lensmeter" if os.path.isdir("/run/lock") else os.path.join(tempfile.gettempdir(), "lensmeter-locks"),
+)
+
+
+class ResourceConflict(RuntimeError):
+    pass
+
+
+def gpio_pin(pin: int) -> str:
+    return f"gpio{int(pin)}"
+
+
+def i2c_device(addr: int, bus: int = 1) -> str:
+    return f"i2c{bus}-0x{int(addr):02x}"
+
+
+def camera_device(index: int) -> str:
+    return f"camera{int(index)}"
+
+
+class ResourceRegistry:
+    def __init__(self, lock_dir: str | None = LOCK_DIR):
+        # None: claims are only checked within this process (e.g. for simulated hardware)
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._owners = {}
+        self._files = {}
+
+    def _lock_file(self, key: str, owner: str):
+        os.makedirs(self.lock_dir, exist_ok=True)
+        try:
+            os.chmod(self.lock_dir, 0o1777)
+        except OSError:
+            pass
+        f = open(os.path.join(self.lock_dir, f"{key}.lock"), "a+")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.seek(0)
+            holder = f.read().strip() or "another process"
+            f.close()
+            raise ResourceConflict(f"{key} is in use by {holder}")
+        f.seek(0)
+        f.truncate()
+        f.write(f"{owner} (pid {os.getpid()})\n")
+        f.flush()
+        return f
+
+    def claim(self, owner: str, *keys: str):
+        """Claim all keys for owner, or none of them (ResourceConflict names the current holder)."""
+        with self._lock:
+            for key in keys:
+                holder = self._owners.get(key)
+                if holder is not None and holder != owner:
+                    raise ResourceConflict(f"{key} is in use by {holder}")
+            taken = []
+            try:
+                for key in keys:
+                    if key in self._owners:
+                        continue
+                    if self.lock_dir is not None:
+                        self._files[key] = self._lock_file(key, owner)
+                    self._owners[key] = owner
+                    taken.append(key)
+            except (ResourceConflict, OSError):
+                for key in taken:
+                    self._drop(key)
+                raise
+
+    def _drop(self, key: str):
+        self._owners.pop(key, None)
+        f = self._files.pop(key, None)
+        if f is not None:
+            f.close()
+
+    def release(self, owner: str, *keys: str):
+        """Release keys (all of owner's if none are given); keys held by others are left alone."""
+        with self._lock:
+            for key in keys or [k for k, o in self._owners.items() if o == owner]:
+                if self._owners.get(key) == owner:
+                    self._drop(key)
+
+    def owner(self, key: str) -> str | None:
+        with self._lock:
+            return self._owners.get(key)
+
+    def held(self, owner: str) -> list:
+        with self._lock:
+            return sorted(k for k, o in self._owners.items() if o == owner)
+
+
+resources = ResourceRegistry()
+
+
+def for_gpio(gpio) -> ResourceRegistry:
+    """Pin registry of a GPIO backend: simulated backends carry their own, real pins use the host's."""
+    return getattr(gpio, "resources", None) or resources
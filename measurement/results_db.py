@@ -0,0 +1,171 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+
+RESULTS_DB = os.environ.get(
+    "RESULTS_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results.db"),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    lens TEXT,
+    method TEXT NOT NULL,
+    sensor TEXT NOT NULL,
+    params TEXT NOT NULL,
+    timings TEXT NOT NULL,
+    peak_pos_mm REAL,
+    peak_value REAL,
+    focal_length_mm REAL,
+    n_samples INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_lens_method_time ON runs (lens, method, started_at);
+CREATE INDEX IF NOT EXISTS runs_method_time ON runs (method, started_at);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (started_at);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    seq INTEGER NOT NULL,
+    t REAL NOT NULL,
+    pos_mm REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class RunRecord:
+    started_at: float
+    finished_at: float
+    method: str
+    sensor: str
+    params: dict
+    lens: str | None = None
+    timings: dict = field(default_factory=dict)
+    peak_pos_mm: float | None = None
+    peak_value: float | None = None
+    focal_length_mm: float | None = None
+    # (t, pos_mm, value) tuples in acquisition order
+    trace: list = field(default_factory=list)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class ResultsStore:
+    """
+    Append-only SQLite store of measurement runs and their raw traces.
+
+    Writes are queued to a background thread so the scan loop never waits on disk;
+    reads use a separate connection (WAL lets them run concurrently with the writer).
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or RESULTS_DB
+        self._queue = queue.Queue()
+        self._read_conn = _connect(self.path)
+        self._read_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    def _writer_loop(self):
+        conn = _connect(self.path)
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            record, done = item
+            try:
+                self._insert(conn, record)
+            except sqlite3.Error as e:
+                print(f"RESULTS DB ERROR: {e}")
+            finally:
+                if done is not None:
+                    done.set()
+                self._queue.task_done()
+        conn.close()
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, r: RunRecord) -> int:
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO runs (started_at, finished_at, lens, method, sensor, params, timings,"
+                " peak_pos_mm, peak_value, focal_length_mm, n_samples) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (r.started_at, r.finished_at, r.lens, r.method, r.sensor, json.dumps(r.params), json.dumps(r.timings),
+                 r.peak_pos_mm, r.peak_value, r.focal_length_mm, len(r.trace)),
+            )
+            run_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO samples (run_id, seq, t, pos_mm, value) VALUES (?, ?, ?, ?, ?)",
+                ((run_id, i, t, pos, val) for i, (t, pos, val) in enumerate(r.trace)),
+            )
+        return run_id
+
+    def submit(self, record: RunRecord) -> threading.Event:
+        """Queue a run for writing and return an Event that is set once it is committed."""
+        done = threading.Event()
+        self._queue.put((record, done))
+        return done
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+        with self._read_lock:
+            self._read_conn.close()
+
+    def query_runs(self, lens: str | None = None, method: str | None = None,
+                   since: float | None = None, until: float | None = None, limit: int | None = None) -> list:
+        """Return run rows (without traces) as dicts, newest first."""
+        where, args = [], []
+        if lens is not None:
+            where.append("lens = ?")
+            args.append(lens)
+        if method is not None:
+            where.append("method = ?")
+            args.append(method)
+        if since is not None:
+            where.append("started_at >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("started_at < ?")
+            args.append(until)
+        sql = "SELECT * FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY started_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self._read_lock:
+            cur = self._read_conn.execute(sql, args)
+            cols = [c[0] for c in cur.description]
+            rows = cur.fetchall()
+        result = []
+        for row in rows:
+            d = dict(zip(cols, row))
+            d["params"] = json.loads(d["params"])
+            d["timings"] = json.loads(d["timings"])
+            result.append(d)
+        return result
+
+    def load_trace(self, run_id: int) -> list:
+        """Return the (t, pos_mm, value) samples of a run in acquisition order."""
+        with self._read_lock:
+            return self._read_conn.execute(
+                "SELECT t, pos_mm, value FROM samples WHERE run_id = ? ORDER BY seq", (run_id,)
+            ).fetchall()
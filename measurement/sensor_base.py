@@ -1,10 +1,32 @@
+import bisect
 import threading
+import time
 from collections import deque
 
+from .filters import FilterPipeline, SlidingStats, build_pipeline
+from .settle import SettleSpec
+
 
 class SensorBase():
-    def __init__(self):
+    # Timestamped samples kept for time alignment (a few seconds even at full camera/ADC rate)
+    HISTORY_SIZE = 4096
+
+    def __init__(self, window_size: int = 50):
         self._lock = threading.Lock()
+        self._history = deque(maxlen=self.HISTORY_SIZE)
+        self._current_value = 0.0
+        self._raw_value = 0.0
+        # Online filter chain applied to every sample (empty = raw values) and the sliding
+        # mean/variance of its output over the last window_size samples
+        self.filters = FilterPipeline()
+        self._stats = SlidingStats(window_size)
+        # Optional RawRecorder receiving every unfiltered sample
+        self._recorder = None
+        self._recorder_id = 0
+        # Effective pipeline delay (s): a sample stamped at t describes the optics at t - latency_s
+        self.latency_s = 0.0
+        # Name the sensor's device (I2C address, camera) is claimed under while running, e.g. the rig
+        self.owner = None
 
     def start(self):
         pass
@@ -12,22 +34,88 @@ class SensorBase():
     def stop(self):
         pass
 
+    def config_key(self) -> str:
+        """Identifies the sensor configuration that calibration values (e.g. latency) belong to."""
+        return type(self).__name__
+
+    def settle_spec(self) -> SettleSpec:
+        """Settle criteria for readings after a move (see measurement.settle)."""
+        return SettleSpec()
+
+    def set_filters(self, filters: FilterPipeline | str | None):
+        """Install a filter chain (pipeline or spec such as "reject:4,median:5"); readers then see filtered values."""
+        if not isinstance(filters, FilterPipeline):
+            filters = build_pipeline(filters)
+        with self._lock:
+            self.filters = filters
+            self._stats.reset()
+
+    def attach_recorder(self, recorder, name: str | None = None):
+        """Record every raw sample to `recorder` (a measurement.raw_recorder.RawRecorder) from now on."""
+        self._recorder_id = recorder.register(name or self.config_key())
+        self._recorder = recorder
+
+    def _publish(self, value, t: float | None = None):
+        """Store a new sample from the acquisition loop (dropped if the filter chain rejects it)."""
+        t = time.time() if t is None else t
+        if self._recorder is not None:
+            self._recorder.append(t, value, self._recorder_id)
+        with self._lock:
+            self._raw_value = value
+            if self.filters:
+                value = self.filters.update(value)
+                if value is None:
+                    return
+            self._current_value = value
+            self._stats.update(value)
+            self._history.append((t, value))
+
     def get_value(self):
         with self._lock:
             return self._current_value
 
+    def get_history(self, since: float | None = None) -> list:
+        """(t, value) samples, oldest first, optionally only those stamped at or after `since`."""
+        with self._lock:
+            history = list(self._history)
+        if since is None:
+            return history
+        start = bisect.bisect_left(history, (since,))
+        return history[start:]
+
+    def get_value_at(self, t: float) -> float | None:
+        """Sample value at time t, linearly interpolated between the neighbouring samples."""
+        history = self.get_history()
+        if not history:
+            return None
+        i = bisect.bisect_left(history, (t,))
+        if i == 0:
+            return history[0][1]
+        if i >= len(history):
+            return history[-1][1]
+        (t0, v0), (t1, v1) = history[i - 1], history[i]
+        if t1 <= t0:
+            return v1
+        return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+
+    def get_raw_value(self):
+        """Last sample before filtering."""
+        with self._lock:
+            return self._raw_value
+
     def set_window_size(self, window_size: int):
         """Set window size for rolling mean (number of samples)."""
         if window_size <= 0:
             return
         with self._lock:
-            self._window_size = int(window_size)
-            recent = list(self._samples)[-self._window_size:]
-            self._samples = deque(recent, maxlen=self._window_size)
+            self._stats.resize(window_size)
 
     def get_value_mean(self):
         """Return arithmetic mean of the past N samples (N = current window size)."""
         with self._lock:
-            if not self._samples:
-                return 0.0
-            return sum(self._samples) / len(self._samples)
+            return self._stats.mean
+
+    def get_noise(self):
+        """Standard deviation of the past N samples: noise estimate of a single reading."""
+        with self._lock:
+            return self._stats.std
@@ -0,0 +1,82 @@
+import math
+import time
+from dataclasses import dataclass
+
+from .metrics import registry
+
+settle_seconds = registry.histogram(
+    "lensmeter_settle_seconds", "Time from end of move to a settled sensor reading",
+    buckets=(0.005, 0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5),
+)
+settle_timeouts = registry.counter("lensmeter_settle_timeouts_total", "Sensor readings that did not settle before the timeout")
+
+
+@dataclass(frozen=True)
+class SettleSpec:
+    """
+    When a sensor counts as settled after a move.
+
+    The last `window` fresh samples must drift (least-squares slope x window span) by no more
+    than the tolerance and scatter (std) by no more than `noise_factor` x the tolerance, where
+    the tolerance is max(abs_tol, rel_tol * |mean|). After timeout_s the best available
+    reading is returned and marked unsettled.
+    """
+    window: int = 5
+    abs_tol: float = 0.005
+    rel_tol: float = 0.002
+    noise_factor: float = 4.0
+    timeout_s: float = 0.3
+    poll_s: float = 0.002
+
+
+@dataclass
+class Reading:
+    value: float
+    # Standard deviation of the samples the value was averaged from
+    noise: float
+    # Time from the end of the move (plus sensor latency) to the reading
+    settle_s: float
+    settled: bool
+    n: int
+
+
+def window_stats(samples: list) -> tuple:
+    """(mean, std, slope per second) of (t, value) samples."""
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_v = sum(v for _, v in samples) / n
+    var_v = sum((v - mean_v) ** 2 for _, v in samples) / (n - 1) if n > 1 else 0.0
+    stt = sum((t - mean_t) ** 2 for t, _ in samples)
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in samples) / stt if stt > 0 else 0.0
+    return mean_v, math.sqrt(var_v), slope
+
+
+def wait_settled(sensor, since: float, spec: SettleSpec | None = None, clock=time, name: str = "") -> Reading:
+    """
+    Wait for `sensor` to settle on samples stamped at or after `since` (end of move + latency)
+    and return their mean with its noise estimate.
+    """
+    spec = spec or sensor.settle_spec()
+    deadline = since + spec.timeout_s
+    while True:
+        now = clock.time()
+        fresh = sensor.get_history(since=since)
+        if len(fresh) >= spec.window:
+            window = fresh[-spec.window:]
+            mean, std, slope = window_stats(window)
+            tol = max(spec.abs_tol, spec.rel_tol * abs(mean))
+            drift = abs(slope) * (window[-1][0] - window[0][0])
+            if drift <= tol and std <= spec.noise_factor * tol:
+                settle_s = max(0.0, now - since)
+                settle_seconds.observe(settle_s, sensor=name)
+                return Reading(mean, std, settle_s, True, len(window))
+        if now >= deadline:
+            settle_timeouts.inc(sensor=name)
+            settle_seconds.observe(max(0.0, now - since), sensor=name)
+            if fresh:
+                # Settling still in progress: the newest samples are the closest to the final value
+                window = fresh[-min(len(fresh), max(2, spec.window // 2)):]
+                mean, std, _ = window_stats(window)
+                return Reading(mean, std, now - since, False, len(window))
+            return Reading(sensor.get_value(), math.nan, now - since, False, 0)
+        clock.sleep(spec.poll_s)
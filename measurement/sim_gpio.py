@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import deque
+
+from .resources import ResourceRegistry
+
+
+class SimGPIO:
+    """
+    In-process stand-in for the RPi.GPIO module (the subset the drivers use), for running the
+    real motor and endstop code off the Pi. Output changes are logged as (time.time(), pin, level);
+    inputs are driven with set_input(), which also fires registered edge callbacks.
+    """
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, log_size: int = 100000):
+        self._mode = None
+        self._lock = threading.Lock()
+        self.modes = {}
+        self.levels = {}
+        self.log = deque(maxlen=log_size)
+        self._callbacks = {}
+        # Pins of this simulated header are claimed here, not in the host-wide lock directory
+        self.resources = ResourceRegistry(lock_dir=None)
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        self._mode = mode
+
+    def getmode(self):
+        return self._mode
+
+    def setup(self, channel, direction, pull_up_down=PUD_OFF, initial=None):
+        with self._lock:
+            self.modes[channel] = direction
+            if direction == self.IN:
+                self.levels[channel] = self.LOW if pull_up_down == self.PUD_DOWN else self.HIGH
+            else:
+                self.levels[channel] = self.LOW if initial is None else initial
+
+    def output(self, channel, value):
+        if self.modes.get(channel) != self.OUT:
+            raise RuntimeError(f"GPIO {channel} is not set up as an output")
+        self.levels[channel] = value
+        self.log.append((time.time(), channel, value))
+
+    def input(self, channel):
+        if channel not in self.modes:
+            raise RuntimeError(f"GPIO {channel} is not set up")
+        return self.levels[channel]
+
+    def set_input(self, channel, value):
+        old = self.levels.get(channel)
+        self.levels[channel] = value
+        callback, edge = self._callbacks.get(channel, (None, None))
+        if callback is not None and old != value:
+            rising = value == self.HIGH
+            if edge == self.BOTH or (edge == self.RISING) == rising:
+                callback(channel)
+
+    def add_event_detect(self, channel, edge, callback=None, bouncetime=None):
+        self._callbacks[channel] = (callback, edge)
+
+    def remove_event_detect(self, channel):
+        self._callbacks.pop(channel, None)
+
+    def cleanup(self, channel=None):
+        with self._lock:
+            if channel is None:
+                channels = list(self.modes)
+            elif isinstance(channel, (list, tuple, set)):
+                channels = list(channel)
+            else:
+                channels = [channel]
+            for ch in channels:
+                self.modes.pop(ch, None)
+                self.levels.pop(ch, None)
+                self._callbacks.pop(ch, None)
+            if not self.modes:
+                self._mode = None
+
+    def output_changes(self, channel) -> list:
+        """(time, level) of every output written to channel."""
+        return [(t, level) for t, ch, level in list(self.log) if ch == channel]
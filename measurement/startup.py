@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+
+from .metrics import registry
+
+startup_seconds = registry.histogram(
+    "lensmeter_startup_seconds", "Time from process start to the end of each initialisation stage",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 60.0),
+)
+
+
+_start = None
+
+
+def process_start_time() -> float:
+    """Wall-clock start time of this process (from /proc on Linux, else the first call)."""
+    global _start
+    if _start is None:
+        try:
+            with open("/proc/self/stat", "r") as f:
+                # Fields after the parenthesised command name; starttime is field 22
+                start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+            with open("/proc/stat", "r") as f:
+                btime = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+            _start = btime + start_ticks / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError, StopIteration):
+            _start = time.time()
+    return _start
+
+
+class InitError(RuntimeError):
+    pass
+
+
+class _Task:
+    def __init__(self, name, fn, deps, required, needs):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.required = required
+        self.needs = tuple(needs)
+        self.cancel = threading.Event()
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+
+class InitPipeline:
+    """
+    Runs initialisation tasks concurrently, each in its own thread as soon as its dependencies
+    have finished. A failed task skips everything that depends on it and cancels the running
+    tasks that need it; run() raises InitError if a required task failed, was skipped or
+    cancelled. Timings are relative to process start.
+    """
+
+    def __init__(self):
+        self.t0 = process_start_time()
+        self._tasks = {}
+        self.marks = {}
+
+    def add(self, name: str, fn, deps=(), required: bool = True, needs=()):
+        """
+        fn receives the results of its dependencies as keyword arguments.
+        needs: tasks that must succeed too but are not waited for (the task runs alongside them);
+        if one fails, cancel_event(name) is set for fn to stop early and the task counts as failed.
+        """
+        for dep in tuple(deps) + tuple(needs):
+            if dep not in self._tasks:
+                raise ValueError(f"{name}: unknown dependency {dep!r}")
+        self._tasks[name] = _Task(name, fn, deps, required, needs)
+
+    def cancel_event(self, name: str) -> threading.Event:
+        return self._tasks[name].cancel
+
+    def _failed(self, names) -> list:
+        return [n for n in names if self._tasks[n].error is not None]
+
+    def _fail(self, task: _Task, error: Exception):
+        task.error = error
+        print(f"INIT {'ERROR' if task.required else 'WARNING'}: {task.name}: {error}")
+        for other in self._tasks.values():
+            if task.name in other.needs:
+                other.cancel.set()
+
+    def mark(self, name: str):
+        """Record a milestone (e.g. first valid sample) at the current time; the first mark wins."""
+        self.marks.setdefault(name, time.time() - self.t0)
+
+    def _run_task(self, task: _Task):
+        for dep in task.deps:
+            self._tasks[dep].done.wait()
+        failed = self._failed(task.deps + task.needs)
+        task.started = time.time() - self.t0
+        try:
+            if failed:
+                raise InitError(f"skipped, {', '.join(failed)} failed")
+            task.result = task.fn(**{d: self._tasks[d].result for d in task.deps})
+            failed = self._failed(task.needs)
+            if failed:
+                task.result = None
+                raise InitError(f"cancelled, {', '.join(failed)} failed")
+        except Exception as e:
+            self._fail(task, e)
+        finally:
+            task.finished = time.time() - self.t0
+            startup_seconds.observe(task.finished, stage=task.name)
+            task.done.set()
+
+    def run(self) -> dict:
+        threads = [threading.Thread(target=self._run_task, args=(task,), name=f"init-{task.name}", daemon=True)
+                   for task in self._tasks.values()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.mark("ready")
+        startup_seconds.observe(self.marks["ready"], stage="ready")
+        failed = [t.name for t in self._tasks.values() if t.required and t.error is not None]
+        if failed:
+            raise InitError(f"initialisation failed: {', '.join(failed)}")
+        return {name: t.result for name, t in self._tasks.items()}
+
+    def results(self) -> dict:
+        """Results of the tasks that finished successfully (also after a failed run)."""
+        return {name: t.result for name, t in self._tasks.items() if t.done.is_set() and t.error is None}
+
+    def report(self) -> str:
+        lines = ["--- Initialisation (s from process start) ---"]
+        for t in sorted(self._tasks.values(), key=lambda t: (t.started or 0.0)):
+            status = "ok" if t.error is None else f"FAILED ({t.error})"
+            lines.append(f"{t.name:<12} {t.started or 0.0:7.3f} -> {t.finished or 0.0:7.3f}  {status}")
+        for name, at in sorted(self.marks.items(), key=lambda kv: kv[1]):
+            lines.append(f"{name:<12} {at:7.3f}")
+        return "\n".join(lines)
@@ -0,0 +1,69 @@
+import os
+import statistics
+import tempfile
+import unittest
+
+import numpy as np
+
+from measurement.results_db import ResultsStore, RunRecord
+from test_results.analysis import discover, load_db, summarize, summary_rows
+
+FIXTURE = {
+    ("baseline", "5"): [5.0, 5.2, 4.9, 5.1],
+    ("baseline", "10"): [10.0, 10.4],
+    ("voltage_sensor", "5"): [5.3, 5.1, "", "not a number", 5.2],
+    ("voltage_sensor", "10"): [9.8],
+}
+
+
+class TestSummarize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for (method, lens), values in FIXTURE.items():
+            os.makedirs(os.path.join(self.tmp.name, method), exist_ok=True)
+            with open(os.path.join(self.tmp.name, method, f"{lens}.csv"), "w") as f:
+                f.write("".join(f"{v},comment\n" for v in values))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stat(self, stats, rs, name, method, lens):
+        return stats[name][rs.methods.index(method), rs.lenses.index(lens)]
+
+    def test_per_lens_statistics(self):
+        rs = discover(self.tmp.name, use_cache=False)
+        self.assertEqual(rs.lenses, ["5", "10"])
+        stats = summarize(rs)
+        for (method, lens), values in FIXTURE.items():
+            values = [v for v in values if isinstance(v, float)]
+            self.assertEqual(self.stat(stats, rs, "n", method, lens), len(values))
+            self.assertAlmostEqual(self.stat(stats, rs, "mean", method, lens), statistics.fmean(values))
+            if len(values) > 1:
+                self.assertAlmostEqual(self.stat(stats, rs, "std", method, lens), statistics.stdev(values))
+        # Single measurement: no spread; bias against the baseline mean
+        self.assertTrue(np.isnan(self.stat(stats, rs, "std", "voltage_sensor", "10")))
+        self.assertAlmostEqual(self.stat(stats, rs, "bias", "voltage_sensor", "10"), 9.8 - 10.2)
+        # t(3) = 3.182 for the 95% interval of four baseline measurements
+        sem = statistics.stdev(FIXTURE[("baseline", "5")]) / 2.0
+        self.assertAlmostEqual(self.stat(stats, rs, "ci_high", "baseline", "5"), 5.05 + 3.182 * sem, places=3)
+        self.assertEqual([r[:3] for r in summary_rows(rs, stats)],
+                         [["5", "baseline", 4.0], ["5", "voltage_sensor", 3.0],
+                          ["10", "baseline", 2.0], ["10", "voltage_sensor", 1.0]])
+
+    def test_results_database(self):
+        db = os.path.join(self.tmp.name, "results.db")
+        store = ResultsStore(db)
+        for i, focal in enumerate((5.4, 5.6)):
+            store.submit(RunRecord(started_at=float(i), finished_at=float(i) + 1.0, lens="5", method="camera_sensor",
+                                   sensor="camera", params={}, timings={}, peak_pos_mm=50.0, peak_value=1.0,
+                                   focal_length_mm=focal, trace=[]))
+        store.close()
+        rs = discover(self.tmp.name, use_cache=False).concat(load_db(db))
+        stats = summarize(rs)
+        self.assertEqual(self.stat(stats, rs, "n", "camera_sensor", "5"), 2)
+        self.assertAlmostEqual(self.stat(stats, rs, "mean", "camera_sensor", "5"), 5.5)
+        self.assertTrue(np.isnan(self.stat(stats, rs, "mean", "camera_sensor", "10")))
+
+
+if __name__ == '__main__':
+    unittest.main()
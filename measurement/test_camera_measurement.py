@@ -0,0 +1,297 @@
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+from camera_based_test import camera_measurement as cm
+
+PIXEL_MM = cm.SENSOR_PIXEL_SIZE_MM
+IMAGE_SIZE = (640, 480)
+
+# (rotation vector, board centre offset in mm) of the synthetic calibration views
+POSES = [((0.3, 0, 0), (0, 0)), ((-0.3, 0, 0), (20, 0)), ((0, 0.3, 0), (0, 20)), ((0, -0.3, 0.2), (-20, 0)),
+         ((0.25, 0.25, 0.1), (0, -20)), ((-0.25, 0.2, -0.2), (10, 10)), ((0.2, -0.25, 0.3), (-10, 10)),
+         ((0, 0, 0.5), (0, 0))]
+
+
+def render_board(f_pix, rvec, offset_mm=(0.0, 0.0), z_mm=450.0):
+    """
+    Chessboard of cm.CHESSBOARD_SIZE seen by a distortion-free pinhole camera with focal length
+    f_pix, board pose given by rvec and the board centre at (offset_mm, z_mm) from the camera.
+    """
+    cols, rows = cm.CHESSBOARD_SIZE
+    sq = cm.SQUARE_SIZE_MM
+    px_per_mm = 4.0
+    # Board texture: (cols + 1) x (rows + 1) squares on a one-square white margin
+    texture = np.full((int((rows + 3) * sq * px_per_mm), int((cols + 3) * sq * px_per_mm)), 255, np.uint8)
+    side = int(sq * px_per_mm)
+    for r in range(rows + 1):
+        for c in range(cols + 1):
+            if (r + c) % 2 == 0:
+                texture[(r + 1) * side:(r + 2) * side, (c + 1) * side:(c + 2) * side] = 0
+    # Texture pixel -> board mm (origin at the first inner corner) -> image pixel
+    to_board = np.array([[1 / px_per_mm, 0, -2 * sq], [0, 1 / px_per_mm, -2 * sq], [0, 0, 1]])
+    K = np.array([[f_pix, 0, IMAGE_SIZE[0] / 2], [0, f_pix, IMAGE_SIZE[1] / 2], [0, 0, 1]])
+    R, _ = cv2.Rodrigues(np.asarray(rvec, dtype=float))
+    t = -R @ np.array([(cols - 1) * sq / 2, (rows - 1) * sq / 2, 0.0]) + np.array([*offset_mm, z_mm])
+    H = K @ np.column_stack([R[:, 0], R[:, 1], t]) @ to_board
+    img = cv2.warpPerspective(texture, H, IMAGE_SIZE, flags=cv2.INTER_LINEAR, borderValue=128)
+    return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+
+def write_views(path, f_pix):
+    os.makedirs(path)
+    for i, (rvec, offset) in enumerate(POSES):
+        cv2.imwrite(os.path.join(path, f"{i:02d}.png"), render_board(f_pix, rvec, offset))
+    return path
+
+
+def calib_result(f_pix, std_pix, n_images=10):
+    """run_calibration-like result with fx = fy = f_pix."""
+    mtx = np.array([[f_pix, 0.0, 320.0], [0.0, f_pix, 240.0], [0.0, 0.0, 1.0]])
+    return {'camera_matrix': mtx, 'dist_coeffs': np.zeros(5), 'image_size': (640, 480), 'rms': 0.1,
+            'n_images': n_images, 'std_fx': std_pix, 'std_fy': std_pix}
+
+
+def lens_focal(f_cam_pix, f_sys_pix, d_mm):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return cm.calculate_lens_focal_length(calib_result(f_cam_pix, 0.0)['camera_matrix'],
+                                              calib_result(f_sys_pix, 0.0)['camera_matrix'], d_mm, PIXEL_MM)
+
+
+class TestLensFocalLengthStd(unittest.TestCase):
+    def test_matches_finite_differences(self):
+        d_mm = cm.DISTANCE_LENS_CAM_MM
+        for f_cam, f_sys, s_cam, s_sys in ((2700.0, 3100.0, 4.0, 6.0), (2700.0, 2400.0, 1.0, 3.0)):
+            cam, sys_ = calib_result(f_cam, s_cam), calib_result(f_sys, s_sys)
+            h = 1e-3
+            dfda = (lens_focal(f_cam + h, f_sys, d_mm) - lens_focal(f_cam - h, f_sys, d_mm)) / (2 * h)
+            dfdb = (lens_focal(f_cam, f_sys + h, d_mm) - lens_focal(f_cam, f_sys - h, d_mm)) / (2 * h)
+            # Std of the (fx+fy)/2 average, fx and fy independent
+            expected = np.hypot(dfda * s_cam / np.sqrt(2), dfdb * s_sys / np.sqrt(2))
+            self.assertAlmostEqual(cm.lens_focal_length_std(cam, sys_, d_mm, PIXEL_MM), expected,
+                                   delta=1e-4 * expected)
+
+    def test_no_change_is_infinite(self):
+        self.assertEqual(cm.lens_focal_length_std(calib_result(2700.0, 1.0), calib_result(2700.0, 1.0), 53, PIXEL_MM),
+                         float('inf'))
+
+
+class TestConvergenceMonitor(unittest.TestCase):
+    def monitor(self, std_for_n, reference=None, delay_s=0.0):
+        """Monitor whose calibration returns std_for_n(len(images)) px after delay_s; calls are counted."""
+        calls = []
+
+        def fake_calibration(images, phase_name, workers=None, verbose=True):
+            calls.append(len(images))
+            time.sleep(delay_s)
+            return calib_result(3100.0, std_for_n(len(images)), n_images=len(images))
+
+        patcher = mock.patch.object(cm, "run_calibration", fake_calibration)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        out = io.StringIO()
+        redirect = contextlib.redirect_stdout(out)
+        redirect.__enter__()
+        self.addCleanup(redirect.__exit__, None, None, None)
+        monitor = cm.ConvergenceMonitor("TEST", reference=reference, min_images=3)
+        # Cleanups run last-in first-out: the worker finishes before the patch is undone
+        self.addCleanup(monitor.wait)
+        return monitor, calls
+
+    def test_stops_when_lens_std_reaches_target(self):
+        reference = calib_result(2700.0, 0.1)
+        # The fx std shrinks like 1/sqrt(n), the lens std drops below the target after a dozen images
+        target_std = lambda n: 2.5 / np.sqrt(n)
+        monitor, calls = self.monitor(target_std, reference=reference)
+        images = []
+        converged_at = None
+        for i in range(20):
+            images.append(i)
+            if monitor(images):
+                converged_at = len(images)
+                break
+            monitor.wait()
+        sigma = lambda n: cm.lens_focal_length_std(reference, calib_result(3100.0, target_std(n)), 53, PIXEL_MM)
+        expected = next(n for n in range(3, 20) if sigma(n) <= cm.FOCAL_STD_TARGET_MM)
+        self.assertGreater(expected, 5)
+        # Reported by the call after the calibration of `expected` images finished
+        self.assertEqual(converged_at, expected + 1)
+        self.assertNotIn(2, calls)
+        self.assertTrue(monitor.converged)
+
+    def test_never_converges(self):
+        monitor, calls = self.monitor(lambda n: 50.0)
+        images = []
+        for i in range(10):
+            images.append(i)
+            self.assertFalse(monitor(images))
+            monitor.wait()
+        self.assertFalse(monitor.converged)
+        self.assertEqual(calls, list(range(3, 11)))
+        # finish() reuses the result covering all images instead of calibrating again
+        result = monitor.finish(images)
+        self.assertEqual(result['n_images'], 10)
+        self.assertEqual(len(calls), 8)
+
+    def test_calibration_off_the_capture_thread(self):
+        monitor, calls = self.monitor(lambda n: 50.0, delay_s=0.2)
+        images = list(range(5))
+        t0 = time.monotonic()
+        monitor(images)
+        while not calls:
+            time.sleep(0.001)
+        for n in range(6, 9):
+            monitor(list(range(n)))
+        self.assertLess(time.monotonic() - t0, 0.1)
+        monitor.wait()
+        # One calibration in flight, the requests that queued behind it collapse into the latest
+        self.assertEqual(calls, [5, 8])
+        self.assertEqual(monitor.result_images, 8)
+
+
+class TestDetection(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(cm.DETECTION_CACHE, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.images = [render_board(600.0, rvec, offset) for rvec, offset in POSES[:4]]
+        self.images.append(np.full((480, 640, 3), 128, np.uint8))
+
+    def test_cached_frames_not_detected_again(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            accepted = []
+            self.assertTrue(cm._accept_frame(accepted, self.images[0]))
+        with mock.patch.object(cm, "detect_corners", wraps=cm.detect_corners) as detect:
+            # The accepted frame comes back as a copy with the same content
+            corners, cached = cm.detect_all([accepted[0], self.images[1]], workers=1)
+            self.assertEqual((detect.call_count, cached), (1, 1))
+            self.assertIs(corners[0], cm.DETECTION_CACHE[cm.frame_key(self.images[0])])
+            corners, cached = cm.detect_all([self.images[1], accepted[0]], workers=1)
+            self.assertEqual((detect.call_count, cached), (1, 2))
+        self.assertNotEqual(cm.frame_key(self.images[0]), cm.frame_key(self.images[1]))
+
+    def test_pool_matches_serial(self):
+        serial = [cm.detect_corners(img) for img in self.images]
+        with mock.patch.object(cm, "ProcessPoolExecutor", wraps=cm.ProcessPoolExecutor) as pool:
+            pooled, cached = cm.detect_all(self.images, workers=2)
+        pool.assert_called_once_with(max_workers=2)
+        self.assertEqual(cached, 0)
+        self.assertIsNone(pooled[-1])
+        self.assertIsNone(serial[-1])
+        for a, b in zip(pooled[:-1], serial[:-1]):
+            np.testing.assert_allclose(a, b)
+
+
+class TestLiveDetector(unittest.TestCase):
+    def wait_for(self, detector, frame_id, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while detector.frame_id != frame_id and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(detector.frame_id, frame_id)
+
+    def test_detects_off_thread(self):
+        board = render_board(600.0, *POSES[0])
+        blank = np.full_like(board, 128)
+        detect = cm.detect_corners
+        seen = []
+
+        def slow_detect(frame, **kwargs):
+            seen.append(frame)
+            time.sleep(0.1)
+            return detect(frame, **kwargs)
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(cm, "detect_corners", slow_detect):
+            preview = os.path.join(tmp, "camera.png")
+            detector = cm.LiveDetector(preview_path=preview, preview_interval_s=0.0)
+            try:
+                t0 = time.monotonic()
+                for frame_id in range(1, 6):
+                    detector.submit(board, frame_id)
+                self.assertLess(time.monotonic() - t0, 0.05)
+                self.wait_for(detector, 5)
+                self.assertTrue(detector.found)
+                # Only the latest frame is worked on, older ones are dropped
+                self.assertLess(len(seen), 5)
+                detector.submit(blank, 6)
+                self.wait_for(detector, 6)
+                self.assertFalse(detector.found)
+                # Written after frame 5 was marked done, before frame 6 was picked up
+                self.assertTrue(os.path.exists(preview))
+            finally:
+                detector.stop()
+            self.assertFalse(detector._thread.is_alive())
+
+
+class TestIntrinsicsFile(unittest.TestCase):
+    def test_round_trip(self):
+        result = calib_result(2712.5, 1.25, n_images=14)
+        result['dist_coeffs'] = np.array([[0.1, -0.02, 0.001, 0.0005, 0.003]])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "intrinsics.yaml")
+            cm.save_intrinsics(path, result)
+            loaded = cm.load_intrinsics(path, image_size=(640, 480))
+            np.testing.assert_allclose(loaded['camera_matrix'], result['camera_matrix'])
+            np.testing.assert_allclose(loaded['dist_coeffs'], result['dist_coeffs'].ravel())
+            self.assertEqual(loaded['image_size'], (640, 480))
+            for key in ('rms', 'n_images', 'std_fx', 'std_fy'):
+                self.assertEqual(loaded[key], result[key], key)
+            # A matrix in pixels of another resolution is not reused
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertIsNone(cm.load_intrinsics(path, image_size=(1640, 1232)))
+            self.assertIsNone(cm.load_intrinsics(os.path.join(tmp, "missing.yaml")))
+
+
+class TestBatch(unittest.TestCase):
+    F_CAM, F_LENS_A, F_LENS_B = 600.0, 700.0, 800.0
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.reference = write_views(os.path.join(self.tmp, "reference"), self.F_CAM)
+        self.lenses = {
+            "a": write_views(os.path.join(self.tmp, "a"), self.F_LENS_A),
+            "b": write_views(os.path.join(self.tmp, "b"), self.F_LENS_B),
+            "blank": os.path.join(self.tmp, "blank"),
+        }
+        os.makedirs(self.lenses["blank"])
+        cv2.imwrite(os.path.join(self.lenses["blank"], "00.png"), np.full((480, 640, 3), 128, np.uint8))
+        self.intrinsics = os.path.join(self.tmp, "intrinsics.yaml")
+
+    def run_batch(self, output):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            rows = cm.run_batch(self.reference, self.lenses, output, distance_mm=53,
+                                intrinsics_file=self.intrinsics, workers=2)
+        with open(output) as f:
+            return rows, list(csv.DictReader(f)), out.getvalue()
+
+    def test_csv_output(self):
+        rows, table, _ = self.run_batch(os.path.join(self.tmp, "first.csv"))
+        self.assertEqual([r["lens"] for r in table], ["a", "b"])
+        self.assertEqual(len(rows), 2)
+        for row, f_sys in zip(table, (self.F_LENS_A, self.F_LENS_B)):
+            self.assertEqual(int(row["n_images"]), len(POSES))
+            self.assertLess(float(row["rms_px"]), 1.0)
+            # Within three of the reported standard deviations of the true lens
+            expected = lens_focal(self.F_CAM, f_sys, 53)
+            sigma = float(row["focal_length_std_mm"])
+            self.assertGreater(sigma, 0.0)
+            self.assertAlmostEqual(float(row["focal_length_mm"]), expected, delta=3 * sigma)
+        # The reference calibration was cached and is reused by the next run
+        stored = cm.load_intrinsics(self.intrinsics)
+        self.assertAlmostEqual(stored['camera_matrix'][0, 0], self.F_CAM, delta=0.01 * self.F_CAM)
+        _, again, out = self.run_batch(os.path.join(self.tmp, "second.csv"))
+        self.assertIn("betöltve", out)
+        self.assertEqual(again, table)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import contextlib
+import functools
+import grp
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from measurement import motor_control
+from measurement.estop import EmergencyStop, EStopFlag
+from measurement.motor_control import StepperMotor
+from measurement.sim_gpio import SimGPIO
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestEStopFlag(unittest.TestCase):
+    def test_shared_between_mappings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "estop")
+            a, b = EStopFlag(path), EStopFlag(path)
+            self.assertFalse(b.is_set())
+            a.trigger("button")
+            self.assertTrue(b.is_set())
+            self.assertEqual(b.reason(), "button")
+            self.assertLessEqual(b.raised_at(), time.time())
+            b.clear()
+            self.assertFalse(a.is_set())
+
+    def test_not_world_accessible(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "estop")
+            with open(path, "wb") as f:
+                f.write(bytes(64))
+            os.chmod(path, 0o666)
+            EStopFlag(path, group=None).close()
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o660)
+            group = grp.getgrgid(os.getegid()).gr_name
+            EStopFlag(os.path.join(tmp, "new"), group=group).close()
+            st = os.stat(os.path.join(tmp, "new"))
+            self.assertEqual((st.st_mode & 0o777, st.st_gid), (0o660, os.getegid()))
+
+
+class TestWebEStop(unittest.TestCase):
+    def test_reset_needs_api_key(self):
+        from websever.web_server import ControlServer
+
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            web = ControlServer(ipc_path="")
+            web.estop = EStopFlag(os.path.join(tmp, "estop"), group=None)
+        client = web.app.test_client()
+        # Anyone may raise the stop
+        self.assertEqual(client.post("/api/estop").status_code, 200)
+        self.assertTrue(web.estop.is_set())
+        for r in (client.post("/api/estop/reset"),
+                  client.post("/api/estop/reset", headers={"X-API-Key": "wrong"}),
+                  client.post("/", data={"action": "reset"}),
+                  client.post("/", data={"action": "reset", "api_key": "wrong"})):
+            self.assertEqual(r.status_code, 401)
+            self.assertTrue(web.estop.is_set())
+        self.assertEqual(client.post("/api/estop/reset", headers={"X-API-Key": web.api_key}).status_code, 200)
+        self.assertFalse(web.estop.is_set())
+        client.post("/", data={"action": "estop"})
+        self.assertTrue(web.estop.is_set())
+        self.assertEqual(client.post("/", data={"action": "reset", "api_key": web.api_key}).status_code, 200)
+        self.assertFalse(web.estop.is_set())
+
+
+class TestMotorEStop(unittest.TestCase):
+    def test_refuses_without_flag(self):
+        """A flag that cannot be opened must not leave a motor that steps without an emergency stop."""
+        with tempfile.TemporaryDirectory() as tmp:
+            gpio = SimGPIO()
+            unopenable = functools.partial(EStopFlag, os.path.join(tmp, "missing", "estop"))
+            with mock.patch.object(motor_control, "EStopFlag", unopenable), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                with self.assertRaises(OSError):
+                    StepperMotor(gpio=gpio, realtime=False)
+            self.assertEqual(gpio.output_changes(6), [])
+            self.assertIsNone(gpio.resources.owner("gpio6"))
+        # Simulations may opt out explicitly
+        motor = StepperMotor(gpio=gpio, estop=False, realtime=False)
+        self.assertIsNone(motor.estop)
+        with contextlib.redirect_stdout(io.StringIO()):
+            motor.move(0.1, lead_mm=8.0, speed_rps=5.0)
+        self.assertAlmostEqual(motor.position_mm, 0.1)
+        motor.cleanup()
+
+    def test_stop_latency_on_simulated_gpio(self):
+        """Raised from another process mid-move; the driver must be off within one step period."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "estop")
+            gpio = SimGPIO()
+            motor = StepperMotor(gpio=gpio, estop=EStopFlag(path), realtime=True)
+            lead_mm, speed_rps = 8.0, 0.5
+            step_period = 1.0 / (motor.steps_per_rev * speed_rps)
+            errors = []
+
+            def move():
+                try:
+                    motor.move(40.0, lead_mm, speed_rps=speed_rps)
+                except EmergencyStop as e:
+                    errors.append(e)
+
+            mover = threading.Thread(target=move)
+            mover.start()
+            time.sleep(0.3)
+            subprocess.run([sys.executable, "-c", "import sys; from measurement.estop import trigger; trigger('test', sys.argv[1])", path],
+                           cwd=REPO_ROOT, check=True)
+            mover.join(timeout=10.0)
+            self.assertFalse(mover.is_alive())
+
+            self.assertEqual(len(errors), 1)
+            raised_at = EStopFlag(path).raised_at()
+            disabled_at = next(t for t, level in gpio.output_changes(motor.enable_pin) if t >= raised_at and level == gpio.HIGH)
+            latency = disabled_at - raised_at
+            print(f"\nemergency stop latency {latency * 1e3:.2f} ms (step period {step_period * 1e3:.2f} ms)")
+            # One step period plus scheduling slack of a loaded test machine
+            self.assertLess(latency, step_period + 0.02)
+            self.assertLess(motor.position_mm, 40.0)
+            with self.assertRaises(EmergencyStop):
+                motor.move(1.0, lead_mm)
+            motor.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import random
+import statistics
+import unittest
+
+from measurement.filters import Ema, OutlierRejector, SlidingMedian, SlidingStats, build_pipeline
+from measurement.sensor_base import SensorBase
+
+
+class TestFilters(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(1)
+        self.data = [rng.gauss(1.0, 0.1) for _ in range(500)]
+
+    def test_sliding_stats_matches_recomputation(self):
+        s = SlidingStats(20)
+        for i, x in enumerate(self.data):
+            s.update(x)
+            window = self.data[max(0, i - 19):i + 1]
+            self.assertAlmostEqual(s.mean, statistics.fmean(window), places=9)
+            if len(window) > 1:
+                self.assertAlmostEqual(s.variance, statistics.variance(window), places=9)
+        s.resize(5)
+        self.assertAlmostEqual(s.mean, statistics.fmean(self.data[-5:]), places=9)
+
+    def test_sliding_median_matches_recomputation(self):
+        for window in (1, 4, 7):
+            m = SlidingMedian(window)
+            for i, x in enumerate(self.data[:200]):
+                self.assertAlmostEqual(m.update(x), statistics.median(self.data[max(0, i - window + 1):i + 1]))
+
+    def test_sliding_median_heaps_bounded_on_drift(self):
+        m = SlidingMedian(5)
+        for i in range(20000):
+            self.assertEqual(m.update(float(i)), statistics.median(range(max(0, i - 4), i + 1)))
+            self.assertLessEqual(len(m._low) + len(m._high), 2 * m.window + 2)
+        m = SlidingMedian(5)
+        for i in range(20000):
+            m.update(float(-i))
+        self.assertLessEqual(len(m._low) + len(m._high), 2 * m.window + 2)
+
+    def test_ema(self):
+        e = Ema(0.5)
+        e.update(0.0)
+        self.assertEqual(e.update(1.0), 0.5)
+
+    def test_outlier_rejection_and_level_change(self):
+        r = OutlierRejector(k=4.0, max_rejects=3)
+        for x in self.data[:50]:
+            r.update(x)
+        self.assertIsNone(r.update(5.0))
+        self.assertIsNone(r.update(3.0))
+        # The third consecutive outlier is taken as a real change of level
+        self.assertEqual(r.update(3.0), 3.0)
+
+    def test_pipeline_in_sensor(self):
+        sensor = SensorBase()
+        sensor.set_filters("reject:4,median:3")
+        for i, x in enumerate(self.data[:30] + [50.0] + self.data[30:40]):
+            sensor._publish(x, float(i))
+        self.assertEqual(sensor.filters.dropped, 1)
+        self.assertLess(sensor.get_value(), 2.0)
+        self.assertLess(abs(sensor.get_value_mean() - 1.0), 0.1)
+        self.assertLess(sensor.get_noise(), 0.1)
+        self.assertEqual(len(sensor.get_history()), 40)
+
+    def test_unknown_stage(self):
+        with self.assertRaises(ValueError):
+            build_pipeline("kalman")
+
+
+if __name__ == '__main__':
+    unittest.main()
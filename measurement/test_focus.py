@@ -0,0 +1,88 @@
+import contextlib
+import io
+import math
+import unittest
+from dataclasses import replace
+
+from main import ApiClient, MeasurementParams, MeasurementRunner
+from measurement.config import default_rig
+from measurement.replay import ReplayEndstop, ReplayMotor, ReplayProfile, ReplaySensor, SimClock
+from measurement.voltage_sensor import VoltageSensor
+
+PEAK_MM = 60.0
+
+
+class FocusReplaySensor(ReplaySensor):
+    """
+    Replay sensor with a split detector behind it: channel 0 gets more light while the focus
+    still lies ahead (forward) of the carriage, channel 1 once it is behind.
+    """
+
+    def __init__(self, profile, motor, clock, width_mm=2.0):
+        super().__init__(profile, motor, clock)
+        self.width_mm = width_mm
+        self.detector = VoltageSensor(channels=(0, 1), focus_mode="split")
+
+    def focus_error(self):
+        intensity = self.profile.value_at(self.motor.position_mm)
+        e = math.tanh((PEAK_MM - self.motor.position_mm) / self.width_mm)
+        return self.detector._compute_focus_error({0: intensity * (1 + e) / 2, 1: intensity * (1 - e) / 2})
+
+
+def focus_runner(focus_mode, rig=None):
+    clock = SimClock()
+    motor = ReplayMotor(clock)
+    params = MeasurementParams(results_db="", focus_mode=focus_mode)
+    sensor = FocusReplaySensor(ReplayProfile.gaussian(center_mm=PEAK_MM, width_mm=4.0), motor, clock)
+    return MeasurementRunner(
+        params, ApiClient(base_url=""), motor=motor,
+        endstop=ReplayEndstop(motor, max_mm=params.max_travel_mm), homestop=ReplayEndstop(motor, min_mm=0.0),
+        sensors={"voltage": sensor}, clock=clock, rig=rig,
+    )
+
+
+class TestFocusErrorSign(unittest.TestCase):
+    def test_split(self):
+        s = VoltageSensor(channels=(0, 1), focus_mode="split")
+        self.assertAlmostEqual(s._compute_focus_error({0: 0.6, 1: 0.4}), 0.2)
+        self.assertAlmostEqual(s._compute_focus_error({0: 0.4, 1: 0.6}), -0.2)
+        self.assertIsNone(s._compute_focus_error({0: 0.01, 1: 0.01}))
+
+    def test_quad(self):
+        s = VoltageSensor(channels=(0, 1, 2, 3), focus_mode="quad")
+        self.assertAlmostEqual(s._compute_focus_error({0: 0.3, 1: 0.2, 2: 0.3, 3: 0.2}), 0.2)
+        self.assertAlmostEqual(s._compute_focus_error({0: 0.2, 1: 0.3, 2: 0.2, 3: 0.3}), -0.2)
+
+    def test_direction_on_both_sides_of_focus(self):
+        runner = focus_runner("split")
+        for pos, expected in ((PEAK_MM - 3.0, 1), (PEAK_MM + 3.0, -1), (PEAK_MM, None)):
+            runner.motor.position_mm = pos
+            self.assertEqual(runner.focus_direction(), expected, pos)
+        # A detector mounted the other way round is corrected by the rig's focus_sign
+        rig = default_rig()
+        runner = focus_runner("split", rig=replace(rig, adc=replace(rig.adc, focus_sign=-1)))
+        runner.motor.position_mm = PEAK_MM - 3.0
+        self.assertEqual(runner.focus_direction(), -1)
+
+
+class TestFocusShortcut(unittest.TestCase):
+    def scan(self, focus_mode):
+        runner = focus_runner(focus_mode)
+        with contextlib.redirect_stdout(io.StringIO()):
+            best_pos_mm, _ = runner.search_peak()
+        return runner, best_pos_mm
+
+    def test_reverses_at_focus_instead_of_overshooting(self):
+        plain, plain_peak = self.scan(None)
+        sensed, sensed_peak = self.scan("split")
+        furthest = lambda runner: max(pos for _, pos in runner.motor.position_log)
+        # Without focus sensing the coarse sweep runs steps_threshold past the peak
+        self.assertGreater(furthest(plain), PEAK_MM + plain.params.steps_threshold - plain.params.coarse_step_mm)
+        self.assertLess(furthest(sensed), PEAK_MM + 2 * sensed.params.coarse_step_mm)
+        self.assertLess(sensed.motor.travel_mm, plain.motor.travel_mm)
+        self.assertAlmostEqual(sensed_peak, PEAK_MM, delta=0.3)
+        self.assertAlmostEqual(plain_peak, PEAK_MM, delta=0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+
+from measurement.geometry import Geometry, GeometryUncertainty, focal_length, jacobian, recompute
+
+
+class TestGeometry(unittest.TestCase):
+    def test_matches_scalar_formula(self):
+        g = Geometry()
+        pos = 120.0
+        a = pos + 33.0 + 5.0
+        b = 280.0 - pos - 5.0 + 131.0
+        self.assertAlmostEqual(focal_length(pos, g), a * b / (a + b))
+        np.testing.assert_allclose(focal_length(np.array([pos, pos]), g), [a * b / (a + b)] * 2)
+
+    def test_jacobian_against_finite_differences(self):
+        g = Geometry()
+        pos = np.array([20.0, 140.0, 250.0])
+        J = jacobian(pos, g)
+        h = 1e-5
+        for name in ("laser_offset_mm", "sensor_offset_mm", "max_travel_mm", "holder_width_mm"):
+            params = {k: getattr(g, k) for k in ("laser_offset_mm", "sensor_offset_mm", "max_travel_mm", "holder_width_mm")}
+            params[name] += h
+            num = (focal_length(pos, Geometry(**params)) - focal_length(pos, g)) / h
+            np.testing.assert_allclose(J[name], num, rtol=1e-4, atol=1e-8)
+        num = (focal_length(pos + h, g) - focal_length(pos, g)) / h
+        np.testing.assert_allclose(J["pos_mm"], num, rtol=1e-4, atol=1e-8)
+
+    def test_monte_carlo_agrees_with_jacobian(self):
+        g = Geometry()
+        u = GeometryUncertainty(laser_offset_mm=0.3, sensor_offset_mm=0.5, pos_mm=0.2)
+        pos = np.linspace(10.0, 260.0, 50)
+        lin = recompute(pos, g, u, "jacobian")
+        mc = recompute(pos, g, u, "montecarlo", n_samples=20000, seed=1, batch_runs=16)
+        np.testing.assert_allclose(mc.focal_mm, lin.focal_mm, atol=0.01)
+        np.testing.assert_allclose(mc.std_mm, lin.std_mm, rtol=0.05)
+        self.assertTrue(np.all(mc.lo_mm < mc.focal_mm) and np.all(mc.focal_mm < mc.hi_mm))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import socket
+import stat
+import tempfile
+import unittest
+
+from measurement.ipc import IpcClient, IpcServer, decode_state, encode_state, socket_available
+
+
+class TestEncoding(unittest.TestCase):
+    def test_round_trip(self):
+        state = {
+            "is_running": True, "is_homing": False, "current_pos_mm": 12.5, "desired_cmd": "start",
+            "focal_length": None, "focal_lengths": {"voltage": 50.1, "camera": 49.9}, "steps": 3,
+            "custom_key": "ü",
+        }
+        self.assertEqual(decode_state(encode_state(state)), state)
+
+
+class TestSocket(unittest.TestCase):
+    def test_get_and_update(self):
+        state = {"is_running": False, "desired_cmd": "home"}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ipc.sock")
+            self.assertFalse(socket_available(path))
+            server = IpcServer(lambda query: dict(state, rig=query.get("rig")), state.update, path)
+            server.start()
+            try:
+                self.assertTrue(socket_available(path))
+                client = IpcClient(path)
+                self.assertEqual(client.get_status(), dict(state, rig=None))
+                self.assertEqual(client.get_status(rig="left")["rig"], "left")
+                client.update({"is_running": True, "current_pos_mm": 1.25})
+                self.assertEqual(client.get_status()["current_pos_mm"], 1.25)
+                client.close()
+            finally:
+                server.stop()
+            self.assertFalse(os.path.exists(path))
+
+    def test_untrusted_socket_not_used(self):
+        """In auto mode a socket someone else could have bound must not be picked up."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ipc.sock")
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(path)
+            self.addCleanup(sock.close)
+            os.chmod(path, 0o660)
+            self.assertTrue(socket_available(path))
+            os.chmod(path, 0o666)
+            self.assertFalse(socket_available(path))
+            os.chmod(path, 0o660)
+            if os.geteuid() == 0:
+                os.chown(path, 65534, -1)
+                self.assertFalse(socket_available(path))
+
+    def test_private_runtime_dir(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "run", "ipc.sock")
+            server = IpcServer(lambda query: {}, lambda data: None, path, group=None)
+            server.start()
+            try:
+                self.assertEqual(stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode), 0o2770)
+                self.assertTrue(socket_available(path))
+            finally:
+                server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
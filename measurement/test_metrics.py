@@ -0,0 +1,39 @@
+import unittest
+
+from measurement.metrics import MetricsRegistry, Tracer
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.tracer = Tracer(self.registry)
+
+    def test_nested_spans_in_run_profile(self):
+        """Egymásba ágyazott span-ek összesítése futásonként"""
+        run = self.tracer.begin_run()
+        with self.tracer.span("search"):
+            for _ in range(3):
+                with self.tracer.span("move"):
+                    pass
+        self.assertIs(self.tracer.end_run(), run)
+        self.assertEqual(run.counts, {"search": 1, "search;move": 3})
+        self.assertIn("move", run.format())
+
+    def test_prometheus_text(self):
+        with self.tracer.span("read"):
+            pass
+        text = self.registry.render()
+        self.assertIn("# TYPE lensmeter_phase_seconds histogram", text)
+        self.assertIn('lensmeter_phase_seconds_bucket{phase="read",le="+Inf"} 1', text)
+        self.assertIn('lensmeter_phase_seconds_count{phase="read"} 1', text)
+        self.assertIn('lensmeter_phase_total{phase="read"} 1', text)
+
+    def test_span_recorded_on_exception(self):
+        with self.assertRaises(RuntimeError):
+            with self.tracer.span("api_update"):
+                raise RuntimeError("boom")
+        self.assertIn('lensmeter_phase_total{phase="api_update"} 1', self.registry.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import math
+import unittest
+
+from measurement.peak import refine_peak, trace_peak
+
+
+class TestRefinePeak(unittest.TestCase):
+    def test_parabola_vertex(self):
+        """Szabályos mintavételnél a parabola csúcsát adja vissza"""
+        xs = [0.0, 1.0, 2.0, 3.0]
+        ys = [-(x - 1.3) ** 2 for x in xs]
+        pos, val = refine_peak(xs, ys)
+        self.assertAlmostEqual(pos, 1.3)
+        self.assertAlmostEqual(val, 0.0)
+
+    def test_edge_maximum_not_refined(self):
+        self.assertEqual(refine_peak([0.0, 1.0, 2.0], [3.0, 2.0, 1.0]), (0.0, 3.0))
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            refine_peak([], [])
+
+
+class TestTracePeak(unittest.TestCase):
+    def test_dense_trace(self):
+        """Sűrű, egyenetlen mintavételű nyomvonal csúcsa"""
+        trace = [(i * 0.01, 18.0 + i * 0.013, math.exp(-((18.0 + i * 0.013 - 20.0) / 0.8) ** 2)) for i in range(300)]
+        pos, _ = trace_peak(trace)
+        self.assertAlmostEqual(pos, 20.0, delta=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import threading
+import time
+import unittest
+import urllib.request
+
+import numpy as np
+
+from measurement.preview import FrameBuffer, PreviewEncoder, PreviewServer
+
+
+def frame(i):
+    img = np.zeros((72, 128, 3), dtype=np.uint8)
+    img[:, : (i % 128)] = 200
+    return img
+
+
+class TestPreviewEncoder(unittest.TestCase):
+    def test_shared_encoding_at_capped_rate(self):
+        buf = FrameBuffer()
+        enc = PreviewEncoder(buf, max_fps=20.0)
+        enc.start()
+        received = []
+        stop = threading.Event()
+
+        def viewer():
+            seq = 0
+            while not stop.is_set():
+                item = enc.get(seq, timeout=0.5)
+                if item is not None:
+                    seq = item[0]
+                    received.append(seq)
+
+        viewers = [threading.Thread(target=viewer) for _ in range(5)]
+        for v in viewers:
+            v.start()
+        t0 = time.monotonic()
+        for i in range(1, 101):
+            buf.publish(frame(i))
+            time.sleep(0.005)
+        time.sleep(0.1)
+        elapsed = time.monotonic() - t0
+        stop.set()
+        for v in viewers:
+            v.join()
+        enc.stop()
+
+        # Five viewers, but each frame is encoded once and no faster than max_fps
+        self.assertGreater(enc.encoded, 2)
+        self.assertLessEqual(enc.encoded, elapsed * 20.0 + 1)
+        self.assertGreaterEqual(len(received), enc.encoded)
+
+    def test_overlay_tints_spot(self):
+        enc = PreviewEncoder(FrameBuffer(), overlay=True)
+        mask = np.zeros((72, 128), dtype=np.uint8)
+        mask[10:20, 10:20] = 255
+        out = enc.render(np.zeros((72, 128, 3), dtype=np.uint8), mask)
+        self.assertGreater(out[15, 15, 2], 0)
+        self.assertEqual(out[50, 50, 2], 0)
+
+
+class TestPreviewServer(unittest.TestCase):
+    def test_snapshot(self):
+        buf = FrameBuffer()
+        server = PreviewServer(buf, port=0)
+        server.start()
+        try:
+            buf.publish(frame(10))
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/snapshot.jpg", timeout=5) as r:
+                body = r.read()
+            self.assertEqual(body[:2], b"\xff\xd8")
+        finally:
+            server.stop()
+
+    def test_web_server_proxies_each_rig(self):
+        import cv2
+        from websever.web_server import ControlServer
+
+        servers = {}
+        for rig, width in (("left", 128), ("right", 64)):
+            buf = FrameBuffer()
+            servers[rig] = PreviewServer(buf, port=0)
+            servers[rig].start()
+            buf.publish(np.zeros((36, width, 3), dtype=np.uint8))
+        try:
+            web = ControlServer(ipc_path="")
+            for rig, server in servers.items():
+                web.apply_update({"rig": rig, "preview_port": server.port})
+            client = web.app.test_client()
+            for rig, width in (("left", 128), ("right", 64)):
+                r = client.get(f"/snapshot.jpg?rig={rig}")
+                self.assertEqual(r.status_code, 200)
+                img = cv2.imdecode(np.frombuffer(r.data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                self.assertEqual(img.shape[1], width)
+            self.assertEqual(client.get("/snapshot.jpg?rig=nope").status_code, 502)
+            page = client.get("/").get_data(as_text=True)
+            self.assertIn("/preview.mjpg?rig=left", page)
+            self.assertIn("/preview.mjpg?rig=right", page)
+        finally:
+            for server in servers.values():
+                server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
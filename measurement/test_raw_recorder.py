@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from measurement.raw_recorder import RawRecorder, load_raw, segment_paths
+from measurement.sensor_base import SensorBase
+
+
+class TestRawRecorder(unittest.TestCase):
+    def test_rollover_and_read_back(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, "session")
+            rec = RawRecorder(base, segment_records=100)
+            pos = [0.0]
+            rec.position_source = lambda: pos[0]
+            a, b = SensorBase(), SensorBase()
+            a.attach_recorder(rec, "voltage")
+            b.attach_recorder(rec, "camera")
+            for i in range(250):
+                pos[0] = i * 0.1
+                a._publish(float(i), 1000.0 + i)
+                if i % 5 == 0:
+                    b._publish(-float(i), 1000.0 + i)
+            rec.close()
+
+            self.assertEqual(len(segment_paths(base)), 3)
+            data = load_raw(base)
+            self.assertEqual(len(data), 300)
+            np.testing.assert_array_equal(data["seq"], np.arange(300))
+            volt = load_raw(base, sensor="voltage")
+            np.testing.assert_array_equal(volt["value"], np.arange(250.0))
+            np.testing.assert_allclose(volt["pos_mm"], np.arange(250) * 0.1, rtol=1e-6)
+            self.assertEqual(len(load_raw(base, sensor="camera")), 50)
+
+    def test_filters_do_not_hide_raw_samples(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, "s")
+            rec = RawRecorder(base, segment_records=10)
+            sensor = SensorBase()
+            sensor.set_filters("reject:3")
+            sensor.attach_recorder(rec)
+            for i, x in enumerate([1.0, 1.01, 0.99, 1.0, 1.02, 1.0, 40.0]):
+                sensor._publish(x, float(i))
+            rec.close()
+            self.assertEqual(load_raw(base)["value"][-1], 40.0)
+            self.assertEqual(len(sensor.get_history()), 6)
+
+    def test_sequence_continues_across_sessions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, "s")
+            for session in range(3):
+                rec = RawRecorder(base, segment_records=8)
+                for i in range(5 if session < 2 else 0):
+                    rec.append(float(session * 10 + i), float(i))
+                rec.close()
+            rec = RawRecorder(base, segment_records=8)
+            rec.append(100.0, 1.0)
+            rec.close()
+            data = load_raw(base)
+            np.testing.assert_array_equal(data["seq"], np.arange(11))
+            self.assertEqual(data["t"][-1], 100.0)
+
+    def test_disk_use_bounded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, "s")
+            # A session without samples reserves no segment
+            RawRecorder(base, segment_records=8, max_segments=2).close()
+            self.assertEqual(segment_paths(base), [])
+            for session in range(3):
+                rec = RawRecorder(base, segment_records=8, max_segments=2)
+                for i in range(12):
+                    rec.append(float(session * 100 + i), float(i))
+                rec.close()
+            paths = segment_paths(base)
+            self.assertEqual([p.rsplit(".", 2)[-2] for p in paths], ["00004", "00005"])
+            data = load_raw(base)
+            np.testing.assert_array_equal(data["seq"], np.arange(24, 36))
+            self.assertEqual(data["t"][-1], 211.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
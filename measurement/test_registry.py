@@ -0,0 +1,26 @@
+import sys
+import unittest
+
+from measurement.registry import Registry, sensors
+
+
+class TestRegistry(unittest.TestCase):
+    def test_lazy_import(self):
+        reg = Registry("thing")
+        reg.register("decimal", "decimal:Decimal", "stdlib")
+        sys.modules.pop("decimal", None)
+        self.assertEqual(reg.names(), ["decimal"])
+        self.assertNotIn("decimal", sys.modules)
+        self.assertEqual(str(reg.create("decimal", "1.5")), "1.5")
+        self.assertIn("decimal", sys.modules)
+
+    def test_unknown_name(self):
+        with self.assertRaises(KeyError):
+            sensors.load("lidar")
+
+    def test_builtin_sensors(self):
+        self.assertEqual(sensors.names()[:2], ["voltage", "camera"])
+
+
+if __name__ == '__main__':
+    unittest.main()
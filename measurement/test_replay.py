@@ -0,0 +1,88 @@
+import math
+import os
+import tempfile
+import unittest
+
+from main import MeasurementParams, replay_scan
+from measurement.replay import ReplayEndstop, ReplayMotor, ReplayProfile, ReplaySensor, SimClock
+from measurement.results_db import ResultsStore, RunRecord
+
+# search_peak trace (t, pos_mm, value) of a voltage sensor run with default parameters,
+# which found the peak at RECORDED_PEAK_MM (focal length RECORDED_FOCAL_MM)
+RECORDED_SCAN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "recorded_scan.csv")
+RECORDED_PEAK_MM = 57.375
+RECORDED_FOCAL_MM = 74.888
+
+
+def gaussian_trace(center=50.0, width=5.0, step=0.1, n=1000):
+    return [(i * 0.01, i * step, math.exp(-((i * step - center) / width) ** 2)) for i in range(n)]
+
+
+class TestReplayProfile(unittest.TestCase):
+    def test_reference_peak(self):
+        profile = ReplayProfile(gaussian_trace(center=50.03))
+        self.assertAlmostEqual(profile.peak_pos_mm, 50.03, delta=0.01)
+
+    def test_interpolation_and_edges(self):
+        profile = ReplayProfile([(0.0, 0.0, 0.0), (1.0, 1.0, 2.0)])
+        self.assertAlmostEqual(profile.value_at(0.5), 1.0)
+        self.assertEqual(profile.value_at(-3.0), 0.0)
+        self.assertEqual(profile.value_at(9.0), 2.0)
+
+
+class TestReplayMotorSensor(unittest.TestCase):
+    def test_move_advances_simulated_time(self):
+        clock = SimClock()
+        motor = ReplayMotor(clock)
+        motor.set_direction(1)
+        motor.move(dist_mm=8.0, lead_mm=8.0, speed_rps=0.5)
+        self.assertAlmostEqual(motor.position_mm, 8.0)
+        self.assertAlmostEqual(clock.time(), ReplayMotor.ENABLE_DELAY_S + 2.0)
+        self.assertAlmostEqual(motor.position_at(ReplayMotor.ENABLE_DELAY_S + 1.0), 4.0)
+        self.assertEqual((motor.moves, motor.travel_mm), (1, 8.0))
+
+    def test_sensor_follows_motor(self):
+        clock = SimClock()
+        motor = ReplayMotor(clock)
+        sensor = ReplaySensor(ReplayProfile(gaussian_trace()), motor, clock)
+        motor.move(dist_mm=50.0, lead_mm=8.0, speed_rps=0.4)
+        clock.sleep(0.05)
+        self.assertAlmostEqual(sensor.get_value(), 1.0, places=3)
+        self.assertTrue(ReplayEndstop(motor, max_mm=50.0).is_pressed())
+        self.assertGreater(len(sensor.get_history(since=clock.time() - 1.0)), 100)
+
+
+class TestReplayScan(unittest.TestCase):
+    def setUp(self):
+        self.params = MeasurementParams(results_db="")
+
+    def test_recorded_scan_replays_to_same_result(self):
+        profile = ReplayProfile.load(RECORDED_SCAN)
+        r = replay_scan(profile, self.params)
+        self.assertAlmostEqual(r.peak_pos_mm, RECORDED_PEAK_MM, places=6)
+        self.assertAlmostEqual(r.focal_length_mm, RECORDED_FOCAL_MM, places=3)
+        self.assertGreater(r.moves, 10)
+
+    def test_replay_from_results_database(self):
+        trace = ReplayProfile.from_csv(RECORDED_SCAN).trace
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, "results.db")
+            store = ResultsStore(db)
+            store.submit(RunRecord(started_at=trace[0][0], finished_at=trace[-1][0], lens="75", method="voltage_sensor",
+                                   sensor="voltage", params={}, timings={}, peak_pos_mm=RECORDED_PEAK_MM, peak_value=2.4,
+                                   focal_length_mm=RECORDED_FOCAL_MM, trace=trace))
+            store.flush()
+            run_id = store.query_runs(lens="75")[0]["id"]
+            store.close()
+            r = replay_scan(ReplayProfile.load(str(run_id), db_path=db), self.params)
+        self.assertAlmostEqual(r.focal_length_mm, RECORDED_FOCAL_MM, places=3)
+
+    def test_noisy_replays_stay_near_recorded_peak(self):
+        profile = ReplayProfile.load(RECORDED_SCAN)
+        for seed in range(3):
+            r = replay_scan(profile, self.params, noise_std=0.005, seed=seed)
+            self.assertAlmostEqual(r.peak_pos_mm, RECORDED_PEAK_MM, delta=0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from measurement.results_db import ResultsStore, RunRecord
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ResultsStore(os.path.join(self.tmp.name, "results.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def _record(self, lens, method, t, focal=100.0, n=3):
+        return RunRecord(
+            started_at=t, finished_at=t + 10.0, lens=lens, method=method, sensor="voltage",
+            params={"lead_mm": 8.0}, timings={"wall_s": 10.0}, peak_pos_mm=50.0, peak_value=1.2,
+            focal_length_mm=focal, trace=[(t + i, float(i), 0.1 * i) for i in range(n)],
+        )
+
+    def test_roundtrip_with_trace(self):
+        """Futás és nyers minták visszaolvasása"""
+        self.assertTrue(self.store.submit(self._record("10", "voltage_sensor", 1000.0)).wait(5.0))
+        runs = self.store.query_runs(lens="10")
+        self.assertEqual(len(runs), 1)
+        run = runs[0]
+        self.assertEqual(run["method"], "voltage_sensor")
+        self.assertEqual(run["params"], {"lead_mm": 8.0})
+        self.assertEqual(run["n_samples"], 3)
+        self.assertEqual(self.store.load_trace(run["id"]), [(1000.0, 0.0, 0.0), (1001.0, 1.0, 0.1), (1002.0, 2.0, 0.2)])
+
+    def test_filters_and_order(self):
+        for i, (lens, method) in enumerate([("8", "voltage_sensor"), ("10", "voltage_sensor"), ("10", "camera_sensor")]):
+            self.store.submit(self._record(lens, method, 1000.0 + i, n=0))
+        self.store.flush()
+        self.assertEqual([r["lens"] for r in self.store.query_runs(method="voltage_sensor")], ["10", "8"])
+        self.assertEqual(len(self.store.query_runs(lens="10", method="camera_sensor")), 1)
+        self.assertEqual(len(self.store.query_runs(since=1001.0)), 2)
+        self.assertEqual(len(self.store.query_runs(limit=1)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from measurement.config import DEFAULT_RIG, load_rigs
+from measurement.endstop import Endstop
+from measurement.estop import EStopFlag
+from measurement.motor_control import StepperMotor
+from measurement.resources import ResourceConflict, ResourceRegistry
+from measurement.sim_gpio import SimGPIO
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestResourceRegistry(unittest.TestCase):
+    def test_claims_are_exclusive_and_atomic(self):
+        reg = ResourceRegistry(lock_dir=None)
+        reg.claim("left", "gpio6", "gpio12")
+        with self.assertRaises(ResourceConflict):
+            reg.claim("right", "gpio13", "gpio12")
+        # All or nothing: gpio13 was not taken by the failed claim
+        self.assertIsNone(reg.owner("gpio13"))
+        reg.release("left")
+        reg.claim("right", "gpio12")
+        self.assertEqual(reg.held("right"), ["gpio12"])
+
+    def test_lock_held_across_processes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            reg = ResourceRegistry(lock_dir=tmp)
+            reg.claim("left", "i2c1-0x68")
+            code = ("import sys; from measurement.resources import ResourceRegistry, ResourceConflict\n"
+                    "try:\n    ResourceRegistry(sys.argv[1]).claim('right', 'i2c1-0x68')\n"
+                    "except ResourceConflict as e:\n    print(e)\n    sys.exit(3)")
+            out = subprocess.run([sys.executable, "-c", code, tmp], cwd=REPO_ROOT, capture_output=True, text=True)
+            self.assertEqual(out.returncode, 3)
+            self.assertIn("left", out.stdout)
+            reg.release("left")
+            out = subprocess.run([sys.executable, "-c", code, tmp], cwd=REPO_ROOT, capture_output=True, text=True)
+            self.assertEqual(out.returncode, 0)
+
+
+class TestRigsOnOneHeader(unittest.TestCase):
+    def test_pins_isolated_and_cleaned_up_per_rig(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            gpio = SimGPIO()
+            estop = EStopFlag(os.path.join(tmp, "estop"))
+            left = StepperMotor(6, 12, 5, realtime=False, gpio=gpio, estop=estop, owner="left")
+            left_end = Endstop(14, gpio=gpio, owner="left")
+            with self.assertRaises(ResourceConflict):
+                StepperMotor(13, 12, 19, realtime=False, gpio=gpio, estop=estop, owner="right")
+            right = StepperMotor(13, 16, 19, realtime=False, gpio=gpio, estop=estop, owner="right")
+
+            left.cleanup()
+            left_end.cleanup()
+            # The other rig's pins stay configured
+            self.assertEqual(sorted(gpio.modes), [13, 16, 19])
+            self.assertEqual(gpio.resources.held("right"), ["gpio13", "gpio16", "gpio19"])
+            right.cleanup()
+            self.assertEqual(gpio.modes, {})
+
+
+class TestLoadRigs(unittest.TestCase):
+    def write(self, tmp, rigs):
+        path = os.path.join(tmp, "rigs.json")
+        with open(path, "w") as f:
+            json.dump(rigs, f)
+        return path
+
+    def test_default_without_file(self):
+        rigs = load_rigs(os.path.join(tempfile.gettempdir(), "no-such-rigs.json"))
+        self.assertEqual([r.name for r in rigs], [DEFAULT_RIG])
+
+    def test_two_rigs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rigs = load_rigs(self.write(tmp, [
+                {"name": "left"},
+                {"name": "right", "motor": {"step_pin": 13, "dir_pin": 16, "enable_pin": 19},
+                 "endstop": {"pin": 20}, "homestop": {"pin": 21}, "adc": {"i2c_addr": 0x69}},
+            ]))
+            self.assertEqual([r.name for r in rigs], ["left", "right"])
+            self.assertEqual(rigs[1].camera, 1)
+            self.assertEqual(rigs[1].adc.i2c_addr, 0x69)
+            self.assertEqual(rigs[1].calibration_key("backlash_mm"), "backlash_mm.right")
+
+    def test_shared_pin_rejected(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.write(tmp, [
+                {"name": "left"},
+                {"name": "right", "motor": {"step_pin": 13, "dir_pin": 16, "enable_pin": 19},
+                 "endstop": {"pin": 14}, "homestop": {"pin": 21}, "adc": {"i2c_addr": 0x69}},
+            ])
+            with self.assertRaises(ValueError) as ctx:
+                load_rigs(path)
+            self.assertIn("GPIO 14", str(ctx.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from main import ApiClient, App, MeasurementParams, MeasurementRunner
+from measurement import calibration
+from measurement.estop import EmergencyStop, EStopFlag
+from measurement.motor_control import StepperMotor
+from measurement.replay import ReplayEndstop, ReplayMotor, ReplayProfile, ReplaySensor, SimClock
+from measurement.sim_gpio import SimGPIO
+from measurement.startup import InitError, InitPipeline
+
+
+class SlackMotor(ReplayMotor):
+    """
+    Replay motor with lead-screw play: the carriage trails the commanded position by slack_mm
+    while moving forward and sits on it while moving in reverse (the sensor sees the carriage).
+    """
+
+    def __init__(self, clock, slack_mm):
+        super().__init__(clock)
+        self.slack_mm = slack_mm
+        self.carriage_mm = 0.0
+        self.carriage_log = []
+
+    def move(self, dist_mm, lead_mm, speed_rps=0.01, progress_callback=None):
+        super().move(dist_mm, lead_mm, speed_rps, progress_callback)
+        if self._direction > 0:
+            self.carriage_mm = max(self.carriage_mm, self.position_mm - self.slack_mm)
+        else:
+            self.carriage_mm = min(self.carriage_mm, self.position_mm)
+        self.carriage_log.append((self.last_move_end, self.carriage_mm))
+
+    def positions_at(self, times) -> list:
+        result = []
+        for t in times:
+            pos = 0.0
+            for t_move, p in self.carriage_log:
+                if t_move > t:
+                    break
+                pos = p
+            result.append(pos)
+        return result
+
+
+def make_runner(profile, motor=None, params=None, clock=None):
+    clock = clock or SimClock()
+    motor = motor or ReplayMotor(clock)
+    params = params or MeasurementParams(results_db="")
+    sensor = ReplaySensor(profile, motor, clock)
+    runner = MeasurementRunner(
+        params, ApiClient(base_url=""), motor=motor,
+        endstop=ReplayEndstop(motor, max_mm=params.max_travel_mm), homestop=ReplayEndstop(motor, min_mm=0.0),
+        sensors={"voltage": sensor}, clock=clock,
+    )
+    return runner
+
+
+def step_pulses(gpio, motor):
+    return sum(1 for _, level in gpio.output_changes(motor.step_pin) if level == gpio.HIGH)
+
+
+class TestBacklashCompensation(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.gpio = SimGPIO()
+        self.motor = StepperMotor(gpio=self.gpio, estop=EStopFlag(os.path.join(tmp.name, "estop")),
+                                  realtime=False, backlash_mm=0.1)
+        self.addCleanup(self.motor.cleanup)
+
+    def move(self, direction, dist_mm=1.0):
+        """Step pulses emitted by one move (8 mm lead, 1600 steps/rev: 200 steps per mm)."""
+        before = step_pulses(self.gpio, self.motor)
+        self.motor.set_direction(direction)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.motor.move(dist_mm, lead_mm=8.0, speed_rps=5.0)
+        return step_pulses(self.gpio, self.motor) - before
+
+    def test_extra_steps_only_on_reversal(self):
+        self.assertEqual(self.move(1), 200)
+        self.assertEqual(self.move(1), 200)
+        self.assertEqual(self.move(-1), 220)
+        self.assertEqual(self.move(-1), 200)
+        self.assertEqual(self.move(1), 220)
+
+    def test_position_excludes_compensation(self):
+        self.move(1)
+        self.move(-1, 0.5)
+        self.assertAlmostEqual(self.motor.position_mm, 0.5)
+        self.assertAlmostEqual(self.motor.position_log[-1][1], 0.5)
+
+
+class TestCalibrateBacklash(unittest.TestCase):
+    def test_recovers_simulated_slack(self):
+        clock = SimClock()
+        motor = SlackMotor(clock, slack_mm=0.3)
+        runner = make_runner(ReplayProfile.gaussian(center_mm=40.0, width_mm=2.0), motor=motor, clock=clock)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "calibration.json")
+            with mock.patch.object(calibration, "CALIBRATION_FILE", path), contextlib.redirect_stdout(io.StringIO()):
+                backlash = runner.calibrate_backlash(40.0)
+            self.assertAlmostEqual(backlash, 0.3, delta=0.02)
+            self.assertEqual(motor.backlash_mm, backlash)
+            self.assertAlmostEqual(calibration.load_calibration(path)["backlash_mm"], backlash)
+
+
+class TestCalibrateLatency(unittest.TestCase):
+    def test_aborted_sweep_keeps_previous_latency(self):
+        runner = make_runner(ReplayProfile.gaussian(center_mm=40.0, width_mm=2.0))
+        sensor = runner.sensors["voltage"]
+        sensor.latency_s = 0.05
+        sweep = runner.sweep_trace
+        sweeps = []
+
+        def stopped_sweep(*args, **kwargs):
+            sweeps.append(args)
+            if len(sweeps) == 2:
+                raise EmergencyStop("web")
+            return sweep(*args, **kwargs)
+
+        runner.sweep_trace = stopped_sweep
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "calibration.json")
+            with mock.patch.object(calibration, "CALIBRATION_FILE", path), contextlib.redirect_stdout(io.StringIO()):
+                with self.assertRaises(EmergencyStop):
+                    runner.calibrate_latency(40.0)
+            self.assertEqual(sensor.latency_s, 0.05)
+            self.assertFalse(os.path.exists(path))
+
+
+class TestRepeatedMeasurement(unittest.TestCase):
+    def setUp(self):
+        self.profile = ReplayProfile.gaussian(center_mm=62.0, width_mm=4.0)
+        self.params = MeasurementParams(results_db="", local_window_mm=4.0, local_step_mm=0.2)
+
+    def test_local_scan_stays_in_window(self):
+        runner = make_runner(self.profile, params=self.params)
+        runner.pos_mm = 61.0
+        runner.motor.position_mm = 61.0
+        for direction in (1, -1):
+            with contextlib.redirect_stdout(io.StringIO()):
+                pos_mm, _ = runner.local_scan(61.0, direction)
+            scanned = [pos for _, pos, _ in runner.trace]
+            self.assertGreaterEqual(min(scanned), 61.0 - 2.0 - 1e-6)
+            self.assertLessEqual(max(scanned), 61.0 + 2.0 + 1e-6)
+            # Only the slack take-up may leave the window (by pre_mm = 1 mm)
+            travelled = [pos for _, pos in runner.motor.position_log]
+            self.assertGreaterEqual(min(travelled), 61.0 - 3.0 - 1e-6)
+            self.assertLessEqual(max(travelled), 61.0 + 3.0 + 1e-6)
+            self.assertAlmostEqual(pos_mm, self.profile.peak_pos_mm, delta=0.05)
+
+    def test_mean_and_std(self):
+        runner = make_runner(self.profile, params=self.params)
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = runner.measure_repeated(4)
+            true_focal = runner.compute_focal_length(self.params.laser_offset_mm, self.params.sensor_offset_mm,
+                                                     self.profile.peak_pos_mm)
+        mean, std, values = summary["voltage"]
+        self.assertEqual(len(values), 4)
+        self.assertAlmostEqual(mean, statistics.fmean(values))
+        self.assertAlmostEqual(std, statistics.stdev(values))
+        # Local scans of a noise-free profile land on the reference peak
+        for focal in values[1:]:
+            self.assertAlmostEqual(focal, true_focal, delta=0.5)
+        self.assertAlmostEqual(statistics.fmean(values[1:]), true_focal, delta=0.2)
+
+
+class TestCommandLine(unittest.TestCase):
+    def test_mistyped_flag_rejected(self):
+        with contextlib.redirect_stderr(io.StringIO()) as err, self.assertRaises(SystemExit):
+            MeasurementParams.from_args(["--profile", "", "--fine-stepmm", "0.05"])
+        self.assertIn("--fine-stepmm", err.getvalue())
+        # Also next to the app flags, which the measurement parser does not know by itself
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            MeasurementParams.from_args(["--profile", "", "--standalone", "--fine-stepmm", "0.05"],
+                                        parents=(App.parser(),))
+
+    def test_app_flags_accepted(self):
+        argv = ["--profile", "", "--standalone", "--rig", "left", "--fine-step-mm", "0.05"]
+        params = MeasurementParams.from_args(argv, parents=(App.parser(),))
+        self.assertEqual(params.fine_step_mm, 0.05)
+        known, _ = App.parser().parse_known_args(argv)
+        self.assertEqual((known.standalone, known.rig), (True, ["left"]))
+
+
+class TestHomingCancelled(unittest.TestCase):
+    def test_sensor_failure_stops_homing(self):
+        """Start-up pipeline as in App.run: a failing sensor bring-up cancels homing that is under way."""
+        clock = SimClock()
+        motor = ReplayMotor(clock)
+        runner = make_runner(ReplayProfile.gaussian(center_mm=40.0, width_mm=2.0), motor=motor, clock=clock)
+        # Home switch that never closes: homing only ends by cancellation
+        runner.homestop = ReplayEndstop(motor)
+        started = threading.Event()
+        move = motor.move
+
+        def slow_move(*args, **kwargs):
+            started.set()
+            time.sleep(0.001)
+            move(*args, **kwargs)
+
+        motor.move = slow_move
+
+        def init_sensors():
+            started.wait(1.0)
+            raise RuntimeError("camera did not start")
+
+        pipeline = InitPipeline()
+        pipeline.add("sensors", init_sensors)
+        pipeline.add("runner", lambda: runner)
+        pipeline.add("home", lambda runner: runner.home(cancel=pipeline.cancel_event("home")),
+                     deps=("runner",), needs=("sensors",))
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            with self.assertRaises(InitError):
+                pipeline.run()
+        self.assertIn("Homing cancelled.", out.getvalue())
+        self.assertNotIn("home", pipeline.results())
+        moves = motor.moves
+        time.sleep(0.05)
+        self.assertEqual(motor.moves, moves)
+
+
+if __name__ == '__main__':
+    unittest.main()
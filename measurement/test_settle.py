@@ -0,0 +1,55 @@
+import math
+import unittest
+
+from measurement.replay import SimClock
+from measurement.sensor_base import SensorBase
+from measurement.settle import SettleSpec, wait_settled
+
+
+class FunctionSensor(SensorBase):
+    """Samples f(t) at rate_hz on a simulated clock whenever it is queried."""
+
+    def __init__(self, clock, f, rate_hz=200.0):
+        super().__init__()
+        self.clock = clock
+        self.f = f
+        self.period = 1.0 / rate_hz
+        self._next_t = clock.time()
+
+    def get_history(self, since=None):
+        while self._next_t <= self.clock.time():
+            self._publish(self.f(self._next_t), self._next_t)
+            self._next_t += self.period
+        return super().get_history(since)
+
+
+class TestSettle(unittest.TestCase):
+    def test_exponential_settling(self):
+        """Az érték 10 ms időállandóval áll be, a leolvasás a végérték közelében jön"""
+        clock = SimClock()
+        sensor = FunctionSensor(clock, lambda t: 2.0 - math.exp(-t / 0.01))
+        reading = wait_settled(sensor, 0.0, SettleSpec(window=5, abs_tol=0.005, rel_tol=0.0, timeout_s=0.5), clock=clock)
+        self.assertTrue(reading.settled)
+        self.assertAlmostEqual(reading.value, 2.0, delta=0.01)
+        self.assertLess(reading.settle_s, 0.1)
+        self.assertGreater(reading.settle_s, 0.02)
+
+    def test_ringing_times_out(self):
+        clock = SimClock()
+        sensor = FunctionSensor(clock, lambda t: math.sin(t * 60.0))
+        reading = wait_settled(sensor, 0.0, SettleSpec(window=5, abs_tol=0.005, rel_tol=0.0, timeout_s=0.2), clock=clock)
+        self.assertFalse(reading.settled)
+        self.assertAlmostEqual(reading.settle_s, 0.2, delta=0.01)
+
+    def test_stale_samples_ignored(self):
+        """Csak a mozgás vége utáni mintákat használja"""
+        clock = SimClock()
+        sensor = FunctionSensor(clock, lambda t: 0.0 if t < 1.0 else 1.0)
+        clock.sleep(1.0)
+        reading = wait_settled(sensor, 1.0, SettleSpec(window=3, timeout_s=0.5), clock=clock)
+        self.assertTrue(reading.settled)
+        self.assertEqual(reading.value, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import contextlib
+import io
+import threading
+import time
+import unittest
+
+from measurement.startup import InitError, InitPipeline
+
+
+class TestInitPipeline(unittest.TestCase):
+    def test_independent_tasks_overlap(self):
+        p = InitPipeline()
+        p.add("a", lambda: time.sleep(0.1) or 1)
+        p.add("b", lambda: time.sleep(0.1) or 2)
+        p.add("sum", lambda a, b: a + b, deps=("a", "b"))
+        t0 = time.time()
+        out = p.run()
+        self.assertLess(time.time() - t0, 0.18)
+        self.assertEqual(out["sum"], 3)
+        self.assertIn("ready", p.marks)
+
+    def test_failure_skips_dependents(self):
+        ran = threading.Event()
+        p = InitPipeline()
+        p.add("gpio", lambda: 1 / 0)
+        p.add("home", lambda gpio: ran.set(), deps=("gpio",))
+        p.add("metrics", lambda: "ok", required=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(InitError):
+                p.run()
+        self.assertFalse(ran.is_set())
+        self.assertEqual(p.results(), {"metrics": "ok"})
+
+    def test_optional_failure(self):
+        p = InitPipeline()
+        p.add("metrics", lambda: 1 / 0, required=False)
+        p.add("runner", lambda: "runner")
+        with contextlib.redirect_stdout(io.StringIO()):
+            out = p.run()
+        self.assertEqual(out["runner"], "runner")
+        self.assertIsNone(out["metrics"])
+
+    def test_failed_need_cancels_running_task(self):
+        p = InitPipeline()
+        steps = []
+
+        def home():
+            while not p.cancel_event("home").wait(0.01):
+                steps.append(1)
+
+        p.add("sensors", lambda: time.sleep(0.1) or 1 / 0)
+        p.add("home", home, needs=("sensors",))
+        with contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(InitError) as ctx:
+                p.run()
+        self.assertIn("home", str(ctx.exception))
+        self.assertTrue(steps)
+        self.assertEqual(p.results(), {})
+
+    def test_failed_need_skips_task(self):
+        ran = threading.Event()
+        p = InitPipeline()
+        p.add("sensors", lambda: 1 / 0)
+        p.add("gpio", lambda: time.sleep(0.05))
+        p.add("home", lambda gpio: ran.set(), deps=("gpio",), needs=("sensors",))
+        with contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(InitError):
+                p.run()
+        self.assertFalse(ran.is_set())
+
+    def test_unknown_dependency(self):
+        with self.assertRaises(ValueError):
+            InitPipeline().add("home", lambda runner: None, deps=("runner",))
+
+
+if __name__ == '__main__':
+    unittest.main()
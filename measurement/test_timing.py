@@ -0,0 +1,107 @@
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+import unittest
+
+from measurement.config import load_rigs
+from measurement.estop import EStopFlag
+from measurement.motor_control import StepperMotor
+from measurement.sim_gpio import SimGPIO
+from measurement.timing import IntervalHistogram, StepTiming, sleep_until
+
+
+class TestSleepUntil(unittest.TestCase):
+    def test_wakes_at_or_after_deadline(self):
+        """A határidő előtt soha nem ébredhet fel"""
+        for _ in range(20):
+            deadline = time.perf_counter() + 0.001
+            woke = sleep_until(deadline)
+            self.assertGreaterEqual(woke, deadline)
+
+    def test_past_deadline_returns_immediately(self):
+        start = time.perf_counter()
+        sleep_until(start - 1.0)
+        self.assertLess(time.perf_counter() - start, 0.01)
+
+
+class TestIntervalHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        """Percentilisek egy bucket pontosságán belül"""
+        h = IntervalHistogram()
+        for _ in range(99):
+            h.record(100e-6)
+        h.record(1e-3)
+        self.assertEqual(h.count, 100)
+        self.assertAlmostEqual(h.percentile(50), 100e-6, delta=3e-6)
+        self.assertAlmostEqual(h.percentile(100), 1e-3, delta=30e-6)
+        self.assertAlmostEqual(h.mean(), (99 * 100e-6 + 1e-3) / 100)
+
+    def test_out_of_range_values(self):
+        h = IntervalHistogram(min_s=1e-5, max_s=1e-2)
+        h.record(1e-7)
+        h.record(5.0)
+        self.assertEqual(h.count, 2)
+        self.assertEqual(h.percentile(100), 5.0)
+
+
+class TestStepTiming(unittest.TestCase):
+    def test_rates_and_jitter(self):
+        t = StepTiming(commanded_interval_s=1e-3)
+        for _ in range(10):
+            t.intervals.record(1e-3)
+        t.steps = 11
+        t.duration_s = 10e-3
+        self.assertAlmostEqual(t.commanded_rate_hz, 1000.0)
+        self.assertAlmostEqual(t.achieved_rate_hz, 1000.0)
+        self.assertLess(abs(t.jitter_us(50)), 150.0)
+
+
+class TestMotorStepTiming(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.estop = EStopFlag(os.path.join(tmp.name, "estop"))
+
+    def test_move_on_simulated_gpio(self):
+        """Valódi move() a lépésszálon: elért ütem és jitter a kért 1600 Hz-hez képest"""
+        gpio = SimGPIO()
+        motor = StepperMotor(gpio=gpio, estop=self.estop, realtime=True)
+        self.addCleanup(motor.cleanup)
+        motor.set_direction(1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            motor.move(4.0, lead_mm=8.0, speed_rps=1.0)
+        timing = motor.last_move_timing
+        self.assertEqual(timing.steps, 800)
+        self.assertAlmostEqual(timing.commanded_rate_hz, 1600.0)
+        # Deadline-based pacing: late wake-ups do not accumulate
+        self.assertAlmostEqual(timing.achieved_rate_hz, 1600.0, delta=1600.0 * 0.01)
+        self.assertLess(abs(timing.jitter_us(50)), 50.0)
+        self.assertLess(timing.jitter_us(99), 1000.0)
+
+        # The same from the pulses the driver actually wrote
+        rises = [t for t, level in gpio.output_changes(motor.step_pin) if level == gpio.HIGH]
+        self.assertEqual(len(rises), 800)
+        intervals = [b - a for a, b in zip(rises, rises[1:])]
+        self.assertAlmostEqual(statistics.fmean(intervals), 1.0 / 1600.0, delta=0.01 / 1600.0)
+
+    @unittest.skipUnless(hasattr(os, "sched_getaffinity"), "needs Linux CPU affinity")
+    def test_worker_pinned_to_cpu(self):
+        cpu = min(os.sched_getaffinity(0))
+        motor = StepperMotor(gpio=SimGPIO(), estop=self.estop, realtime=True, cpu=cpu)
+        self.addCleanup(motor.cleanup)
+        self.assertEqual(motor._worker.run(lambda: os.sched_getaffinity(0)), {cpu})
+
+    def test_rig_settings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rigs.json")
+            with open(path, "w") as f:
+                f.write('[{"name": "left", "motor": {"rt_priority": 50, "cpu": 3}}]')
+            motor = load_rigs(path)[0].motor
+        self.assertEqual((motor.rt_priority, motor.cpu), (50, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from main import SEARCH_PARAMS, MeasurementParams, load_profile, save_profile
+from tuner import SPACE, TuneResult, bayes_candidates, choose, grid_candidates, pareto_front, parego_scalarize
+
+
+def result(time_s, error_mm, **settings):
+    return TuneResult(settings, time_s, error_mm, error_mm, 1)
+
+
+class TestParetoFront(unittest.TestCase):
+    def test_dominated_points_dropped(self):
+        a, b, c = result(10.0, 0.5), result(20.0, 0.2), result(30.0, 0.1)
+        dominated = [result(25.0, 0.3), result(40.0, 0.1), result(12.0, 0.6)]
+        self.assertEqual(pareto_front(dominated + [c, a, b]), [a, b, c])
+
+    def test_ties(self):
+        fast, slow = result(10.0, 0.3), result(15.0, 0.3)
+        worse, better = result(20.0, 0.4), result(20.0, 0.2)
+        # Equal error: only the faster one; equal time: only the more accurate one
+        self.assertEqual(pareto_front([slow, worse, better, fast]), [fast, better])
+        # Identical objectives are kept once
+        self.assertEqual(len(pareto_front([result(10.0, 0.3), result(10.0, 0.3)])), 1)
+
+
+class TestChoose(unittest.TestCase):
+    def setUp(self):
+        self.front = [result(10.0, 1.0), result(12.0, 0.3), result(30.0, 0.25), result(60.0, 0.2)]
+
+    def test_error_limit(self):
+        self.assertIs(choose(self.front, 0.3), self.front[1])
+        self.assertIs(choose(self.front, 0.01), self.front[-1])
+
+    def test_knee(self):
+        self.assertIs(choose(self.front, None), self.front[1])
+        self.assertIs(choose(self.front[:1], None), self.front[0])
+
+
+class TestParEGO(unittest.TestCase):
+    def test_scalarization_follows_weight(self):
+        tn = np.array([0.0, 0.5, 1.0])
+        en = np.array([1.0, 0.4, 0.0])
+        self.assertEqual(int(np.argmin(parego_scalarize(tn, en, 1.0))), 0)
+        self.assertEqual(int(np.argmin(parego_scalarize(tn, en, 0.0))), 2)
+        self.assertEqual(int(np.argmin(parego_scalarize(tn, en, 0.5))), 1)
+        # The augmentation term breaks ties of the Tchebycheff max
+        y = parego_scalarize(np.array([0.5, 0.5]), np.array([0.5, 0.2]), 0.5)
+        self.assertLess(y[1], y[0])
+
+    def test_candidates_deterministic_and_in_range(self):
+        rng = random.Random(0)
+        results = [result(rng.uniform(10, 60), rng.uniform(0.1, 1.0), **c)
+                   for c in grid_candidates({}, points=2)[:12]]
+        picks = bayes_candidates(results, 3, random.Random(1), pool_size=200)
+        self.assertEqual(picks, bayes_candidates(results, 3, random.Random(1), pool_size=200))
+        for settings in picks:
+            for k, (lo, hi, is_int) in SPACE.items():
+                self.assertTrue(lo <= settings[k] <= hi)
+                self.assertEqual(isinstance(settings[k], int), is_int)
+
+
+class TestGrid(unittest.TestCase):
+    def test_product_and_explicit_values(self):
+        self.assertEqual(len(grid_candidates({}, points=3)), 3 ** len(SPACE))
+        grid = grid_candidates({"max_swings": [3.0, 3.2, 5.0], "coarse_step_mm": [2.0]}, points=1)
+        self.assertEqual(sorted({g["max_swings"] for g in grid}), [3, 5])
+        self.assertTrue(all(g["coarse_step_mm"] == 2.0 for g in grid))
+        self.assertEqual(grid[0]["fine_step_mm"], round((0.05 + 0.4) / 2, 4))
+
+
+class TestProfileFile(unittest.TestCase):
+    def test_written_profile_holds_only_search_params(self):
+        settings = {"coarse_step_mm": 2.5, "fine_step_mm": 0.1, "max_swings": 4, "hysteresis": 0.02,
+                    "steps_threshold": 6.0}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.json")
+            # An earlier profile with a stale key, or the calibration file by mistake
+            with open(path, "w") as f:
+                json.dump({"coarse_step_mm": 9.0, "old_param": 1, "backlash_mm": 0.2}, f)
+            save_profile(dict(settings, runs=3), path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), settings)
+            self.assertEqual(load_profile(path), settings)
+            params = MeasurementParams.from_args(["--profile", path, "--max-swings", "6"])
+            self.assertEqual((params.coarse_step_mm, params.max_swings), (2.5, 6))
+
+    def test_load_ignores_other_keys(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "calibration.json")
+            with open(path, "w") as f:
+                json.dump({"backlash_mm": 0.2, "latency_s.voltage": 0.01, "fine_step_mm": 0.3}, f)
+            self.assertEqual(load_profile(path), {"fine_step_mm": 0.3})
+            self.assertEqual(load_profile(os.path.join(tmp, "missing.json")), {})
+            self.assertTrue(set(load_profile(path)) <= set(SEARCH_PARAMS))
+
+
+if __name__ == '__main__':
+    unittest.main()
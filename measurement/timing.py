@@ -0,0 +1,109 @@
+import math
+import time
+
+
+def sleep_until(deadline: float, spin_s: float = 0.0002) -> float:
+    """
+    Wait until time.perf_counter() reaches `deadline`.
+
+    The bulk of the wait is done with time.sleep(), the last `spin_s` seconds are
+    busy-waited so the wake-up is not delayed by the scheduler's sleep granularity.
+    Returns the perf_counter() value at wake-up.
+    """
+    while True:
+        now = time.perf_counter()
+        remaining = deadline - now
+        if remaining <= 0.0:
+            return now
+        if remaining > spin_s:
+            time.sleep(remaining - spin_s)
+
+
+class IntervalHistogram:
+    """Log-bucketed histogram of time intervals (seconds) with approximate percentiles."""
+
+    def __init__(self, min_s: float = 1e-6, max_s: float = 1.0, buckets_per_decade: int = 100):
+        self.min_s = float(min_s)
+        self.max_s = float(max_s)
+        self.buckets_per_decade = int(buckets_per_decade)
+        decades = math.log10(self.max_s / self.min_s)
+        self._n = int(math.ceil(decades * self.buckets_per_decade)) + 2
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * self._n
+        self.count = 0
+        self.total_s = 0.0
+        self.min_seen = math.inf
+        self.max_seen = 0.0
+
+    def _index(self, value_s: float) -> int:
+        if value_s < self.min_s:
+            return 0
+        if value_s >= self.max_s:
+            return self._n - 1
+        return 1 + int(math.log10(value_s / self.min_s) * self.buckets_per_decade)
+
+    def _bucket_mid(self, idx: int) -> float:
+        if idx == 0:
+            return self.min_s
+        if idx == self._n - 1:
+            return self.max_seen
+        lo = self.min_s * 10 ** ((idx - 1) / self.buckets_per_decade)
+        hi = self.min_s * 10 ** (idx / self.buckets_per_decade)
+        return math.sqrt(lo * hi)
+
+    def record(self, value_s: float):
+        self.counts[self._index(value_s)] += 1
+        self.count += 1
+        self.total_s += value_s
+        if value_s < self.min_seen:
+            self.min_seen = value_s
+        if value_s > self.max_seen:
+            self.max_seen = value_s
+
+    def mean(self) -> float:
+        return self.total_s / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Approximate p-th percentile (0..100), resolution is one bucket (~2.3% at 100/decade)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(math.ceil(self.count * p / 100.0)))
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(max(self._bucket_mid(idx), self.min_seen), self.max_seen)
+        return self.max_seen
+
+
+class StepTiming:
+    """Commanded vs achieved step timing of a single move."""
+
+    def __init__(self, commanded_interval_s: float):
+        self.commanded_interval_s = commanded_interval_s
+        self.intervals = IntervalHistogram()
+        self.duration_s = 0.0
+        self.steps = 0
+
+    @property
+    def commanded_rate_hz(self) -> float:
+        return 1.0 / self.commanded_interval_s if self.commanded_interval_s > 0 else 0.0
+
+    @property
+    def achieved_rate_hz(self) -> float:
+        if self.steps < 2 or self.duration_s <= 0:
+            return 0.0
+        return (self.steps - 1) / self.duration_s
+
+    def jitter_us(self, p: float) -> float:
+        """p-th percentile of the step interval minus the commanded interval, in µs."""
+        return (self.intervals.percentile(p) - self.commanded_interval_s) * 1e6
+
+    def summary(self) -> str:
+        return (
+            f"kért {self.commanded_rate_hz:.0f} Hz, elért {self.achieved_rate_hz:.0f} Hz, "
+            f"jitter p50 {self.jitter_us(50):+.1f} µs, p99 {self.jitter_us(99):+.1f} µs, "
+            f"max {(self.intervals.max_seen - self.commanded_interval_s) * 1e6 if self.steps > 1 else 0.0:+.1f} µs"
+        )
@@ -1,27 +1,41 @@
 import time
 import threading
-from smbus2 import SMBus, i2c_msg
-from collections import deque
 
+from .filters import SlidingStats
+from .resources import i2c_device, resources
 from .sensor_base import SensorBase
+from .settle import SettleSpec
 
 
 class VoltageSensor(SensorBase):
-    def __init__(self, i2c_addr=0x68, channel=0, res_bits=12, vref=2.048, board_scale=(5.06/2.048), window_size: int = 50):
-        SensorBase.__init__(self)
+    def __init__(self, i2c_addr=0x68, channel=0, res_bits=12, vref=2.048, board_scale=(5.06/2.048), window_size: int = 50,
+                 channels=None, focus_mode: str | None = None, min_focus_signal: float = 0.05):
+        """
+        channels: MCP342x csatornák körbeolvasása (pl. (0, 1) osztott, (0, 1, 2, 3) kvadráns detektorhoz).
+                  Alapból csak `channel`.
+        focus_mode: None, "split" vagy "quad" – a csatornákból számolt fókuszhiba-jel típusa.
+        """
+        SensorBase.__init__(self, window_size)
         self.i2c_addr = i2c_addr
-        self.channel = channel
+        self.channels = tuple(channels) if channels else (channel,)
+        self.channel = self.channels[0]
         self.res_bits = res_bits
         self.vref = vref
         self.board_scale = board_scale
+        self.focus_mode = focus_mode
+        self.min_focus_signal = min_focus_signal
+        if focus_mode == "split" and len(self.channels) < 2:
+            raise ValueError("split focus sensing needs 2 channels")
+        if focus_mode == "quad" and len(self.channels) < 4:
+            raise ValueError("quad focus sensing needs 4 channels")
 
         # Belső változók
         self._running = False
         self._thread = None
-        self._current_value = 0.0
-        # Rolling buffer for mean over past N samples
-        self._window_size = max(1, int(window_size))
-        self._samples = deque(maxlen=self._window_size)
+        # Csatornánkénti utolsó érték és csúszó átlag/szórás (O(1) frissítés)
+        self._channel_values = {ch: 0.0 for ch in self.channels}
+        self._channel_stats = {ch: SlidingStats(window_size) for ch in self.channels}
+        self._focus_error = None
 
         # Konfigurációs értékek számítása
         if self.res_bits == 12:
@@ -47,6 +61,8 @@ class VoltageSensor(SensorBase):
 
     def start(self):
         if not self._running:
+            # Két rig nem olvashatja ugyanazt az ADC-t
+            resources.claim(self.owner or self.config_key(), i2c_device(self.i2c_addr))
             self._running = True
             self._thread = threading.Thread(target=self._sensor_loop, daemon=True)
             self._thread.start()
@@ -55,40 +71,108 @@ class VoltageSensor(SensorBase):
         self._running = False
         if self._thread:
             self._thread.join(timeout=1.0)
+        resources.release(self.owner or self.config_key(), i2c_device(self.i2c_addr))
+
+    def config_key(self) -> str:
+        return f"voltage:0x{self.i2c_addr:02x}:res{self.res_bits}"
+
+    def settle_spec(self) -> SettleSpec:
+        # Egy minta ideje: konverzió csatornánként (+ szünet egycsatornás módban)
+        period = self._wait * len(self.channels) + (0.0 if len(self.channels) > 1 else 0.01)
+        window = 5 if self.res_bits <= 14 else 3
+        return SettleSpec(window=window, abs_tol=0.005, rel_tol=0.002, timeout_s=max(0.1, period * (window + 3)),
+                          poll_s=min(0.005, period / 2))
+
+    def get_channel_value(self, channel: int) -> float:
+        with self._lock:
+            return self._channel_values[channel]
+
+    def get_channel_values(self) -> dict:
+        with self._lock:
+            return dict(self._channel_values)
+
+    def get_channel_mean(self, channel: int) -> float:
+        with self._lock:
+            return self._channel_stats[channel].mean
+
+    def focus_error(self) -> float | None:
+        """
+        Normalizált fókuszhiba (-1..1) az utolsó teljes körből, None ha nincs fókuszérzékelés
+        vagy a jel túl gyenge. Előjele megmondja, a fókusz melyik oldalán áll a kocsi.
+        """
+        with self._lock:
+            return self._focus_error
+
+    def _compute_focus_error(self, v: dict) -> float | None:
+        ch = self.channels
+        if self.focus_mode == "split":
+            # Osztott (késél) detektor: (A - B) / (A + B)
+            total = v[ch[0]] + v[ch[1]]
+            diff = v[ch[0]] - v[ch[1]]
+        elif self.focus_mode == "quad":
+            # Asztigmatikus módszer kvadráns detektorral: ((A + C) - (B + D)) / összeg
+            total = v[ch[0]] + v[ch[1]] + v[ch[2]] + v[ch[3]]
+            diff = (v[ch[0]] + v[ch[2]]) - (v[ch[1]] + v[ch[3]])
+        else:
+            return None
+        if total < self.min_focus_signal:
+            return None
+        return diff / total
+
+    def _read_channel(self, bus, channel):
+        from smbus2 import i2c_msg
+        # Config byte összeállítása (one-shot konverzió indítása)
+        config_byte = ((channel & 0x03) << 5) | (1 << 7) | (self._rb_cfg << 2) | 0b00
+        bus.write_byte(self.i2c_addr, config_byte)
+        # A konverziós idő nagy részét alszunk, utána a RDY bitet figyeljük,
+        # így nem várunk többet a szükségesnél
+        time.sleep(self._wait * 0.9)
+        deadline = time.perf_counter() + self._wait + 0.01
+        while True:
+            read = i2c_msg.read(self.i2c_addr, 3)
+            bus.i2c_rdwr(read)
+            msb, lsb, cfg = list(read)
+            if not (cfg & 0x80) or time.perf_counter() > deadline:
+                break
+            time.sleep(0.0002)
+
+        raw = (msb << 8) | lsb
+        if raw & 0x8000:
+            raw -= 1 << 16
+
+        V_internal = (raw / self._denom) * self.vref
+        return V_internal * self.board_scale
 
     def _sensor_loop(self):
+        multi = len(self.channels) > 1
         try:
+            # smbus2 csak a Pi-n kell, a jelfeldolgozás nélküle is tesztelhető
+            from smbus2 import SMBus
             with SMBus(1) as bus:
                 while self._running:
-                    # Config byte összeállítása
-                    config_byte = ((self.channel & 0x03) << 5) | (1 << 7) | (self._rb_cfg << 2) | 0b00
-
                     try:
-                        bus.write_byte(self.i2c_addr, config_byte)
-                        time.sleep(self._wait + 0.001)
-
-                        read = i2c_msg.read(self.i2c_addr, 3)
-                        bus.i2c_rdwr(read)
-                        data = list(read)
-                        msb, lsb, cfg = data
-
-                        raw = (msb << 8) | lsb
-                        if raw & 0x8000:
-                            raw -= 1 << 16
-
-                        V_internal = (raw / self._denom) * self.vref
-                        Vin_est = V_internal * self.board_scale
+                        values = {}
+                        for ch in self.channels:
+                            values[ch] = self._read_channel(bus, ch)
+                        # Több csatornánál az összjel a fő érték (a teljes detektorra eső intenzitás)
+                        Vin_est = sum(values.values()) if multi else values[self.channel]
+                        focus_error = self._compute_focus_error(values)
 
+                        t = time.time()
                         with self._lock:
-                            self._current_value = Vin_est
-                            # Update mean buffer
-                            self._samples.append(Vin_est)
+                            for ch, v in values.items():
+                                self._channel_values[ch] = v
+                                self._channel_stats[ch].update(v)
+                            self._focus_error = focus_error
+                        self._publish(Vin_est, t)
 
                     except OSError:
                         # I2C hiba esetén nem állunk meg, csak kihagyjuk a kört
                         pass
 
-                    time.sleep(0.01)
+                    # Több csatornánál szünet nélkül, a lehető legnagyobb ütemben olvasunk
+                    if not multi:
+                        time.sleep(0.01)
         except Exception as e:
             print(f"SZENZOR HIBA: {e}")
             self._running = False
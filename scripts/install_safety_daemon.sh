@@ -16,6 +16,21 @@ if [[ ! -f "$SCRIPT_PATH" ]]; then
   exit 1
 fi
 
+# Emergency stop flag (/dev/shm/lensmeter.estop) is mode 0660, group lensmeter: the web server
+# and measurement user must be in that group to raise, clear or obey it
+ESTOP_GROUP="${LENSMETER_ESTOP_GROUP:-lensmeter}"
+groupadd -f "$ESTOP_GROUP"
+if [[ -n "${SUDO_USER:-}" ]]; then
+  usermod -aG "$ESTOP_GROUP" "$SUDO_USER"
+  echo "Added $SUDO_USER to group $ESTOP_GROUP (log in again for it to take effect)."
+fi
+
+# Private directory for the web server's IPC socket (/run is cleared at boot, tmpfiles recreates it);
+# main.py only trusts a socket there that is owned by its own user or root
+RUNTIME_DIR="${LENSMETER_RUNTIME_DIR:-/run/lensmeter}"
+echo "d $RUNTIME_DIR 2770 root $ESTOP_GROUP -" > /etc/tmpfiles.d/lensmeter.conf
+systemd-tmpfiles --create /etc/tmpfiles.d/lensmeter.conf
+
 # Create systemd unit (runs as root)
 cat > "$SERVICE_FILE" <<EOF
 [Unit]
@@ -27,6 +42,7 @@ Type=simple
 ExecStart=/usr/bin/python3 $SCRIPT_PATH
 Restart=on-failure
 User=root
+Environment=LENSMETER_ESTOP_GROUP=$ESTOP_GROUP
 
 [Install]
 WantedBy=multi-user.target
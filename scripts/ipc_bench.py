@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Round-trip latency and CPU cost of the main.py <-> web server link: HTTP (requests + Flask)
+versus the local Unix socket transport, both against the same in-process ControlServer.
+
+    python scripts/ipc_bench.py
+    python scripts/ipc_bench.py --calls 5000
+
+CPU time is process time per call and covers both client and server, since they share the
+process. HTTP goes to 127.0.0.1, so mDNS resolution of raspberrypi.local is not included.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "websever"))
+
+from werkzeug.serving import make_server
+
+from main import ApiClient
+from measurement.ipc import encode_state
+from web_server import ControlServer
+
+UPDATE = {"is_running": True, "current_pos_mm": 123.456, "current_voltage": 1.234567, "desired_cmd": None}
+
+
+def bench(name: str, fn, calls: int) -> dict:
+    for _ in range(min(50, calls)):
+        fn()
+    lat = []
+    cpu0 = time.process_time()
+    wall0 = time.perf_counter()
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        lat.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - wall0
+    cpu = time.process_time() - cpu0
+    lat.sort()
+    return {
+        "name": name,
+        "median_us": statistics.median(lat) * 1e6,
+        "p99_us": lat[int(0.99 * (len(lat) - 1))] * 1e6,
+        "cpu_us": cpu / calls * 1e6,
+        "calls_per_s": calls / wall,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark the HTTP and Unix socket status transports")
+    p.add_argument("--calls", type=int, default=2000)
+    a = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = ControlServer(host="127.0.0.1", port=0, ipc_path=os.path.join(tmp, "lensmeter.sock"))
+        http = make_server("127.0.0.1", 0, server.app, threaded=True)
+        threading.Thread(target=http.serve_forever, daemon=True).start()
+        server.start_ipc()
+        try:
+            base_url = f"http://127.0.0.1:{http.server_port}"
+            clients = {
+                "http": ApiClient(base_url, transport="http"),
+                "ipc": ApiClient(base_url, transport="ipc", ipc_path=server.ipc_path),
+            }
+            # The HTTP client should reuse its connection too, as a fair comparison
+            import requests
+            session = requests.Session()
+            clients["http"]._http = lambda: session
+
+            state = clients["ipc"].get_status()
+            print(f"status payload: {len(json.dumps(state))} B JSON, {len(encode_state(state))} B binary")
+            print(f"{'call':<16} {'median us':>10} {'p99 us':>10} {'CPU us':>9} {'calls/s':>9}")
+            rows = []
+            for transport, client in clients.items():
+                rows.append(bench(f"{transport} status", client.get_status, a.calls))
+                rows.append(bench(f"{transport} update", lambda c=client: c.update(UPDATE), a.calls))
+            for r in rows:
+                print(f"{r['name']:<16} {r['median_us']:10.1f} {r['p99_us']:10.1f} {r['cpu_us']:9.1f} {r['calls_per_s']:9.0f}")
+        finally:
+            server.ipc_server.stop()
+            http.shutdown()
+
+
+if __name__ == "__main__":
+    main()
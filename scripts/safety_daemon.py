@@ -6,6 +6,9 @@ import signal
 import sys
 import subprocess
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from measurement.estop import EStopFlag
+
 
 PIN = 22  # BCM numbering for GPIO22
 
@@ -22,8 +25,12 @@ def main():
     GPIO.setup(PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
     triggered = {"value": False}
+    # Opened once up front so raising it on a press is a single memory write
+    estop = EStopFlag()
 
     def on_button_press(channel: int):
+        # Stop the motor at once, before debouncing; a glitch only costs a reset from the web UI
+        estop.trigger("safety button")
         if triggered["value"]:
             return
         # Debounce and confirm the button is still pressed (active low)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Startup cost of main.py per configuration: wall time until the configured backends are
+importable and the resident memory that takes, measured in fresh interpreters.
+
+    python scripts/startup_bench.py
+    python scripts/startup_bench.py --repeats 10 --config "--sensor camera --standalone"
+
+Hardware is not touched: each child imports main, parses the flags and loads the driver
+classes the configuration would construct (sensors, motor, endstops, and requests for the
+web mode), then reports its timings and peak RSS.
+"""
+import argparse
+import json
+import os
+import resource
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = (
+    "--sensor voltage --standalone",
+    "--sensor voltage",
+    "--sensor camera --standalone",
+    "--sensor both",
+)
+
+HEAVY_MODULES = ("cv2", "picamera2", "numpy", "requests", "smbus2", "RPi")
+
+
+def child(args: list) -> dict:
+    t0 = time.perf_counter()
+    sys.path.insert(0, REPO_ROOT)
+    sys.argv = ["main.py"] + args
+    import main
+    from measurement.registry import endstops, motors, sensors
+    t_import = time.perf_counter()
+
+    params = main.MeasurementParams.from_args(args, parents=(main.App.parser(),))
+    standalone = "--standalone" in args
+    names = ["voltage", "camera"] if params.sensor == "both" else [params.sensor]
+    errors = []
+    for registry, name in [(sensors, n) for n in names] + [(motors, "stepper"), (endstops, "gpio")]:
+        try:
+            registry.load(name)
+        except ImportError as e:
+            errors.append(f"{registry.kind} {name}: {e}")
+    if not standalone:
+        main.ApiClient._http()
+    t_ready = time.perf_counter()
+
+    return {
+        "import_s": t_import - t0,
+        "ready_s": t_ready - t0,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "modules": [m for m in HEAVY_MODULES if m in sys.modules],
+        "errors": errors,
+    }
+
+
+def run_config(config: str, repeats: int) -> dict:
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, __file__, "--child", "--", *shlex.split(config)],
+                             capture_output=True, text=True, cwd=REPO_ROOT)
+        wall = time.perf_counter() - t0
+        if out.returncode != 0:
+            return {"config": config, "error": out.stderr.strip().splitlines()[-1] if out.stderr else "failed"}
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        result["wall_s"] = wall
+        samples.append(result)
+    return {
+        "config": config,
+        "wall_s": statistics.median(s["wall_s"] for s in samples),
+        "ready_s": statistics.median(s["ready_s"] for s in samples),
+        "rss_mb": statistics.median(s["rss_mb"] for s in samples),
+        "modules": samples[-1]["modules"],
+        "errors": samples[-1]["errors"],
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Measure main.py startup time and memory per configuration")
+    p.add_argument("--repeats", type=int, default=5)
+    p.add_argument("--config", action="append", default=None, help="main.py flags of a configuration (repeatable)")
+    p.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    p.add_argument("rest", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    a = p.parse_args()
+    if a.child:
+        rest = a.rest[1:] if a.rest[:1] == ["--"] else a.rest
+        print(json.dumps(child(rest)))
+        return
+
+    print(f"{'configuration':<32} {'process s':>9} {'ready s':>8} {'RSS MB':>7}  heavy modules")
+    for config in a.config or CONFIGS:
+        r = run_config(config, a.repeats)
+        if "error" in r:
+            print(f"{config:<32} ERROR: {r['error']}")
+            continue
+        print(f"{config:<32} {r['wall_s']:9.3f} {r['ready_s']:8.3f} {r['rss_mb']:7.1f}  {', '.join(r['modules']) or '-'}")
+        for err in r["errors"]:
+            print(f"{'':<32} unavailable here: {err}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Focal length result analysis (replaces the plotting cells of test_results.ipynb).
+
+Discovers every <method>/<lens>.csv under the results directory (and optionally the
+runs stored in the SQLite results database), computes per-lens, per-method statistics
+in one vectorized pass and renders the report headlessly.
+
+    python test_results/analysis.py
+    python test_results/analysis.py --db results.db --report report/ --plots
+"""
+import argparse
+import glob
+import os
+import sqlite3
+import zlib
+from statistics import NormalDist
+
+import numpy as np
+
+RESULTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = ".analysis_cache.npz"
+BASELINE = "baseline"
+
+# Two-sided 95% Student t critical values for df = 1..30 (used when scipy is not installed)
+_T95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+
+def _t_critical(df: np.ndarray, confidence: float) -> np.ndarray:
+    df = np.asarray(df, dtype=float)
+    try:
+        from scipy.stats import t
+        return t.ppf(0.5 + confidence / 2.0, np.maximum(df, 1))
+    except ImportError:
+        pass
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    if abs(confidence - 0.95) > 1e-9:
+        return np.full(df.shape, z)
+    table = np.asarray(_T95)
+    idx = np.clip(df.astype(int), 1, len(table)) - 1
+    return np.where(df <= len(table), table[idx], z)
+
+
+def _read_column(path: str) -> list:
+    """First column of a hand-maintained CSV as floats (blank and non-numeric lines skipped)."""
+    values = []
+    with open(path, "r") as f:
+        for line in f:
+            field = line.split(",", 1)[0].strip()
+            if not field:
+                continue
+            try:
+                values.append(float(field))
+            except ValueError:
+                continue
+    return values
+
+
+def _fingerprint(paths: list) -> np.ndarray:
+    """Cheap change detector: (path hash, size, mtime_ns) for every source file."""
+    rows = []
+    for p in paths:
+        st = os.stat(p)
+        rows.append((zlib.crc32(os.path.abspath(p).encode()), st.st_size, st.st_mtime_ns))
+    return np.asarray(rows, dtype=np.int64).reshape(-1, 3)
+
+
+class ResultSet:
+    """Long-form columnar results: one row per measurement, method/lens stored as category codes."""
+
+    def __init__(self, methods: list, lenses: list, method_idx: np.ndarray, lens_idx: np.ndarray, value: np.ndarray):
+        self.methods = list(methods)
+        self.lenses = list(lenses)
+        self.method_idx = np.asarray(method_idx, dtype=np.int32)
+        self.lens_idx = np.asarray(lens_idx, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.value)
+
+    @classmethod
+    def from_records(cls, records: list) -> "ResultSet":
+        """records: iterable of (method, lens, value)."""
+        methods = sorted({m for m, _, _ in records})
+        lenses = sorted({lens for _, lens, _ in records}, key=_lens_sort_key)
+        m_code = {m: i for i, m in enumerate(methods)}
+        l_code = {lens: i for i, lens in enumerate(lenses)}
+        n = len(records)
+        mi = np.fromiter((m_code[m] for m, _, _ in records), dtype=np.int32, count=n)
+        li = np.fromiter((l_code[lens] for _, lens, _ in records), dtype=np.int32, count=n)
+        v = np.fromiter((val for _, _, val in records), dtype=np.float64, count=n)
+        return cls(methods, lenses, mi, li, v)
+
+    def concat(self, other: "ResultSet") -> "ResultSet":
+        records = self.to_records() + other.to_records()
+        return ResultSet.from_records(records)
+
+    def to_records(self) -> list:
+        return [(self.methods[m], self.lenses[lens], float(v)) for m, lens, v in zip(self.method_idx, self.lens_idx, self.value)]
+
+    def save(self, path: str, fingerprint: np.ndarray):
+        np.savez(path, methods=np.asarray(self.methods, dtype=str), lenses=np.asarray(self.lenses, dtype=str),
+                 method_idx=self.method_idx, lens_idx=self.lens_idx, value=self.value, fingerprint=fingerprint)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as z:
+            return cls(z["methods"].tolist(), z["lenses"].tolist(), z["method_idx"], z["lens_idx"], z["value"]), z["fingerprint"]
+
+
+def _lens_sort_key(lens: str):
+    try:
+        return (0, float(lens), lens)
+    except ValueError:
+        return (1, 0.0, lens)
+
+
+def discover(results_dir: str = RESULTS_DIR, use_cache: bool = True) -> ResultSet:
+    """Load every <method>/<lens>.csv, reusing the binary cache if no source file changed."""
+    paths = sorted(glob.glob(os.path.join(results_dir, "*", "*.csv")))
+    fingerprint = _fingerprint(paths)
+    cache_path = os.path.join(results_dir, CACHE_FILE)
+    if use_cache and os.path.exists(cache_path):
+        try:
+            cached, cached_fp = ResultSet.load(cache_path)
+            if np.array_equal(cached_fp, fingerprint):
+                return cached
+        except (OSError, ValueError, KeyError):
+            pass
+
+    records = []
+    for p in paths:
+        method = os.path.basename(os.path.dirname(p))
+        lens = os.path.splitext(os.path.basename(p))[0]
+        records.extend((method, lens, v) for v in _read_column(p))
+    rs = ResultSet.from_records(records)
+    if use_cache:
+        try:
+            rs.save(cache_path, fingerprint)
+        except OSError as e:
+            print(f"Cache not written ({cache_path}): {e}")
+    return rs
+
+
+def load_db(db_path: str) -> ResultSet:
+    """Focal lengths of the runs recorded by main.py (measurement/results_db.py)."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT method, lens, focal_length_mm FROM runs WHERE lens IS NOT NULL AND focal_length_mm IS NOT NULL"
+        ).fetchall()
+    finally:
+        conn.close()
+    return ResultSet.from_records(rows)
+
+
+def summarize(rs: ResultSet, confidence: float = 0.95) -> dict:
+    """
+    Per (method, lens) statistics computed with bincount over the combined group key.
+
+    Returns a dict of 2-D arrays indexed [method, lens] (NaN where there is no data):
+    n, mean, std, sem, ci_low, ci_high, bias (vs. baseline mean), repeatability
+    (ISO 5725 repeatability limit 2.77 * s).
+    """
+    nm, nl = len(rs.methods), len(rs.lenses)
+    key = rs.method_idx * nl + rs.lens_idx
+    size = nm * nl
+    n = np.bincount(key, minlength=size).astype(float)
+    s1 = np.bincount(key, weights=rs.value, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / n
+        # Two-pass variance for numerical stability
+        dev = rs.value - mean[key]
+        ss = np.bincount(key, weights=dev * dev, minlength=size)
+        var = np.where(n > 1, ss / (n - 1), np.nan)
+        std = np.sqrt(var)
+        sem = std / np.sqrt(n)
+    half = _t_critical(n - 1, confidence) * sem
+    mean[n == 0] = np.nan
+
+    stats = {
+        "n": n.reshape(nm, nl),
+        "mean": mean.reshape(nm, nl),
+        "std": std.reshape(nm, nl),
+        "sem": sem.reshape(nm, nl),
+        "ci_low": (mean - half).reshape(nm, nl),
+        "ci_high": (mean + half).reshape(nm, nl),
+        "repeatability": (2.77 * std).reshape(nm, nl),
+    }
+    if BASELINE in rs.methods:
+        stats["bias"] = stats["mean"] - stats["mean"][rs.methods.index(BASELINE)][None, :]
+    else:
+        stats["bias"] = np.full((nm, nl), np.nan)
+    return stats
+
+
+COLUMNS = ("n", "mean", "std", "ci_low", "ci_high", "bias", "repeatability")
+
+
+def summary_rows(rs: ResultSet, stats: dict) -> list:
+    rows = []
+    for li, lens in enumerate(rs.lenses):
+        for mi, method in enumerate(rs.methods):
+            if stats["n"][mi, li] == 0:
+                continue
+            rows.append([lens, method] + [stats[c][mi, li] for c in COLUMNS])
+    return rows
+
+
+def format_table(rows: list) -> str:
+    header = ["lens", "method"] + list(COLUMNS)
+    out = [f"{header[0]:>6} {header[1]:<18}" + "".join(f"{h:>14}" for h in header[2:])]
+    for r in rows:
+        cells = [f"{int(r[2]):>14d}"] + [f"{v:>14.3f}" if np.isfinite(v) else f"{'-':>14}" for v in r[3:]]
+        out.append(f"{r[0]:>6} {r[1]:<18}" + "".join(cells))
+    return "\n".join(out)
+
+
+def write_report(rs: ResultSet, stats: dict, out_dir: str, plots: bool = False) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    rows = summary_rows(rs, stats)
+    with open(os.path.join(out_dir, "summary.csv"), "w") as f:
+        f.write(",".join(["lens", "method"] + list(COLUMNS)) + "\n")
+        for r in rows:
+            f.write(",".join([r[0], r[1]] + [f"{v:.6g}" for v in r[2:]]) + "\n")
+    with open(os.path.join(out_dir, "summary.txt"), "w") as f:
+        f.write(format_table(rows) + "\n")
+    if plots:
+        _write_plots(rs, stats, out_dir)
+
+
+def _write_plots(rs: ResultSet, stats: dict, out_dir: str) -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    for li, lens in enumerate(rs.lenses):
+        sel = rs.lens_idx == li
+        methods = [mi for mi in range(len(rs.methods)) if np.any(sel & (rs.method_idx == mi))]
+        if not methods:
+            continue
+        fig, (ax_line, ax_box) = plt.subplots(1, 2, figsize=(12, 5))
+        data = []
+        for mi in methods:
+            vals = rs.value[sel & (rs.method_idx == mi)]
+            data.append(vals)
+            ax_line.plot(np.arange(len(vals)), vals, marker="o", label=f"{rs.methods[mi]} ({len(vals)})")
+        ax_line.set_title(f"Lens {lens}: measurements by method")
+        ax_line.set_xlabel("Index of measurement")
+        ax_line.set_ylabel("Focal length (mm)")
+        ax_line.legend()
+
+        positions = np.arange(1, len(methods) + 1)
+        ax_box.boxplot(data, positions=positions)
+        means = stats["mean"][methods, li]
+        lo = means - stats["ci_low"][methods, li]
+        ax_box.errorbar(positions, means, yerr=np.nan_to_num(lo), fmt="o", color="red", label="mean ± CI")
+        ax_box.set_xticks(positions)
+        ax_box.set_xticklabels([rs.methods[mi] for mi in methods], rotation=15)
+        ax_box.set_title(f"Lens {lens}: distribution per method")
+        ax_box.legend()
+        fig.tight_layout()
+        fig.savefig(os.path.join(out_dir, f"lens_{lens}.png"), dpi=120)
+        plt.close(fig)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Focal length result statistics per lens and method")
+    p.add_argument("--results-dir", default=RESULTS_DIR, help="Directory with <method>/<lens>.csv files")
+    p.add_argument("--db", default=None, help="Also include runs from this results database")
+    p.add_argument("--confidence", type=float, default=0.95)
+    p.add_argument("--no-cache", action="store_true", help="Re-parse the CSV files even if the cache is fresh")
+    p.add_argument("--report", default=None, help="Write summary.csv/summary.txt (and plots) into this directory")
+    p.add_argument("--plots", action="store_true", help="Render per-lens PNG figures into the report directory")
+    a = p.parse_args(argv)
+
+    rs = discover(a.results_dir, use_cache=not a.no_cache)
+    if a.db:
+        rs = rs.concat(load_db(a.db))
+    if len(rs) == 0:
+        print(f"No data found under {a.results_dir}/<method>/<lens>.csv")
+        return
+    stats = summarize(rs, a.confidence)
+    print(f"Methods: {', '.join(rs.methods)} | Lenses: {', '.join(rs.lenses)} | Measurements: {len(rs)}")
+    print(format_table(summary_rows(rs, stats)))
+    if a.report:
+        write_report(rs, stats, a.report, plots=a.plots)
+        print(f"Report written to {a.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Search parameter tuner.
+
+Evaluates search settings of MeasurementParams on replayed scans (main.replay_scan) in a
+process pool, reports the Pareto front of simulated scan time against focal-length error
+and optionally writes the chosen settings to the profile file that MeasurementParams.from_args
+loads.
+
+    python tuner.py --trace 12 --trace scan.csv --trace synthetic:120:6 --mode bayes --budget 80 --write-profile
+    python tuner.py --trace 12 --mode grid --grid max_swings=3,4,5 --grid hysteresis=0.01,0.02,0.05
+
+Measurement flags (--lead-mm, --max-travel-mm, ...) are passed through to MeasurementParams
+and define the geometry the replays run with.
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+
+import numpy as np
+
+from main import PROFILE_FILE, SEARCH_PARAMS, MeasurementParams, replay_scan, save_profile
+from measurement.replay import ReplayProfile
+
+# Search space: (low, high, is_integer)
+SPACE = {
+    "coarse_step_mm": (1.0, 6.0, False),
+    "fine_step_mm": (0.05, 0.4, False),
+    "max_swings": (2, 7, True),
+    "hysteresis": (0.005, 0.1, False),
+    "steps_threshold": (4.0, 30.0, False),
+}
+assert set(SPACE) == set(SEARCH_PARAMS)
+
+
+@dataclass
+class TuneResult:
+    settings: dict
+    time_s: float
+    error_mm: float
+    max_error_mm: float
+    runs: int
+
+
+# --- Worker side -------------------------------------------------------------
+
+_profiles = []
+
+
+def _init_worker(sources: list, db_path: str | None):
+    global _profiles
+    _profiles = [ReplayProfile.load(src, db_path=db_path) for src in sources]
+
+
+def _evaluate(task) -> tuple:
+    """Replay every profile with every seed; returns (sim times, |focal errors|)."""
+    base, settings, noise_std, seeds = task
+    params = replace(MeasurementParams(**base), **settings)
+    times, errors = [], []
+    for profile in _profiles:
+        for seed in seeds:
+            r = replay_scan(profile, params, noise_std=noise_std, seed=seed)
+            times.append(r.sim_time_s)
+            errors.append(abs(r.focal_error_mm))
+    return times, errors
+
+
+# --- Search strategies -------------------------------------------------------
+
+def to_unit(settings: dict) -> list:
+    return [(settings[k] - lo) / (hi - lo) for k, (lo, hi, _) in SPACE.items()]
+
+
+def from_unit(x) -> dict:
+    settings = {}
+    for xi, (k, (lo, hi, is_int)) in zip(x, SPACE.items()):
+        v = lo + min(max(float(xi), 0.0), 1.0) * (hi - lo)
+        settings[k] = int(round(v)) if is_int else round(v, 4)
+    return settings
+
+
+def grid_candidates(grid: dict, points: int = 3) -> list:
+    """Cartesian product of the --grid values; parameters without explicit values get `points` even steps."""
+    axes = []
+    for k, (lo, hi, is_int) in SPACE.items():
+        if k in grid:
+            values = grid[k]
+        elif points <= 1:
+            values = [(lo + hi) / 2]
+        else:
+            values = [lo + i * (hi - lo) / (points - 1) for i in range(points)]
+        axes.append(sorted({int(round(v)) if is_int else round(v, 4) for v in values}))
+    return [dict(zip(SPACE, combo)) for combo in itertools.product(*axes)]
+
+
+def pareto_front(results: list) -> list:
+    """Results not dominated in (time_s, error_mm), sorted by time."""
+    front = []
+    best_error = math.inf
+    for r in sorted(results, key=lambda r: (r.time_s, r.error_mm)):
+        if r.error_mm < best_error:
+            front.append(r)
+            best_error = r.error_mm
+    return front
+
+
+def _gp_expected_improvement(X: np.ndarray, y: np.ndarray, candidates: np.ndarray, length_scale: float = 0.25) -> np.ndarray:
+    """Expected improvement (minimisation) of a zero-mean RBF Gaussian process fitted to standardized y."""
+    mu_y, sd_y = y.mean(), y.std() or 1.0
+    ys = (y - mu_y) / sd_y
+
+    def kernel(a, b):
+        d2 = ((a[:, None, :] - b[None, :, :]) ** 2).sum(-1)
+        return np.exp(-0.5 * d2 / length_scale ** 2)
+
+    K = kernel(X, X) + 1e-3 * np.eye(len(X))
+    L = np.linalg.cholesky(K)
+    alpha = np.linalg.solve(L.T, np.linalg.solve(L, ys))
+    Ks = kernel(candidates, X)
+    mean = Ks @ alpha
+    v = np.linalg.solve(L, Ks.T)
+    std = np.sqrt(np.clip(1.0 - (v ** 2).sum(0), 1e-12, None))
+    z = (ys.min() - mean) / std
+    cdf = 0.5 * (1.0 + np.array([math.erf(zi / math.sqrt(2.0)) for zi in z]))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2.0 * math.pi)
+    return (ys.min() - mean) * cdf + std * pdf
+
+
+def parego_scalarize(tn: np.ndarray, en: np.ndarray, w: float, rho: float = 0.05) -> np.ndarray:
+    """Augmented Tchebycheff scalarization of normalized (time, error) with weight w on time; lower is better."""
+    return np.maximum(w * tn, (1 - w) * en) + rho * (w * tn + (1 - w) * en)
+
+
+def bayes_candidates(results: list, n: int, rng: random.Random, pool_size: int = 2000) -> list:
+    """
+    Next batch of settings by ParEGO: each pick scalarizes (time, error) with a random weight
+    (augmented Tchebycheff on normalized objectives) and maximizes GP expected improvement.
+    """
+    X = np.array([to_unit(r.settings) for r in results])
+    t = np.array([r.time_s for r in results])
+    e = np.array([r.error_mm for r in results])
+    tn = (t - t.min()) / (np.ptp(t) or 1.0)
+    en = (e - e.min()) / (np.ptp(e) or 1.0)
+    picks = []
+    for _ in range(n):
+        y = parego_scalarize(tn, en, rng.random())
+        cand = np.array([[rng.random() for _ in SPACE] for _ in range(pool_size)])
+        ei = _gp_expected_improvement(X, y, cand)
+        picks.append(from_unit(cand[int(np.argmax(ei))]))
+    return picks
+
+
+def random_candidates(n: int, rng: random.Random) -> list:
+    return [from_unit([rng.random() for _ in SPACE]) for _ in range(n)]
+
+
+# --- Driver ------------------------------------------------------------------
+
+class Tuner:
+    def __init__(self, pool: ProcessPoolExecutor, base: MeasurementParams, noise_std: float, seeds: list):
+        self.pool = pool
+        self.base = asdict(base)
+        self.noise_std = noise_std
+        self.seeds = seeds
+        self.results = []
+        self._seen = set()
+
+    def evaluate(self, candidates: list) -> list:
+        fresh = []
+        for c in candidates:
+            key = tuple(sorted(c.items()))
+            if key not in self._seen:
+                self._seen.add(key)
+                fresh.append(c)
+        tasks = [(self.base, c, self.noise_std, self.seeds) for c in fresh]
+        batch = []
+        for settings, (times, errors) in zip(fresh, self.pool.map(_evaluate, tasks)):
+            batch.append(TuneResult(settings, statistics.fmean(times), statistics.fmean(errors), max(errors), len(times)))
+        self.results.extend(batch)
+        return batch
+
+    def run_grid(self, grid: dict, points: int):
+        candidates = grid_candidates(grid, points)
+        print(f"Grid: {len(candidates)} settings")
+        self.evaluate(candidates)
+
+    def run_bayes(self, budget: int, batch: int, rng: random.Random):
+        n_init = min(budget, max(2 * len(SPACE), batch))
+        self.evaluate(random_candidates(n_init, rng))
+        while len(self.results) < budget:
+            n = min(batch, budget - len(self.results))
+            self.evaluate(bayes_candidates(self.results, n, rng))
+            front = pareto_front(self.results)
+            print(f"  {len(self.results)}/{budget} evaluated, Pareto front {len(front)}, "
+                  f"fastest {front[0].time_s:.1f} s, most accurate {front[-1].error_mm:.3f} mm")
+
+
+def choose(front: list, max_error_mm: float | None) -> TuneResult:
+    """Fastest front point within max_error_mm, otherwise the knee (closest to the normalized utopia point)."""
+    if max_error_mm is not None:
+        ok = [r for r in front if r.error_mm <= max_error_mm]
+        if ok:
+            return ok[0]
+        print(f"No setting reaches {max_error_mm} mm; choosing the most accurate.")
+        return front[-1]
+    t0, t1 = front[0].time_s, front[-1].time_s
+    e0, e1 = front[-1].error_mm, front[0].error_mm
+    return min(front, key=lambda r: math.hypot((r.time_s - t0) / ((t1 - t0) or 1.0), (r.error_mm - e0) / ((e1 - e0) or 1.0)))
+
+
+def format_result(r: TuneResult, mark: str = " ") -> str:
+    s = r.settings
+    return (f"{mark} {r.time_s:8.1f} {r.error_mm:9.3f} {r.max_error_mm:9.3f}   coarse {s['coarse_step_mm']:.2f} "
+            f"fine {s['fine_step_mm']:.3f} swings {s['max_swings']} hyst {s['hysteresis']:.3f} thr {s['steps_threshold']:.1f}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Tune search parameters on replayed scans")
+    p.add_argument("--trace", action="append", required=True,
+                   help="Run id in the results database, CSV of t,pos_mm,value, or synthetic:CENTER:WIDTH (repeatable)")
+    p.add_argument("--mode", choices=["grid", "bayes"], default="bayes")
+    p.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...", help="Explicit grid values for a parameter")
+    p.add_argument("--grid-points", type=int, default=3, help="Grid points for parameters without explicit values")
+    p.add_argument("--budget", type=int, default=60, help="Number of settings evaluated in bayes mode")
+    p.add_argument("--noise", type=float, default=0.005, help="Std of noise added to replayed values")
+    p.add_argument("--seeds", type=int, default=3, help="Replays per trace and setting")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--max-error-mm", type=float, default=None, help="Pick the fastest setting with mean |focal error| below this")
+    p.add_argument("--write-profile", nargs="?", const=PROFILE_FILE, default=None, metavar="PATH",
+                   help=f"Write the chosen settings to the profile file (default {PROFILE_FILE})")
+    p.add_argument("--seed", type=int, default=0)
+    a, rest = p.parse_known_args()
+
+    base = MeasurementParams.from_args(rest)
+    grid = {}
+    for item in a.grid:
+        name, _, values = item.partition("=")
+        if name not in SPACE:
+            p.error(f"unknown parameter {name!r} (choose from {', '.join(SPACE)})")
+        grid[name] = [float(v) for v in values.split(",") if v]
+
+    rng = random.Random(a.seed)
+    workers = a.workers or os.cpu_count() or 1
+    db_path = base.results_db or None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(a.trace, db_path)) as pool:
+        tuner = Tuner(pool, base, a.noise, list(range(a.seeds)))
+        current = tuner.evaluate([{k: getattr(base, k) for k in SEARCH_PARAMS}])[0]
+        if a.mode == "grid":
+            tuner.run_grid(grid, a.grid_points)
+        else:
+            tuner.run_bayes(a.budget, workers, rng)
+
+    front = pareto_front(tuner.results)
+    chosen = choose(front, a.max_error_mm)
+    print(f"\nPareto front ({len(front)} of {len(tuner.results)} settings, {current.runs} replays each):")
+    print("      time s  |err| mm  max err mm")
+    for r in front:
+        print(format_result(r, "*" if r is chosen else " "))
+    print("Current:")
+    print(format_result(current))
+
+    if a.write_profile:
+        save_profile(chosen.settings, a.write_profile)
+        print(f"Profile written to {a.write_profile}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,26 @@
+import hmac
 import logging
 import os
-from flask import Flask, request, render_template, jsonify
+import sys
+import urllib.parse
+import urllib.request
+from flask import Flask, Response, request, render_template, jsonify
+
+# The measurement package lives next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from measurement.estop import EStopFlag
+from measurement.ipc import DEFAULT_SOCKET, IpcServer
 
 
 class ControlServer:
-    def __init__(self, host="raspberrypi.local", port=5000):
+    DEFAULT_RIG = "default"
+
+    def __init__(self, host="raspberrypi.local", port=5000, ipc_path=DEFAULT_SOCKET):
         self.host = host
         self.port = port
+        # Unix socket for main.py on the same host ("" disables it)
+        self.ipc_path = ipc_path
+        self.ipc_server = None
         self.app = Flask(__name__)
 
         self.system_state = {
@@ -17,68 +31,224 @@ class ControlServer:
             "best_pos_mm": None,
             "best_voltage": None,
             "focal_length": None,
+            "focal_lengths": None,
+            "focal_length_std": None,
+            "preview_port": None,
             "desired_cmd": None
         }
+        # Per-rig state when main.py runs several rigs; requests without a rig use the default one
+        self.rigs = {self.DEFAULT_RIG: self.system_state}
+        self._reported = set()
+
+        # Shared-memory emergency stop read by the motor's step loop
+        try:
+            self.estop = EStopFlag()
+        except OSError as e:
+            print(f"E-STOP WARNING: Unable to open the emergency stop flag: {e}")
+            self.estop = None
 
         # Simple shared-secret to restrict write access to main.py
         self.api_key = os.environ.get("API_UPDATE_KEY", "dev-secret")
+        # Prometheus endpoint of the measurement process (main.py --metrics-port)
+        self.metrics_url = os.environ.get("METRICS_URL", "http://127.0.0.1:9108/metrics")
+        # Camera preview of the measurement process (main.py --preview-port); each rig reports
+        # its own port, this URL is used for a rig that has not reported one
+        self.preview_url = os.environ.get("PREVIEW_URL", "http://127.0.0.1:9109")
 
         log = logging.getLogger('werkzeug')
         log.setLevel(logging.ERROR)
 
         self.app.add_url_rule('/', view_func=self.index, methods=['GET', 'POST'])
         self.app.add_url_rule('/api/status', view_func=self.get_status, methods=['GET'])
+        self.app.add_url_rule('/api/rigs', view_func=self.get_rigs, methods=['GET'])
         self.app.add_url_rule('/api/start', view_func=self.start_scan, methods=['POST'])
         self.app.add_url_rule('/api/stop', view_func=self.stop_scan, methods=['POST'])
         self.app.add_url_rule('/api/update', view_func=self.update_status, methods=['POST'])
+        self.app.add_url_rule('/api/estop', view_func=self.emergency_stop, methods=['POST'])
+        self.app.add_url_rule('/api/estop/reset', view_func=self.reset_estop, methods=['POST'])
+        self.app.add_url_rule('/metrics', view_func=self.metrics, methods=['GET'])
+        self.app.add_url_rule('/preview.mjpg', view_func=self.preview, methods=['GET'])
+        self.app.add_url_rule('/snapshot.jpg', view_func=self.snapshot, methods=['GET'])
 
     def index(self):
         if request.method == 'POST':
             action = request.form.get('action')
             if action in ('start', 'stop', 'home'):
-                self.system_state['desired_cmd'] = action
+                self.rig_state(request.form.get('rig'))['desired_cmd'] = action
+            elif action == 'estop':
+                self._raise_estop()
+            elif action == 'reset':
+                if not self._authorized(request.form.get('api_key')):
+                    return render_template('index.html', state=self.state(), rigs=self.rig_names(),
+                                           error="Reset needs the API key"), 401
+                self._reset_estop()
+
+        return render_template('index.html', state=self.state(), rigs=self.rig_names())
+
+    def rig_state(self, rig: str | None = None) -> dict:
+        name = rig or self.DEFAULT_RIG
+        if name not in self.rigs:
+            self.rigs[name] = {k: (False if k.startswith('is_') else None) for k in self.system_state}
+        return self.rigs[name]
+
+    def rig_names(self) -> list:
+        """Rigs that have reported to the server (the default rig until a named one does)."""
+        names = [name for name in self.rigs if name in self._reported]
+        return names or [self.DEFAULT_RIG]
 
-        return render_template('index.html', state=self.system_state)
+    def state(self, rig: str | None = None) -> dict:
+        state = dict(self.rig_state(rig))
+        state['estop'] = self.estop is not None and self.estop.is_set()
+        return state
 
     def get_status(self):
-        return jsonify(self.system_state)
+        return jsonify(self.state(request.args.get('rig')))
+
+    def get_rigs(self):
+        return jsonify({name: self.state(name) for name in self.rig_names()})
+
+    def _requested_rig(self) -> str | None:
+        data = request.get_json(silent=True) or {}
+        return request.args.get('rig') or data.get('rig')
+
+    def _authorized(self, key: str | None = None) -> bool:
+        key = key if key is not None else request.headers.get('X-API-Key')
+        return key is not None and hmac.compare_digest(key, self.api_key)
+
+    def _raise_estop(self) -> bool:
+        # Flag first: the step loop stops within one step, the status poll would take up to 0.5 s
+        if self.estop is None or not self.estop.writable:
+            return False
+        self.estop.trigger("web")
+        for state in self.rigs.values():
+            state['desired_cmd'] = 'stop'
+        return True
+
+    def _reset_estop(self) -> bool:
+        if self.estop is None or not self.estop.writable:
+            return False
+        self.estop.clear()
+        return True
+
+    def emergency_stop(self):
+        # No API key: anyone at the control page must be able to stop the rig
+        ok = self._raise_estop()
+        return jsonify({"ok": ok, "estop": self.state()['estop']}), (200 if ok else 503)
+
+    def reset_estop(self):
+        # Raising is open to everyone, clearing takes the same key as updates
+        if not self._authorized():
+            return jsonify({"ok": False, "error": "unauthorized"}), 401
+        ok = self._reset_estop()
+        return jsonify({"ok": ok, "estop": self.state()['estop']}), (200 if ok else 503)
 
     def start_scan(self):
-        self.system_state['desired_cmd'] = 'start'
+        self.rig_state(self._requested_rig())['desired_cmd'] = 'start'
         return jsonify({"ok": True, "desired_cmd": 'start'})
 
     def stop_scan(self):
-        self.system_state['desired_cmd'] = 'stop'
+        self.rig_state(self._requested_rig())['desired_cmd'] = 'stop'
         return jsonify({"ok": True, "desired_cmd": 'stop'})
 
     def start_home(self):
-        self.system_state['desired_cmd'] = 'home'
+        self.rig_state(self._requested_rig())['desired_cmd'] = 'home'
         return jsonify({"ok": True, "desired_cmd": 'home'})
 
     def update_status(self):
         # Require API key to prevent browser or other clients from updating
-        key = request.headers.get('X-API-Key')
-        if key != self.api_key:
+        if not self._authorized():
             return jsonify({"ok": False, "error": "unauthorized"}), 401
 
         data = request.get_json(silent=True) or {}
+        self.apply_update(data)
+        return jsonify({"ok": True, "state": self.rig_state(data.get('rig'))})
+
+    def apply_update(self, data: dict):
+        name = data.get('rig') or self.DEFAULT_RIG
+        state = self.rig_state(name)
+        self._reported.add(name)
         allowed = {
             'is_running', 'is_homing', 'target_value',
             'current_pos_mm', 'current_voltage',
-            'best_pos_mm', 'best_voltage', 'focal_length'
+            'best_pos_mm', 'best_voltage', 'focal_length', 'focal_lengths',
+            'focal_length_std', 'preview_port'
         }
         for k in allowed:
             if k in data:
-                self.system_state[k] = data[k]
+                state[k] = data[k]
 
         # Allow algorithm to clear handled command
-        if data.get('desired_cmd') is None and 'desired_cmd' in self.system_state:
-            self.system_state['desired_cmd'] = None
+        if data.get('desired_cmd') is None and 'desired_cmd' in state:
+            state['desired_cmd'] = None
+
+    def start_ipc(self):
+        if not self.ipc_path:
+            return
+        try:
+            self.ipc_server = IpcServer(lambda query: self.state(query.get('rig')), self.apply_update, self.ipc_path)
+            self.ipc_server.start()
+            print(f"Local IPC on {self.ipc_path}")
+        except Exception as e:
+            self.ipc_server = None
+            print(f"IPC WARNING: Unable to listen on {self.ipc_path}: {e}")
+
+    def metrics(self):
+        # Proxy the measurement process' metrics so a single scrape target covers the rig
+        try:
+            with urllib.request.urlopen(self.metrics_url, timeout=1.0) as r:
+                body = r.read()
+        except Exception as e:
+            return Response(f"# measurement process metrics unavailable: {e}\n", status=502, mimetype="text/plain")
+        return Response(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    def _preview_base(self, rig: str | None) -> str | None:
+        """Preview server of the requested rig (?rig=name); None for a rig without a camera preview."""
+        state = self.rigs.get(rig or self.DEFAULT_RIG)
+        port = state.get('preview_port') if state else None
+        if port:
+            url = urllib.parse.urlsplit(self.preview_url)
+            return f"{url.scheme}://{url.hostname}:{int(port)}"
+        return self.preview_url if not rig or rig == self.DEFAULT_RIG else None
+
+    def _preview_upstream(self, path: str, timeout: float):
+        rig = request.args.get('rig')
+        base = self._preview_base(rig)
+        if base is None:
+            raise LookupError(f"no camera preview for rig {rig!r}")
+        query = urllib.parse.urlencode([(k, v) for k, v in request.args.items(multi=True) if k != 'rig'])
+        return urllib.request.urlopen(f"{base}{path}" + (f"?{query}" if query else ""), timeout=timeout)
+
+    def preview(self):
+        # Relay the measurement process' MJPEG stream; frames are encoded there once for all viewers
+        try:
+            upstream = self._preview_upstream("/preview.mjpg", timeout=5.0)
+        except Exception as e:
+            return Response(f"camera preview unavailable: {e}\n", status=502, mimetype="text/plain")
+
+        def relay():
+            with upstream:
+                while True:
+                    chunk = upstream.read1(65536)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        return Response(relay(), content_type=upstream.headers.get("Content-Type"),
+                        headers={"Cache-Control": "no-store"})
 
-        return jsonify({"ok": True, "state": self.system_state})
+    def snapshot(self):
+        try:
+            with self._preview_upstream("/snapshot.jpg", timeout=3.0) as r:
+                body = r.read()
+        except Exception as e:
+            return Response(f"camera snapshot unavailable: {e}\n", status=502, mimetype="text/plain")
+        return Response(body, content_type="image/jpeg", headers={"Cache-Control": "no-store"})
 
     def run(self):
         print(f"Starting Web Server on http://raspberrypi.local:{self.port}")
+        # With debug=True the reloader runs this twice; only the serving child owns the socket
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            self.start_ipc()
         self.app.run(host=self.host, port=self.port, debug=True)
 
 